@@ -0,0 +1,256 @@
+import base64
+import hashlib
+import mmap
+import os
+import re
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from SBOM_Generators import Instrumentation, MavenResolver, MetadataSnapshot, RegistryClient
+
+# Set by --no-hashes: components are emitted without hashes
+ENABLED = os.environ.get("SBOM_HASHES", "1") != "0"
+
+# hashlib releases the GIL while digesting large buffers, so threads hash on all cores
+MAX_WORKERS = int(os.environ.get("SBOM_HASH_WORKERS", str(os.cpu_count() or 4)))
+
+ALGORITHMS = (("SHA-256", "sha256"), ("SHA-512", "sha512"))
+
+
+def _default_npm_cache():
+    if os.environ.get("npm_config_cache"):
+        return os.path.join(os.environ["npm_config_cache"], "_cacache")
+    if os.name == "nt" and os.environ.get("LOCALAPPDATA"):
+        return os.path.join(os.environ["LOCALAPPDATA"], "npm-cache", "_cacache")
+    return os.path.join(os.path.expanduser("~"), ".npm", "_cacache")
+
+
+def _default_pip_cache():
+    if os.environ.get("PIP_CACHE_DIR"):
+        return os.environ["PIP_CACHE_DIR"]
+    if os.name == "nt" and os.environ.get("LOCALAPPDATA"):
+        return os.path.join(os.environ["LOCALAPPDATA"], "pip", "Cache")
+    return os.path.join(os.environ.get("XDG_CACHE_HOME", os.path.join(os.path.expanduser("~"), ".cache")), "pip")
+
+
+NPM_CACHE = _default_npm_cache()
+PIP_CACHE = _default_pip_cache()
+
+# Maven packaging types whose artifact is a jar
+JAR_TYPES = {"jar", "bundle", "maven-plugin", "ejb", "test-jar"}
+
+
+def maven_artifact_path(group, name, version, type_="jar", classifier="", repository=None):
+    extension = "jar" if type_ in JAR_TYPES else type_
+    suffix = f"-{classifier}" if classifier else ""
+    return os.path.join(repository or MavenResolver.REPOSITORY, *group.split("."), name, version,
+                        f"{name}-{version}{suffix}.{extension}")
+
+
+def maven_artifact_path_from_purl(purl, repository=None):
+    """
+    Locates the artifact for "pkg:maven/group/name@version?type=jar[&classifier=...]".
+    """
+    match = re.match(r"pkg:maven/([^/]+)/([^@]+)@([^?]+)(?:\?(.*))?$", purl or "")
+    if not match:
+        return None
+    group, name, version, qualifiers = match.groups()
+    qualifiers = dict(pair.split("=", 1) for pair in (qualifiers or "").split("&") if "=" in pair)
+    return maven_artifact_path(group, name, version, qualifiers.get("type", "jar"), qualifiers.get("classifier", ""),
+                               repository)
+
+
+def _integrity_digests(integrity):
+    """
+    Splits an SRI string ("sha512-<base64> sha1-<base64>") into {algorithm: hex digest}.
+    """
+    digests = {}
+    for entry in (integrity or "").split():
+        algorithm, _, encoded = entry.partition("-")
+        try:
+            digests[algorithm] = base64.b64decode(encoded.split("?", 1)[0]).hex()
+        except ValueError:
+            continue
+    return digests
+
+
+def npm_tarball_path(integrity, cache_dir=None):
+    """
+    npm's cacache stores tarballs content-addressed by their integrity hash.
+    """
+    for algorithm, digest in _integrity_digests(integrity).items():
+        path = os.path.join(cache_dir or NPM_CACHE, "content-v2", algorithm, digest[:2], digest[2:4], digest[4:])
+        if os.path.isfile(path):
+            return path
+    return None
+
+
+def npm_integrity_hashes(integrity):
+    """
+    The lockfile's sha512 integrity is the tarball's SHA-512, usable even when the tarball is not cached.
+    """
+    digest = _integrity_digests(integrity).get("sha512")
+    return [{"alg": "SHA-512", "content": digest}] if digest else None
+
+
+_wheel_indexes = {}
+_wheel_indexes_lock = threading.Lock()
+
+
+def pip_wheel_path(name, version, cache_dir=None):
+    """
+    Finds a wheel for name==version among the wheels pip built and cached locally.
+    """
+    cache_dir = cache_dir or PIP_CACHE
+    with _wheel_indexes_lock:
+        index = _wheel_indexes.get(cache_dir)
+        if index is None:
+            # Walk the cache once; wheel file names start with <name>-<version>-
+            index = _wheel_indexes[cache_dir] = {}
+            for dirpath, _, filenames in os.walk(os.path.join(cache_dir, "wheels")):
+                for filename in filenames:
+                    parts = filename.split("-")
+                    if filename.endswith(".whl") and len(parts) >= 5:
+                        index.setdefault((MetadataSnapshot.canonicalize_name(parts[0]), parts[1]), os.path.join(dirpath, filename))
+    return index.get((MetadataSnapshot.canonicalize_name(name), version))
+
+
+def hash_file(path):
+    """
+    Returns {"SHA-256": hex, "SHA-512": hex} for a file, reading it through mmap.
+    """
+    digests = [(alg, hashlib.new(name)) for alg, name in ALGORITHMS]
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                for _, digest in digests:
+                    digest.update(mapped)
+    return {alg: digest.hexdigest() for alg, digest in digests}
+
+
+class HashCache:
+    """
+    Remembers artifact digests by path, size and modification time, so unchanged
+    artifacts are never read twice.
+    """
+
+    def __init__(self, path):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(path), timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS artifact_hashes ("
+            " path TEXT PRIMARY KEY,"
+            " size INTEGER NOT NULL,"
+            " mtime_ns INTEGER NOT NULL,"
+            " sha256 TEXT NOT NULL,"
+            " sha512 TEXT NOT NULL)"
+        )
+
+    def get(self, path, size, mtime_ns):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT sha256, sha512 FROM artifact_hashes WHERE path = ? AND size = ? AND mtime_ns = ?",
+                (path, size, mtime_ns)
+            ).fetchone()
+        return None if row is None else {"SHA-256": row[0], "SHA-512": row[1]}
+
+    def put_many(self, entries):
+        with self._lock:
+            self._conn.execute("BEGIN")
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO artifact_hashes (path, size, mtime_ns, sha256, sha512) VALUES (?, ?, ?, ?, ?)",
+                [(path, size, mtime_ns, digests["SHA-256"], digests["SHA-512"])
+                 for path, size, mtime_ns, digests in entries]
+            )
+            self._conn.execute("COMMIT")
+
+    def close(self):
+        self._conn.close()
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache():
+    global _cache
+    # --no-cache turns off this cache along with the registry metadata cache
+    if not RegistryClient.CACHE_ENABLED:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            # Lives next to the registry metadata cache, so --cache-dir moves both
+            _cache = HashCache(Path(RegistryClient.CACHE_PATH).parent / "hashes.sqlite")
+        return _cache
+
+
+def hash_files(paths, max_workers=None):
+    """
+    Returns {path: {"SHA-256", "SHA-512"}} for the existing files among paths. Digests
+    memoized for the same path, size and mtime are reused unless the cache is disabled;
+    the rest are hashed in parallel.
+    """
+    cache = get_cache()
+    results = {}
+    pending = []
+    for path in dict.fromkeys(path for path in paths if path):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        cached = cache.get(path, stat.st_size, stat.st_mtime_ns) if cache else None
+        if cached is not None:
+            results[path] = cached
+            Instrumentation.count("hash_cache_hits")
+        else:
+            pending.append((path, stat.st_size, stat.st_mtime_ns))
+
+    if pending:
+        with ThreadPoolExecutor(max_workers=max_workers or MAX_WORKERS) as executor:
+            digests = list(executor.map(lambda entry: hash_file(entry[0]), pending))
+        if cache:
+            cache.put_many([entry + (digest,) for entry, digest in zip(pending, digests)])
+        for (path, size, _), digest in zip(pending, digests):
+            results[path] = digest
+        Instrumentation.count("artifacts_hashed", len(pending))
+        Instrumentation.count("artifact_bytes_hashed", sum(size for _, size, _ in pending))
+    return results
+
+
+def as_component_hashes(digests):
+    return [{"alg": alg, "content": digests[alg]} for alg, _ in ALGORITHMS if alg in digests]
+
+
+# hashlib names used by pip's installation report -> CycloneDX algorithm names
+ARCHIVE_ALGORITHMS = {"md5": "MD5", "sha1": "SHA-1", "sha256": "SHA-256", "sha384": "SHA-384", "sha512": "SHA-512"}
+
+
+def archive_info_hashes(archive_info):
+    """
+    Returns the CycloneDX "hashes" list for a direct_url.json archive_info, which pip's
+    installation report records for every archive it resolves ({"hashes": {"sha256": hex}},
+    or only {"hash": "sha256=hex"} from older pips), or None when it carries no digest.
+    """
+    digests = dict(archive_info.get("hashes") or {})
+    if not digests and "=" in archive_info.get("hash", ""):
+        name, _, value = archive_info["hash"].partition("=")
+        digests[name] = value
+    hashes = [{"alg": ARCHIVE_ALGORITHMS[name], "content": value} for name, value in digests.items()
+              if name in ARCHIVE_ALGORITHMS]
+    return hashes or None
+
+
+def hash_batch(batch, locate):
+    """
+    Returns [(item, hashes)] for a batch of items, where hashes is the CycloneDX "hashes"
+    list of the artifact locate(item) points at, or None.
+    """
+    if not ENABLED:
+        return [(item, None) for item in batch]
+    paths = [locate(item) for item in batch]
+    digests = hash_files(paths)
+    return [(item, as_component_hashes(digests[path]) if path in digests else None) for item, path in zip(batch, paths)]
@@ -0,0 +1,248 @@
+import json
+import multiprocessing
+import os
+import tempfile
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from SBOM_Generators import Instrumentation, Plugins, SbomWriter, SubprocessPool
+
+SKIPPED_DIRS = {"node_modules", "target", ".git", ".hg", ".svn", ".venv", "venv", ".temp_env", "__pycache__", ".tox"}
+
+
+def run_in_scratch_dir(module_name, **kwargs):
+    """
+    Runs a generator's run() inside a fresh scratch working directory and returns
+    an error description, or None on success.
+    """
+    with tempfile.TemporaryDirectory(prefix="sbom-") as work_dir:
+        previous_dir = os.getcwd()
+        os.chdir(work_dir)
+        try:
+            Plugins.import_generator(module_name).run(**kwargs)
+        except SystemExit as e:
+            if e.code not in (None, 0):
+                return f"exited with status {e.code}"
+        except Exception as e:
+            traceback.print_exc()
+            return f"{type(e).__name__}: {e}"
+        finally:
+            os.chdir(previous_dir)
+    return None
+
+
+def _claimed_by_ancestor(directory, claimed, ecosystem):
+    while True:
+        if ecosystem in claimed.get(directory, ()):
+            return True
+        parent = os.path.dirname(directory)
+        if parent == directory:
+            return False
+        directory = parent
+
+
+def discover_manifests(root):
+    """
+    Walks a directory tree and returns manifest paths. A manifest nested below another
+    manifest of the same ecosystem (Maven modules, npm workspaces) is part of that
+    project and is not listed separately.
+    """
+    known = Plugins.manifests()
+    manifests = []
+    claimed = {}
+    for dirpath, dirnames, filenames in os.walk(os.path.abspath(root)):
+        dirnames[:] = sorted(d for d in dirnames if d not in SKIPPED_DIRS)
+        for filename in sorted(filenames):
+            if filename not in known:
+                continue
+            ecosystem = known[filename][0]
+            if _claimed_by_ancestor(os.path.dirname(dirpath), claimed, ecosystem):
+                continue
+            claimed.setdefault(dirpath, set()).add(ecosystem)
+            manifests.append(os.path.join(dirpath, filename))
+    return manifests
+
+
+def collect_manifests(paths):
+    """
+    Accepts project directories / trees, individual manifest files, or text files listing
+    one manifest or directory per line ('#' comments allowed).
+    """
+    manifests = []
+    for path in paths:
+        if os.path.isdir(path):
+            manifests.extend(discover_manifests(path))
+        elif os.path.basename(path) in Plugins.manifests():
+            manifests.append(os.path.abspath(path))
+        else:
+            base = os.path.dirname(os.path.abspath(path))
+            with open(path) as f:
+                entries = [line.strip() for line in f if line.strip() and not line.strip().startswith("#")]
+            manifests.extend(collect_manifests([os.path.join(base, entry) for entry in entries]))
+
+    # Keep the first occurrence of each manifest
+    return list(dict.fromkeys(manifests))
+
+
+def plan_jobs(manifests, output_dir):
+    project_dirs = [os.path.dirname(manifest) for manifest in manifests]
+    common = os.path.commonpath(project_dirs) if len(set(project_dirs)) > 1 else os.path.dirname(project_dirs[0])
+
+    known = Plugins.manifests()
+    jobs = []
+    for manifest, project_dir in zip(manifests, project_dirs):
+        ecosystem, module_name, argument = known[os.path.basename(manifest)]
+        slug = os.path.relpath(project_dir, common).replace(os.sep, "__")
+        if slug == ".":
+            slug = os.path.basename(project_dir) or "project"
+        jobs.append({
+            "project": project_dir,
+            "ecosystem": ecosystem,
+            "module": module_name,
+            "arguments": {argument: manifest, "output_file": os.path.join(output_dir, slug, f"{ecosystem}_sbom.json")},
+        })
+    return jobs
+
+
+def init_worker(slots, initializer, options):
+    """
+    Worker process initializer: caps concurrent subprocesses and applies the CLI options.
+    """
+    SubprocessPool.set_limit(slots)
+    if initializer is not None:
+        initializer(options)
+
+
+def _mtime(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+
+def run_job(job, submitted_at):
+    """
+    Runs one planned job in the calling process and returns its result for the report.
+    """
+    started_at = time.time()
+    Instrumentation.reset()
+
+    output_file = SbomWriter.output_path(job["arguments"]["output_file"])
+    os.makedirs(os.path.dirname(output_file), exist_ok=True)
+    # The SBOM of the previous run stays in place for --incremental to reuse components from;
+    # an unchanged modification time means the generator wrote nothing
+    previous_mtime = _mtime(output_file)
+
+    error = run_in_scratch_dir(job["module"], **job["arguments"])
+    if error is None and _mtime(output_file) in (None, previous_mtime):
+        error = "no SBOM was written"
+
+    return {
+        "project": job["project"],
+        "ecosystem": job["ecosystem"],
+        "output_file": output_file,
+        "queue_seconds": started_at - submitted_at,
+        "run_seconds": time.time() - started_at,
+        "stages": Instrumentation.snapshot(),
+        "counters": Instrumentation.counters(),
+        "peak_rss_bytes": Instrumentation.peak_rss_bytes(),
+        "error": error,
+    }
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+def summarize(results, wall_seconds):
+    projects = {result["project"] for result in results}
+    queue_times = [result["queue_seconds"] for result in results]
+    stages = {}
+    for result in results:
+        for name, totals in result["stages"].items():
+            stage = stages.setdefault(name, {"seconds": 0.0, "jobs": 0})
+            stage["seconds"] += totals["seconds"]
+            stage["jobs"] += 1
+    for stage in stages.values():
+        stage["mean_seconds"] = stage["seconds"] / stage["jobs"]
+
+    return {
+        "projects": len(projects),
+        "jobs": len(results),
+        "failed_jobs": sum(1 for result in results if result["error"]),
+        "wall_seconds": wall_seconds,
+        "projects_per_minute": len(projects) / (wall_seconds / 60) if wall_seconds else 0.0,
+        "queue_seconds": {
+            "mean": sum(queue_times) / len(queue_times) if queue_times else 0.0,
+            "p50": percentile(queue_times, 0.50),
+            "p95": percentile(queue_times, 0.95),
+            "max": max(queue_times, default=0.0),
+        },
+        "stages": stages,
+        "results": sorted(results, key=lambda result: (result["project"], result["ecosystem"])),
+    }
+
+
+def print_summary(report):
+    print("\nBatch summary")
+    print(f"  projects         {report['projects']} ({report['jobs']} jobs, {report['failed_jobs']} failed)")
+    print(f"  wall time        {report['wall_seconds']:.2f} s")
+    print(f"  throughput       {report['projects_per_minute']:.1f} projects/min")
+    queue = report["queue_seconds"]
+    print(f"  queue time       mean {queue['mean']:.2f} s, p50 {queue['p50']:.2f} s, "
+          f"p95 {queue['p95']:.2f} s, max {queue['max']:.2f} s")
+    for name, stage in sorted(report["stages"].items()):
+        print(f"  stage {name:<10} {stage['seconds']:.2f} s total, {stage['mean_seconds']:.2f} s/job")
+    for result in report["results"]:
+        if result["error"]:
+            print(f"  FAILED {result['ecosystem']:<6} {result['project']}: {result['error']}")
+
+
+def run_batch(paths, output_dir, jobs=None, max_subprocesses=None, initializer=None, options=None, report_file=None):
+    """
+    Generates one SBOM per project manifest found under paths using a pool of worker
+    processes. At most max_subprocesses npm/mvn/pip subprocesses run at once across
+    all workers, and every worker shares the on-disk metadata and build caches.
+    Returns the throughput report.
+    """
+    output_dir = os.path.abspath(output_dir)
+    manifests = collect_manifests(paths)
+    if not manifests:
+        print(f"No {', '.join(Plugins.manifests())} found")
+        return summarize([], 0.0)
+
+    planned = plan_jobs(manifests, output_dir)
+    workers = jobs or os.cpu_count() or 1
+    slots = multiprocessing.BoundedSemaphore(max_subprocesses or workers)
+
+    start = time.time()
+    results = []
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker,
+                             initargs=(slots, initializer, options or {})) as executor:
+        futures = {executor.submit(run_job, job, time.time()): job for job in planned}
+        for future in as_completed(futures):
+            job = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:  # the worker process itself died
+                result = {"project": job["project"], "ecosystem": job["ecosystem"],
+                          "output_file": job["arguments"]["output_file"], "queue_seconds": 0.0,
+                          "run_seconds": 0.0, "stages": {}, "counters": {}, "peak_rss_bytes": None,
+                          "error": repr(e)}
+            results.append(result)
+            status = "ok" if result["error"] is None else "FAILED"
+            print(f"[{len(results)}/{len(planned)}] {result['ecosystem']:<6} {result['project']} {status}")
+
+    report = summarize(results, time.time() - start)
+    os.makedirs(output_dir, exist_ok=True)
+    report_file = report_file or os.path.join(output_dir, "batch_report.json")
+    with open(report_file, "w") as f:
+        json.dump(report, f, indent=4)
+
+    print_summary(report)
+    print(f"Throughput report written to {report_file}")
+    return report
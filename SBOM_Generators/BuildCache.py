@@ -0,0 +1,157 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+import xml.etree.ElementTree as ET
+from pathlib import Path
+
+from SBOM_Generators import MetadataCache, StreamingParsers
+
+# Lockfiles and intermediate BOMs produced by package-manager subprocesses, keyed by a hash of their inputs
+CACHE_DIR = MetadataCache.DEFAULT_CACHE_PATH.parent / "builds"
+ENABLED = os.environ.get("SBOM_BUILD_CACHE", "1") != "0"
+
+# Version ranges can resolve differently once new releases are published, so cached
+# results are only trusted for this many seconds
+MAX_AGE = int(os.environ.get("SBOM_BUILD_CACHE_TTL", str(24 * 3600)))
+
+SIDECAR_SUFFIX = ".inputs-sha256"
+
+
+def hash_files(paths):
+    """
+    Hashes the names (relative to the first path's directory) and contents of the given files.
+    """
+    paths = [Path(path).resolve() for path in paths]
+    base = paths[0].parent if paths else Path(".")
+    digest = hashlib.sha256()
+    for path in sorted(paths):
+        digest.update(os.path.relpath(path, base).replace(os.sep, "/").encode("utf-8"))
+        digest.update(b"\0")
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                digest.update(chunk)
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def _entry_path(kind, digest, filename):
+    return CACHE_DIR / kind / digest / filename
+
+
+def lookup(kind, digest, filename):
+    if not ENABLED:
+        return None
+    path = _entry_path(kind, digest, filename)
+    if path.exists() and time.time() - path.stat().st_mtime <= MAX_AGE:
+        return str(path)
+    return None
+
+
+def store(kind, digest, source_file, filename=None):
+    """
+    Copies source_file into the cache and returns the cached path (or source_file when disabled).
+    """
+    if not ENABLED:
+        return source_file
+    path = _entry_path(kind, digest, filename or os.path.basename(source_file))
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # Copy to a temporary name first so concurrent runs never read a partial file
+    fd, temp_path = tempfile.mkstemp(dir=path.parent)
+    os.close(fd)
+    shutil.copyfile(source_file, temp_path)
+    os.replace(temp_path, path)
+    return str(path)
+
+
+def write_sidecar(output_file, digest):
+    with open(output_file + SIDECAR_SUFFIX, "w") as f:
+        f.write(digest)
+
+
+def sidecar_matches(output_file, digest):
+    """
+    True when output_file was produced from inputs hashing to digest.
+    """
+    sidecar = output_file + SIDECAR_SUFFIX
+    if not os.path.exists(output_file) or not os.path.exists(sidecar):
+        return False
+    with open(sidecar) as f:
+        return f.read().strip() == digest
+
+
+def _pom_children(pom_file, name):
+    root = ET.parse(pom_file).getroot()
+    return [child for child in root if StreamingParsers.local_name(child.tag) == name]
+
+
+def collect_pom_inputs(pom_file):
+    """
+    Returns pom_file plus the parent POMs (via relativePath) and module POMs it aggregates,
+    i.e. every local file that influences the output of makeAggregateBom.
+    """
+    inputs = []
+    seen = set()
+    pending = [os.path.abspath(pom_file)]
+    while pending:
+        current = pending.pop()
+        if current in seen or not os.path.isfile(current):
+            continue
+        seen.add(current)
+        inputs.append(current)
+        directory = os.path.dirname(current)
+
+        for parent in _pom_children(current, "parent"):
+            relative_path = "../pom.xml"
+            for child in parent:
+                if StreamingParsers.local_name(child.tag) == "relativePath":
+                    relative_path = (child.text or "").strip()
+            if relative_path:
+                candidate = os.path.normpath(os.path.join(directory, relative_path))
+                if os.path.isdir(candidate):
+                    candidate = os.path.join(candidate, "pom.xml")
+                pending.append(candidate)
+
+        for modules in _pom_children(current, "modules"):
+            for module in modules:
+                if StreamingParsers.local_name(module.tag) == "module" and module.text:
+                    candidate = os.path.normpath(os.path.join(directory, module.text.strip()))
+                    if os.path.isdir(candidate):
+                        candidate = os.path.join(candidate, "pom.xml")
+                    pending.append(candidate)
+    return inputs
+
+
+def collect_npm_inputs(package_json_file):
+    inputs = [os.path.abspath(package_json_file)]
+    npmrc = os.path.join(os.path.dirname(inputs[0]), ".npmrc")
+    if os.path.isfile(npmrc):
+        inputs.append(npmrc)
+    return inputs
+
+
+def lockfile_matches_manifest(lockfile_path, package_json_file):
+    """
+    True when an existing package-lock.json (v2+) records exactly the dependency
+    specs declared in package.json, which is the check npm itself uses to decide
+    whether the lockfile is still valid for the manifest.
+    """
+    if not os.path.isfile(lockfile_path):
+        return False
+    with open(package_json_file) as f:
+        package_json = json.load(f)
+
+    # The root entry comes first in "packages" (absent in v1 lockfiles), so only the start of the file is read
+    try:
+        root = next(StreamingParsers.iter_object_items(lockfile_path, ("packages",)), (None, None))
+    except ValueError:
+        return False
+    if root[0] != "" or not isinstance(root[1], dict):
+        return False
+
+    for section in ("dependencies", "devDependencies", "optionalDependencies", "peerDependencies"):
+        if (package_json.get(section) or {}) != (root[1].get(section) or {}):
+            return False
+    return True
@@ -0,0 +1,189 @@
+from array import array
+from collections import deque
+
+
+class DependencyGraph:
+    """
+    Dependency graph over interned purls. Every purl is stored once and referred to by
+    an integer id; dependency entries keep their order and their dependsOn ids in compact
+    arrays, so iter_dependencies() reproduces the generators' "dependencies" list exactly.
+
+    Queries run on adjacency arrays in compressed sparse row form (offsets + targets) that
+    are built on first use, so each traversal is O(nodes + edges).
+    """
+
+    def __init__(self):
+        self._ids = {}
+        self._purls = []
+        # (ref id, array of dependsOn ids) in insertion order; a ref may occur more than once
+        self._entries = []
+        self._forward = None
+        self._reverse = None
+
+    def __len__(self):
+        return len(self._purls)
+
+    def __contains__(self, purl):
+        return purl in self._ids
+
+    @property
+    def purls(self):
+        return self._purls
+
+    @property
+    def edge_count(self):
+        return sum(len(depends_on) for _, depends_on in self._entries)
+
+    def intern(self, purl):
+        node = self._ids.get(purl)
+        if node is None:
+            node = self._ids[purl] = len(self._purls)
+            self._purls.append(purl)
+            self._forward = self._reverse = None
+        return node
+
+    def interner(self, normalize):
+        """
+        Returns a function mapping raw values (unparsed bom-refs, (name, version) pairs, ...)
+        to node ids that runs normalize only once per distinct raw value.
+        """
+        cache = {}
+
+        def intern_raw(raw):
+            node = cache.get(raw)
+            if node is None:
+                node = cache[raw] = self.intern(normalize(raw))
+            return node
+
+        return intern_raw
+
+    def add_ids(self, ref, depends_on):
+        self._entries.append((ref, array("l", depends_on)))
+        self._forward = self._reverse = None
+
+    def add(self, ref, depends_on):
+        self.add_ids(self.intern(ref), [self.intern(purl) for purl in depends_on])
+
+    @classmethod
+    def from_dependencies(cls, dependencies):
+        """
+        Builds a graph from the "dependencies" list of an SBOM.
+        """
+        graph = cls()
+        for dependency in dependencies:
+            graph.add(dependency.get("ref", ""), dependency.get("dependsOn", []))
+        return graph
+
+    def iter_dependencies(self):
+        purls = self._purls
+        for ref, depends_on in self._entries:
+            yield {"ref": purls[ref], "dependsOn": [purls[node] for node in depends_on]}
+
+    def _csr(self, reverse):
+        count = len(self._purls)
+        offsets = array("l", [0]) * (count + 1)
+        for ref, depends_on in self._entries:
+            if reverse:
+                for node in depends_on:
+                    offsets[node + 1] += 1
+            else:
+                offsets[ref + 1] += len(depends_on)
+
+        # Degrees -> start offsets
+        for node in range(count):
+            offsets[node + 1] += offsets[node]
+
+        targets = array("l", [0]) * offsets[count]
+        fill = array("l", offsets[:count])
+        for ref, depends_on in self._entries:
+            if reverse:
+                for node in depends_on:
+                    targets[fill[node]] = ref
+                    fill[node] += 1
+            else:
+                start = fill[ref]
+                targets[start:start + len(depends_on)] = depends_on
+                fill[ref] += len(depends_on)
+        return offsets, targets
+
+    def _adjacency(self, reverse=False):
+        if reverse:
+            if self._reverse is None:
+                self._reverse = self._csr(True)
+            return self._reverse
+        if self._forward is None:
+            self._forward = self._csr(False)
+        return self._forward
+
+    def _neighbours(self, node, reverse):
+        offsets, targets = self._adjacency(reverse)
+        # Duplicate edges from repeated entries are reported once
+        return list(dict.fromkeys(targets[offsets[node]:offsets[node + 1]]))
+
+    def _walk(self, purl, reverse):
+        node = self._ids.get(purl)
+        if node is None:
+            return []
+        offsets, targets = self._adjacency(reverse)
+        visited = bytearray(len(self._purls))
+        visited[node] = 1
+        found = []
+        queue = deque([node])
+        while queue:
+            current = queue.popleft()
+            for index in range(offsets[current], offsets[current + 1]):
+                neighbour = targets[index]
+                if not visited[neighbour]:
+                    visited[neighbour] = 1
+                    found.append(neighbour)
+                    queue.append(neighbour)
+        return [self._purls[node] for node in found]
+
+    def dependencies_of(self, purl):
+        node = self._ids.get(purl)
+        return [] if node is None else [self._purls[other] for other in self._neighbours(node, False)]
+
+    def dependents_of(self, purl):
+        node = self._ids.get(purl)
+        return [] if node is None else [self._purls[other] for other in self._neighbours(node, True)]
+
+    def transitive_dependencies(self, purl):
+        """
+        Everything reachable from purl, in breadth-first order.
+        """
+        return self._walk(purl, False)
+
+    def transitive_dependents(self, purl):
+        """
+        Everything that reaches purl, nearest first.
+        """
+        return self._walk(purl, True)
+
+    def shortest_path(self, source, target):
+        """
+        Returns the shortest dependency chain [source, ..., target], or None if target is
+        not reachable from source.
+        """
+        start = self._ids.get(source)
+        goal = self._ids.get(target)
+        if start is None or goal is None:
+            return None
+
+        offsets, targets = self._adjacency(False)
+        previous = array("l", [-1]) * len(self._purls)
+        previous[start] = start
+        queue = deque([start])
+        while queue and previous[goal] == -1:
+            current = queue.popleft()
+            for index in range(offsets[current], offsets[current + 1]):
+                neighbour = targets[index]
+                if previous[neighbour] == -1:
+                    previous[neighbour] = current
+                    queue.append(neighbour)
+
+        if previous[goal] == -1:
+            return None
+        path = [goal]
+        while path[-1] != start:
+            path.append(previous[path[-1]])
+        return [self._purls[node] for node in reversed(path)]
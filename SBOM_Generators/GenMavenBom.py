@@ -1,31 +1,66 @@
-import subprocess
 import json
 import uuid
 import os
 
+from SBOM_Generators import ArtifactHasher, BuildCache, DependencyGraph, IncrementalSbom, Instrumentation, MavenResolver, Paths, Pipeline, RegistryClient, SbomWriter, StreamingParsers, SubprocessPool, TemplateRenderer
+
+# "mvn" runs the CycloneDX Maven plugin; "native" resolves pom.xml against the local repository
+# (MavenResolver.REPOSITORY) in-process, without starting Maven
+RESOLVER = os.environ.get("SBOM_MAVEN_RESOLVER", "mvn")
+
+
+def find_generated_bom(pom_file):
+    # The SBOM is typically generated at `target/bom.json`, with `target/bom.xml` alongside it
+    project_dir = os.path.dirname(pom_file)
+    bom_file = os.path.join(project_dir, "target", "bom.json")
+    if not os.path.exists(bom_file):
+        bom_file = os.path.join(project_dir, "target", "bom.xml")
+    return bom_file
+
 
 def generate_cyclonedx_sbom_via_maven(pom_file):
+    # Hash pom.xml together with its parent and module POMs to identify the build inputs
+    digest = BuildCache.hash_files(BuildCache.collect_pom_inputs(pom_file))
+
+    # Reuse target/bom.json when it was produced from exactly these inputs
+    bom_file = find_generated_bom(pom_file)
+    if BuildCache.sidecar_matches(bom_file, digest):
+        print(f"Reusing up-to-date {bom_file}")
+        return bom_file
+
+    for filename in ("bom.json", "bom.xml"):
+        cached_bom = BuildCache.lookup("maven", digest, filename)
+        if cached_bom:
+            print(f"Reusing cached {filename}")
+            return cached_bom
+
     # Use Maven to generate the SBOM
     command = [
         "mvn.cmd",
         "org.cyclonedx:cyclonedx-maven-plugin:makeAggregateBom",
         f"-f={pom_file}"
     ]
+    if RegistryClient.OFFLINE:
+        # Resolve from the local repository only
+        command.append("-o")
 
-    result = subprocess.run(command, capture_output=True, text=True)
+    result = SubprocessPool.run(command, capture_output=True, text=True)
 
     if result.returncode != 0:
         print("Error generating SBOM:", result.stderr)
         raise Exception("Failed to generate SBOM using Maven")
 
-    # The SBOM is typically generated at `target/bom.json`
-    project_dir = os.path.dirname(pom_file)
-    return os.path.join(project_dir, "target", "bom.json")
+    bom_file = find_generated_bom(pom_file)
+    BuildCache.write_sidecar(bom_file, digest)
+    BuildCache.store("maven", digest, bom_file)
+    return bom_file
 
 
 def load_cyclonedx_sbom(file_path):
-    with open(file_path, 'r') as f:
-        return json.load(f)
+    # Components and dependencies are streamed from disk rather than loaded in one go
+    if file_path.endswith(".xml"):
+        return StreamingParsers.CycloneDxXmlDocument(file_path)
+    return StreamingParsers.StreamedJsonDocument(file_path, {"components": list, "dependencies": list})
 
 
 def clean_bom_ref_or_purl(value):
@@ -40,19 +75,9 @@ def load_json_file(template_file):
     return template
 
 
-def replace_placeholders(data, replacements):
-    if isinstance(data, dict):
-        return {key: replace_placeholders(value, replacements) for key, value in data.items()}
-    elif isinstance(data, list):
-        return [replace_placeholders(item, replacements) for item in data]
-    elif isinstance(data, str):
-        return data.format(**replacements)
-    else:
-        return data
-
-
 def fill_component_template(template, component_info):
-    return replace_placeholders(template, component_info)
+    with Instrumentation.stage("render", detail=True):
+        return TemplateRenderer.render(template, component_info)
 
 
 def fill_sbom_template(cyclonedx_bom, template, package_manager):
@@ -71,14 +96,37 @@ def fill_sbom_template(cyclonedx_bom, template, package_manager):
         "tool_version": "0.1.0",
         "package_manager": package_manager
     }
-    return replace_placeholders(template, replacements)
+    return TemplateRenderer.render(template, replacements)
 
 
-def generate_custom_sbom(cyclonedx_bom, sbom_components, sbom_dependencies, component_template, package_manager):
+def plugin_hashes(maven_component):
+    hashes = [entry for entry in maven_component.get("hashes", []) if entry.get("alg") in ("SHA-256", "SHA-512")]
+    return hashes if len(hashes) == 2 else None
+
+
+def generate_custom_sbom(cyclonedx_bom, sbom_components, sbom_dependencies, component_template, package_manager,
+                         previous_components=None):
+
+    # The CycloneDX plugin already records digests; otherwise the jar is hashed from the local repository
+    def locate_artifact(maven_component):
+        if plugin_hashes(maven_component) or (
+                previous_components and clean_bom_ref_or_purl(maven_component.get("bom-ref", "")) in previous_components):
+            return None
+        return ArtifactHasher.maven_artifact_path_from_purl(maven_component.get("purl") or maven_component.get("bom-ref"))
+
+    # Components are parsed and hashed on pipeline threads while earlier batches are rendered here
+    stages = [("hash", lambda batch: ArtifactHasher.hash_batch(batch, locate_artifact))]
 
     # Convert CycloneDX SBOM to custom format
-    for maven_component in cyclonedx_bom.get("components", []):
+    for maven_component, hashes in Pipeline.run(cyclonedx_bom.get("components", []), stages):
         component_bom_ref_or_purl = clean_bom_ref_or_purl(maven_component.get("bom-ref", ""))
+
+        # Components carried over from the previous SBOM are not rendered again
+        component = IncrementalSbom.reuse(previous_components, component_bom_ref_or_purl)
+        if component is not None:
+            sbom_components.append(component)
+            continue
+
         component_info = {
             "component_bom_ref": component_bom_ref_or_purl,
             "component_name": maven_component.get("name", ""),
@@ -95,17 +143,22 @@ def generate_custom_sbom(cyclonedx_bom, sbom_components, sbom_dependencies, comp
         component = fill_component_template(component_template, component_info)
         component["licenses"] = maven_component.get("licenses", [])
         component["externalReferences"] = maven_component.get("externalReferences", [])
+        hashes = plugin_hashes(maven_component) or hashes
+        if hashes and ArtifactHasher.ENABLED:
+            component["hashes"] = hashes
         sbom_components.append(component)
 
+    # Each distinct bom-ref is cleaned once, however many edges point at it
+    graph = DependencyGraph.DependencyGraph()
+    node_id = graph.interner(clean_bom_ref_or_purl)
     for dependency in cyclonedx_bom.get("dependencies", []):
         depends_on = []
         for dep in dependency.get("dependsOn", []):
-            depends_on.append(clean_bom_ref_or_purl(dep))
+            depends_on.append(node_id(dep))
 
-        sbom_dependencies.append({
-            "ref": clean_bom_ref_or_purl(dependency.get("ref", "")),
-            "dependsOn": depends_on
-        })
+        graph.add_ids(node_id(dependency.get("ref", "")), depends_on)
+
+    sbom_dependencies.extend(graph.iter_dependencies())
 
 
 def save_sbom(sbom_data, output_file):
@@ -113,34 +166,35 @@ def save_sbom(sbom_data, output_file):
         json.dump(sbom_data, f, indent=4)
 
 
-def main():
-    pom_file = "../input/pom.xml"  # Replace with your actual pom.xml file path
-    output_file = "../sboms/maven_sbom.json"  # Replace with your desired output file path
-
-    # Generate the CycloneDX SBOM using Maven
-    cyclonedx_sbom_file = generate_cyclonedx_sbom_via_maven(pom_file)
-
-    # Load the generated CycloneDX SBOM
-    cyclonedx_bom = load_cyclonedx_sbom(cyclonedx_sbom_file)
+def main(pom_file=str(Paths.INPUT_DIR / "pom.xml"), output_file=str(Paths.SBOMS_DIR / "maven_sbom.json"), previous_sbom=None):
+    with Instrumentation.stage("resolve"):
+        if RESOLVER == "native":
+            cyclonedx_bom = MavenResolver.resolve_bom(pom_file)
+        else:
+            # Generate the CycloneDX SBOM using Maven and load it
+            cyclonedx_bom = load_cyclonedx_sbom(generate_cyclonedx_sbom_via_maven(pom_file))
 
     # Load the SBOM and component templates
-    sbom_template = load_json_file("../templates/sbom_template_maven.json")
-    component_template = load_json_file("../templates/sbom_component_template_maven.json")
+    sbom_template = TemplateRenderer.load_template(str(Paths.TEMPLATES_DIR / "sbom_template_maven.json"))
+    component_template = TemplateRenderer.load_template(str(Paths.TEMPLATES_DIR / "sbom_component_template_maven.json"))
 
     package_manager = "maven"  # Set your package manager here
 
     sbom = fill_sbom_template(cyclonedx_bom, sbom_template, package_manager)
 
-    # Convert and save the custom SBOM
-    generate_custom_sbom(cyclonedx_bom, sbom["components"], sbom["dependencies"], component_template, package_manager)
-    save_sbom(sbom, output_file)
+    previous_components = IncrementalSbom.load_previous_components(IncrementalSbom.previous_sbom_for(output_file, previous_sbom))
 
-    print(f"Custom SBOM generated and saved to {output_file}")
+    # Convert the CycloneDX SBOM and stream the custom SBOM to the output file
+    with Instrumentation.stage("generate", profile=True), SbomWriter.StreamingSbomWriter(output_file, sbom) as writer:
+        generate_custom_sbom(cyclonedx_bom, writer.components, writer.dependencies, component_template, package_manager,
+                             previous_components)
+
+    print(f"Custom SBOM generated and saved to {writer.output_file}")
 
 
 if __name__ == "__main__":
     main()
 
 
-def run():
-    main()
+def run(**kwargs):
+    main(**kwargs)
@@ -4,10 +4,13 @@ import tempfile
 import os
 import shutil
 import subprocess
-import requests
-from pathlib import Path
 
-p = Path(__file__).resolve()
+from SBOM_Generators import (ArtifactHasher, BuildCache, DependencyGraph, IncrementalSbom, Instrumentation, Paths, Pipeline, RegistryClient,
+                             SbomWriter, StreamingParsers, SubprocessPool, TemplateRenderer)
+
+# A package needed at this many versions or more is looked up in one packument download, which
+# carries every version it ever published, instead of one small version document per version
+PACKUMENT_MIN_VERSIONS = int(os.environ.get("SBOM_NPM_PACKUMENT_MIN_VERSIONS", "4"))
 
 
 def load_json_file(template_file):
@@ -16,19 +19,9 @@ def load_json_file(template_file):
     return template
 
 
-def replace_placeholders(data, replacements):
-    if isinstance(data, dict):
-        return {key: replace_placeholders(value, replacements) for key, value in data.items()}
-    elif isinstance(data, list):
-        return [replace_placeholders(item, replacements) for item in data]
-    elif isinstance(data, str):
-        return data.format(**replacements)
-    else:
-        return data
-
-
 def fill_component_template(template, component_info):
-    return replace_placeholders(template, component_info)
+    with Instrumentation.stage("render", detail=True):
+        return TemplateRenderer.render(template, component_info)
 
 
 def fill_sbom_template(template, package_manager):
@@ -42,39 +35,44 @@ def fill_sbom_template(template, package_manager):
         "tool_version": "0.1.0",
         "package_manager": package_manager
     }
-    return replace_placeholders(template, replacements)
+    return TemplateRenderer.render(template, replacements)
 
 
-def generate_package_lock_json():
-    # Create a temporary directory
-    temp_dir = tempfile.mkdtemp()
-    original_dir = os.getcwd()  # Save the original directory
+def generate_package_lock_json(temp_dir, package_json_file=str(Paths.INPUT_DIR / "package.json")):
+    # Reuse a package-lock.json committed next to package.json when it still matches the manifest
+    existing_lockfile = os.path.join(os.path.dirname(package_json_file), "package-lock.json")
+    if BuildCache.lockfile_matches_manifest(existing_lockfile, package_json_file):
+        print(f"Reusing up-to-date {existing_lockfile}")
+        return load_package_lock_json(existing_lockfile)
+
+    # Skip npm entirely when a lockfile was already generated for identical inputs
+    digest = BuildCache.hash_files(BuildCache.collect_npm_inputs(package_json_file))
+    cached_lockfile = BuildCache.lookup("npm", digest, "package-lock.json")
+    if cached_lockfile:
+        print("Reusing cached package-lock.json")
+        return load_package_lock_json(cached_lockfile)
 
     try:
         # Copy package.json to the temporary directory
-        shutil.copy("../input/package.json", temp_dir)
-
-        # Change directory to the temporary directory
-        os.chdir(temp_dir)
+        shutil.copy(package_json_file, temp_dir)
 
-        # Run npm install to generate package-lock.json
-        subprocess.run(["npm.cmd", "install", "--package-lock-only", "--legacy-peer-deps", "--force"], check=True)
+        # Run npm install in the temporary directory to generate package-lock.json
+        command = ["npm.cmd", "install", "--package-lock-only", "--legacy-peer-deps", "--force"]
+        if RegistryClient.OFFLINE:
+            # Resolve from npm's local cache only
+            command.append("--offline")
+        SubprocessPool.run(command, cwd=temp_dir, check=True)
 
-        # Read the generated package-lock.json
-        with open("package-lock.json", "r") as lockfile:
-            lock_data = json.load(lockfile)
-
-        return lock_data
+        return load_package_lock_json(BuildCache.store("npm", digest, os.path.join(temp_dir, "package-lock.json")))
 
     except subprocess.CalledProcessError as e:
         print(f"Error running npm install: {e}")
         return None
-    finally:
-        # Change back to the original directory
-        os.chdir(original_dir)
 
-        # Clean up: Remove the temporary directory and its contents
-        shutil.rmtree(temp_dir)
+
+def load_package_lock_json(lockfile_path):
+    # The lockfile's packages are streamed from disk, so the file must outlive the returned document
+    return StreamingParsers.StreamedJsonDocument(lockfile_path, {"packages": dict})
 
 
 def clean_package_name(package_name):
@@ -87,7 +85,10 @@ def clean_package_name(package_name):
     return package_name
 
 
-def process_dependencies(lockfile, sbom_components, sbom_dependencies, processed_packages, component_template, package_manager):
+def iter_lockfile_packages(lockfile, processed_packages, package_manager):
+    """
+    Yields the unique (clean_name, version, package_data) entries of the lockfile in lockfile order.
+    """
     for package_name, package_data in lockfile.get("packages", {}).items():
         if not package_data or package_name == "":
             continue
@@ -95,115 +96,266 @@ def process_dependencies(lockfile, sbom_components, sbom_dependencies, processed
         # Clean the package name and get the version from package_data
         clean_name = clean_package_name(package_name)
         version = package_data.get("version", "Unknown")
-        purl = f"{clean_name}@{version}"  # Without "pkg:npm/" prefix for the bom-ref
-        parent_purl = f"pkg:{package_manager}/{purl}"  # Full purl with "pkg:{package_manager}/" prefix
+        parent_purl = f"pkg:{package_manager}/{clean_name}@{version}"  # Full purl with "pkg:{package_manager}/" prefix
 
         if parent_purl in processed_packages:
             continue  # Avoid processing the same package multiple times
 
         processed_packages.add(parent_purl)
-        npm_info = fetch_npm_info(clean_name, version)
-        external_references = []
-        if npm_info.get("repository", {}):
-            external_references.append({"type": "vcs", "url": npm_info.get("repository", {}).get("url", "")})
-        # if npm_info.get("homepage", ""):
-        #     external_references.append({"type": "homepage", "url": npm_info.get("homepage", "")})
-
-        if npm_info:
-            component_info = {
-                "component_bom_ref": purl,
-                "component_name": clean_name,
-                "component_version": version,
-                "component_publisher": npm_info.get("author", {}).get("name", "Unknown"),
-                "component_description": npm_info.get("description", "No description available"),
-                "component_purl": purl,
-                "license_id": npm_info.get("license", "Unknown"),
-                "package_manager": package_manager
-            }
-
-            component = fill_component_template(component_template, component_info)
-            component["externalReferences"] = external_references
-            sbom_components.append(component)
-
-            depends_on = []
-            for dep_name, dep_data in package_data.get("dependencies", {}).items():
-                # Handle both dictionary and string dep_data
-                if isinstance(dep_data, dict):
-                    dep_version = dep_data.get("version", "Unknown")
-                elif isinstance(dep_data, str):
-                    dep_version = dep_data
-                else:
-                    dep_version = "Unknown"
-
-                child_purl = f"pkg:{package_manager}/{dep_name.lower()}@{dep_version}"
-                depends_on.append(child_purl)
-
-            sbom_dependencies.append({
-                "ref": parent_purl,
-                "dependsOn": depends_on
-            })
+        yield clean_name, version, package_data
+
+
+def process_dependencies(lockfile, sbom_components, sbom_dependencies, processed_packages, component_template, package_manager, max_workers=None, previous_components=None):
+    RegistryClient.start_budget()
+
+    # Nested copies of a package lie far apart in a large lockfile, so the packages worth a
+    # packument are chosen over the whole lockfile rather than within one enrich batch
+    packument_versions = packument_versions_for(
+        (clean_name, version) for clean_name, version, _ in iter_lockfile_packages(lockfile, set(), package_manager))
+    # Versions a packument answered ahead of the batch that needs them
+    prefetched = {}
+
+    # Lockfile entries are parsed, enriched and hashed on pipeline threads while the
+    # components of earlier batches are rendered and written here
+    def enrich(batch):
+        # Only packages without a component in the previous SBOM need registry metadata
+        reused = [IncrementalSbom.reuse(previous_components, f"pkg:{package_manager}/{clean_name}@{version}")
+                  for clean_name, version, _ in batch]
+        pending = [(clean_name, version) for (clean_name, version, _), component in zip(batch, reused) if component is None]
+        npm_infos = dict(zip(pending, fetch_npm_infos(pending, max_workers, packument_versions, prefetched)))
+        return [(entry, component, npm_infos.get(entry[:2])) for entry, component in zip(batch, reused)]
+
+    # Tarballs are found in npm's content-addressed cache through the lockfile integrity
+    def locate_tarball(item):
+        (_, _, package_data), component, npm_info = item
+        if component is not None:
+            return None
+        return ArtifactHasher.npm_tarball_path(package_data.get("integrity"))
+
+    stages = [("enrich", enrich), ("hash", lambda batch: ArtifactHasher.hash_batch(batch, locate_tarball))]
+
+    # Child purls repeat across the lockfile, so each distinct (name, version) is formatted once
+    graph = DependencyGraph.DependencyGraph()
+    child_id = graph.interner(lambda key: f"pkg:{package_manager}/{key[0].lower()}@{key[1]}")
+
+    entries = iter_lockfile_packages(lockfile, processed_packages, package_manager)
+    for ((clean_name, version, package_data), component, npm_info), hashes in Pipeline.run(entries, stages):
+        if component is None:
+            component = build_component(clean_name, version, npm_info or {}, component_template, package_manager)
+            if not npm_info:
+                # Written with what the lockfile tells rather than left out of the SBOM
+                RegistryClient.mark_unenriched(component, RegistryClient.failure_reason("npm", clean_name, version))
+            if hashes is None and ArtifactHasher.ENABLED:
+                hashes = ArtifactHasher.npm_integrity_hashes(package_data.get("integrity"))
+            if hashes:
+                component["hashes"] = hashes
+        sbom_components.append(component)
+
+        depends_on = []
+        for dep_name, dep_data in package_data.get("dependencies", {}).items():
+            # Handle both dictionary and string dep_data
+            if isinstance(dep_data, dict):
+                dep_version = dep_data.get("version", "Unknown")
+            elif isinstance(dep_data, str):
+                dep_version = dep_data
+            else:
+                dep_version = "Unknown"
+
+            depends_on.append(child_id((dep_name, dep_version)))
+
+        graph.add_ids(graph.intern(f"pkg:{package_manager}/{clean_name}@{version}"), depends_on)
+
+    sbom_dependencies.extend(graph.iter_dependencies())
+
+
+def build_component(clean_name, version, npm_info, component_template, package_manager):
+    purl = f"{clean_name}@{version}"  # Without "pkg:npm/" prefix for the bom-ref
+
+    external_references = []
+    if npm_info.get("repository", {}):
+        external_references.append({"type": "vcs", "url": npm_info.get("repository", {}).get("url", "")})
+    # if npm_info.get("homepage", ""):
+    #     external_references.append({"type": "homepage", "url": npm_info.get("homepage", "")})
+
+    component_info = {
+        "component_bom_ref": purl,
+        "component_name": clean_name,
+        "component_version": version,
+        "component_publisher": npm_info.get("author", {}).get("name", "Unknown"),
+        "component_description": npm_info.get("description", "No description available"),
+        "component_purl": purl,
+        "license_id": npm_info.get("license", "Unknown"),
+        "package_manager": package_manager
+    }
+
+    component = fill_component_template(component_template, component_info)
+    component["externalReferences"] = external_references
+    return component
 
 
 def fetch_npm_info(package_name, version):
-    url = f"https://registry.npmjs.org/{package_name}/{version}"
-    response = requests.get(url)
-    if response.status_code == 200:
-        return response.json()
-    else:
-        print(f"Failed to fetch data for {package_name}@{version}")
-        return None
+    url = RegistryClient.metadata_url("npm", package_name, version)
+    npm_info = RegistryClient.fetch_metadata("npm", package_name, version, url)
+    if npm_info is None and not RegistryClient.budget_exhausted():
+        print(f"Failed to fetch data for {package_name}@{version} ({RegistryClient.failure_reason('npm', package_name, version)})")
+    return npm_info
 
 
-def add_top_level_dependencies(sbom, package_json, package_manager):
+def fetch_npm_packument(package_name):
+    url = f"{RegistryClient.NPM_REGISTRY_URL}/{package_name}"
+    return RegistryClient.fetch_npm_packument(package_name, url)
+
+
+def fetch_npm_versions_from_packument(package_name, versions):
+    """
+    Answers several versions of one package from a single packument download.
+    Versions already fresh in the metadata cache are served from it instead.
+    """
+    infos = {version: RegistryClient.get_cached_metadata("npm", package_name, version) for version in versions}
+    missing = [version for version, info in infos.items() if info is None]
+    if not missing:
+        return infos
+
+    packument = fetch_npm_packument(package_name)
+    if packument is None:
+        if not RegistryClient.budget_exhausted():
+            print(f"Failed to fetch packument for {package_name} ({RegistryClient.failure_reason('npm', package_name, None)})")
+        return infos
+
+    for version in missing:
+        npm_info = packument.get("versions", {}).get(version)
+        RegistryClient.store_metadata("npm", package_name, version, npm_info)
+        infos[version] = npm_info
+    return infos
+
+
+def packument_versions_for(keys):
+    """
+    Returns {package_name: versions} for the packages among (package_name, version) keys
+    that appear at PACKUMENT_MIN_VERSIONS versions or more.
+    """
+    versions_by_name = {}
+    for package_name, version in keys:
+        versions_by_name.setdefault(package_name, []).append(version)
+    return {package_name: versions for package_name, versions in versions_by_name.items()
+            if len(versions) >= PACKUMENT_MIN_VERSIONS}
+
+
+def fetch_npm_infos(keys, max_workers=None, packument_versions=None, prefetched=None):
+    """
+    Fetches metadata for (package_name, version) keys and returns it in the same order.
+    Packages in packument_versions (by default those appearing at PACKUMENT_MIN_VERSIONS
+    versions or more among keys) are answered from one packument request for all of their
+    listed versions; the ones keys do not ask for yet are kept in prefetched, a dict shared
+    between calls, for the calls that will.
+    """
+    if packument_versions is None:
+        packument_versions = packument_versions_for(keys)
+    if prefetched is None:
+        prefetched = {}
+
+    results = {}
+    # Both kinds of request share one pool so packuments and single versions download together
+    tasks = []
+    packuments = set()
+    for package_name, version in dict.fromkeys(keys):
+        if (package_name, version) in prefetched:
+            results[(package_name, version)] = prefetched.pop((package_name, version))
+        elif version in packument_versions.get(package_name, ()):
+            if package_name not in packuments:
+                packuments.add(package_name)
+                tasks.append((fetch_npm_versions_from_packument, (package_name, packument_versions[package_name])))
+        else:
+            tasks.append((fetch_npm_info, (package_name, version)))
+
+    wanted = set(keys)
+    for (fetch, args), result in zip(tasks, RegistryClient.fetch_all(tasks, lambda fetch, args: fetch(*args), max_workers)):
+        if fetch is fetch_npm_info:
+            results[args] = result
+            continue
+        for version, npm_info in result.items():
+            key = (args[0], version)
+            if key in wanted:
+                results[key] = npm_info
+            else:
+                prefetched[key] = npm_info
+
+    return [results.get(key) for key in keys]
+
+
+def build_top_level_dependency(sbom, package_json, package_manager):
     top_level_dependencies = package_json.get("dependencies", {})
     top_level_refs = [
         f"pkg:{package_manager}/{dep_name}@{dep_version.lstrip('^~<>')}"
         for dep_name, dep_version in top_level_dependencies.items()
     ]
 
-    top_level_entry = {
+    return {
         "ref": sbom["metadata"]["component"]["bom-ref"],
         "dependsOn": top_level_refs
     }
 
-    sbom["dependencies"].insert(0, top_level_entry)
 
+def add_top_level_dependencies(sbom, package_json, package_manager):
+    sbom["dependencies"].insert(0, build_top_level_dependency(sbom, package_json, package_manager))
 
-def generate_sbom_npm_from_lockfile(lockfile, sbom_template, component_template, package_manager, package_json):
+
+def generate_sbom_npm_from_lockfile(lockfile, sbom_template, component_template, package_manager, package_json, previous_components=None):
     sbom = fill_sbom_template(sbom_template, package_manager)
 
     processed_packages = set()
-    process_dependencies(lockfile, sbom["components"], sbom["dependencies"], processed_packages, component_template, package_manager)
+    process_dependencies(lockfile, sbom["components"], sbom["dependencies"], processed_packages, component_template, package_manager,
+                         previous_components=previous_components)
     add_top_level_dependencies(sbom, package_json, package_manager)
 
     return sbom
 
 
-def main():
+def write_sbom_npm_from_lockfile(lockfile, sbom_template, component_template, package_manager, package_json, output_file, previous_components=None):
+    sbom = fill_sbom_template(sbom_template, package_manager)
+
+    with SbomWriter.StreamingSbomWriter(output_file, sbom) as writer:
+        # The top-level entry leads the dependencies list, so emit it before any package
+        writer.dependencies.append(build_top_level_dependency(sbom, package_json, package_manager))
+        process_dependencies(lockfile, writer.components, writer.dependencies, set(), component_template, package_manager,
+                             previous_components=previous_components)
+
+
+def main(package_json_file=str(Paths.INPUT_DIR / "package.json"), output_file=str(Paths.SBOMS_DIR / "npm_sbom3.json"), previous_sbom=None):
     # Load the SBOM and component templates
-    sbom_template = load_json_file("../templates/sbom_template.json")
-    component_template = load_json_file("../templates/sbom_component_template.json")
+    sbom_template = TemplateRenderer.load_template(str(Paths.TEMPLATES_DIR / "sbom_template.json"))
+    component_template = TemplateRenderer.load_template(str(Paths.TEMPLATES_DIR / "sbom_component_template.json"))
 
     package_manager = "npm"  # Set your package manager here
 
     # Load the package.json file
-    package_json = load_json_file("../input/package.json")
+    package_json = load_json_file(package_json_file)
 
     # Generate package-lock.json in a temporary environment
-    lockfile = generate_package_lock_json()
+    with tempfile.TemporaryDirectory() as temp_dir:
+        with Instrumentation.stage("resolve"):
+            lockfile = generate_package_lock_json(temp_dir, package_json_file)
 
-    if lockfile is None:
-        print("Failed to generate package-lock.json")
-        return
+        if lockfile is None:
+            print("Failed to generate package-lock.json")
+            return
 
-    sbom = generate_sbom_npm_from_lockfile(lockfile, sbom_template, component_template, package_manager, package_json)
+        previous_components = IncrementalSbom.load_previous_components(IncrementalSbom.previous_sbom_for(output_file, previous_sbom))
 
-    # Write SBOM to a file
-    with open("../sboms/npm_sbom3.json", "w") as sbom_file:
-        json.dump(sbom, sbom_file, indent=4)
+        # Stream the SBOM to a file as components are generated
+        with Instrumentation.stage("generate", profile=True):
+            write_sbom_npm_from_lockfile(lockfile, sbom_template, component_template, package_manager, package_json,
+                                         output_file, previous_components)
 
     print("SBOM.json generated successfully!")
+    print(RegistryClient.cache_summary())
+    if RegistryClient.enrichment_summary():
+        print(RegistryClient.enrichment_summary())
 
 
 if __name__ == "__main__":
     main()
+
+
+def run(**kwargs):
+    main(**kwargs)
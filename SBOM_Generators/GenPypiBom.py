@@ -1,17 +1,28 @@
 import subprocess
 import os
 import sys
-import venv
 import shutil
-import requests
 import json
+import re
 import uuid
-from pathlib import Path
+from collections import deque
 
-p = Path(__file__).resolve()
+try:
+    from packaging.requirements import InvalidRequirement, Requirement
+except ImportError:  # pip vendors packaging, so it is always importable alongside pip
+    from pip._vendor.packaging.requirements import InvalidRequirement, Requirement
+
+from SBOM_Generators import ArtifactHasher, DependencyGraph, IncrementalSbom, Instrumentation, MetadataSnapshot, Paths, Pipeline, RegistryClient, SbomWriter, SubprocessPool, TemplateRenderer
+
+# "report" resolves requirements with pip's --dry-run --report without installing anything;
+# "venv" installs them into a throwaway virtualenv and reads the installed distributions' metadata
+RESOLVER = os.environ.get("SBOM_PYPI_RESOLVER", "report")
 
 
 def create_virtualenv(env_dir):
+    # Only the legacy venv resolver needs venv, so it is imported here
+    import venv
+
     venv.create(env_dir, with_pip=False)
     python_executable = os.path.join(env_dir, 'bin', 'python') if os.name != 'nt' else os.path.join(env_dir, 'Scripts',
                                                                                                     'python.exe')
@@ -19,6 +30,12 @@ def create_virtualenv(env_dir):
 
 
 def download_get_pip(python_executable):
+    if RegistryClient.OFFLINE:
+        print("Cannot download get-pip.py in offline mode; use --pypi-resolver report")
+        sys.exit(1)
+    # Only the legacy venv resolver downloads get-pip.py; registry requests go through RegistryClient
+    import requests
+
     get_pip_url = "https://bootstrap.pypa.io/get-pip.py"
     get_pip_path = "get-pip.py"
     try:
@@ -31,7 +48,7 @@ def download_get_pip(python_executable):
         sys.exit(1)
 
     try:
-        subprocess.run([python_executable, get_pip_path], check=True)
+        SubprocessPool.run([python_executable, get_pip_path], check=True)
     except subprocess.CalledProcessError as e:
         print(f"Failed to install pip: {e.stderr}")
         sys.exit(1)
@@ -41,68 +58,103 @@ def download_get_pip(python_executable):
 
 
 def capture_installed_packages(python_executable):
-    result = subprocess.run([python_executable, "-m", "pip", "list", "--no-cache-dir", "--format=freeze"],
-                            stdout=subprocess.PIPE, text=True, check=True)
+    result = SubprocessPool.run([python_executable, "-m", "pip", "list", "--no-cache-dir", "--format=freeze"],
+                                stdout=subprocess.PIPE, text=True, check=True)
     return set(result.stdout.splitlines())
 
 
 def install_dependencies(python_executable, requirements_file):
     try:
-        subprocess.run([python_executable, "-m", "pip", "install", "--no-cache-dir", "-r", requirements_file],
-                       check=True)
+        SubprocessPool.run([python_executable, "-m", "pip", "install", "--no-cache-dir", "-r", requirements_file],
+                           check=True)
     except subprocess.CalledProcessError as e:
         print(f"Error installing dependencies: {e.stderr}")
         sys.exit(1)
 
 
-def get_dependency_tree(python_executable):
+# Runs inside the target environment and prints its distributions and marker environment as JSON
+INSTALLED_METADATA_SCRIPT = """
+import json
+from importlib import metadata
+from pip._vendor.packaging.markers import default_environment
+
+distributions = [
+    {"name": d.metadata["Name"], "version": d.version, "requires_dist": d.requires or []}
+    for d in metadata.distributions()
+]
+print(json.dumps({"environment": default_environment(), "distributions": distributions}))
+"""
+
+
+def get_installed_metadata(python_executable):
     try:
-        subprocess.run([python_executable, "-m", "pip", "install", "pipdeptree"], check=True)
-        result = subprocess.run([python_executable, "-m", "pipdeptree", "--warn", "silence"],
-                                stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, check=True, encoding='utf-8')
-        return result.stdout
+        result = SubprocessPool.run([python_executable, "-c", INSTALLED_METADATA_SCRIPT],
+                                    stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, check=True, encoding='utf-8')
+        return json.loads(result.stdout)
     except subprocess.CalledProcessError as e:
-        print(f"Error generating dependency tree: {e.stderr}")
+        print(f"Error reading installed package metadata: {e.stderr}")
         sys.exit(1)
 
 
-def parse_dependency_tree(dependency_tree, relevant_packages, python_executable):
-    parent_map = {}
-    current_parent = None
-
-    for line in dependency_tree.splitlines():
-        if not line.strip():
-            continue
+def parse_requirements(requires_dist):
+    requirements = []
+    for requirement in requires_dist or []:
+        try:
+            requirements.append(Requirement(requirement))
+        except InvalidRequirement:
+            print(f"Skipping unparsable requirement: {requirement}")
+    return requirements
+
+
+def marker_applies(marker, environment, extras):
+    if marker is None:
+        return True
+    return any(marker.evaluate(dict(environment, extra=extra)) for extra in ("", *extras))
+
+
+def build_parent_map(distributions, environment, requested_extras=None):
+    """
+    Builds relevant_packages and parent_map from distribution metadata records
+    ({"name", "version", "requires_dist"}). Environment markers are evaluated against
+    the target environment, and extras requested by a parent (e.g. requests[socks])
+    activate the child's extra-only requirements. Every package records its own
+    direct children, so deep trees keep every level of nesting.
+    """
+    requested_extras = requested_extras or {}
+    by_key = {MetadataSnapshot.canonicalize_name(d["name"]): d for d in distributions}
+    requirements = {key: parse_requirements(d.get("requires_dist")) for key, d in by_key.items()}
+    active_extras = {key: {MetadataSnapshot.canonicalize_name(e) for e in requested_extras.get(key, ())} for key in by_key}
+    edges = {key: {} for key in by_key}  # dicts are used as insertion-ordered sets
+
+    pending = deque(by_key)
+    queued = set(by_key)
+    while pending:
+        key = pending.popleft()
+        queued.discard(key)
+        for requirement in requirements[key]:
+            child_key = MetadataSnapshot.canonicalize_name(requirement.name)
+            if child_key not in by_key or not marker_applies(requirement.marker, environment, active_extras[key]):
+                continue
 
-        # Check if the line is a child package
-        if "├──" in line or "└──" in line:
-            package_info = line.split('[')[0].split()  # Extracts 'six' from '└── six'
-            package_name = package_info[1].lower()
-            version_info = line.split('installed: ')[-1].strip(']')
-            child_package = f"{package_name}=={version_info}"
-
-            if current_parent:
-                if current_parent not in parent_map:
-                    parent_map[current_parent] = []
-                if child_package not in parent_map[current_parent]:  # Prevent duplicate children
-                    parent_map[current_parent].append(child_package)
-
-        else:  # Parent package
-            package_name_version = line.split()[0].strip()
-            if package_name_version in relevant_packages:
-                current_parent = package_name_version
-                if current_parent not in parent_map:
-                    parent_map[current_parent] = []
-            else:
-                # Reset current_parent if the new package is not in relevant_packages
-                current_parent = None
+            edges[key][child_key] = None
+            new_extras = {MetadataSnapshot.canonicalize_name(e) for e in requirement.extras} - active_extras[child_key]
+            if new_extras:
+                # The child's extra-only requirements may now apply, so revisit it
+                active_extras[child_key] |= new_extras
+                if child_key not in queued:
+                    pending.append(child_key)
+                    queued.add(child_key)
 
-    # Ensure all relevant packages are included as parents
-    for package in relevant_packages:
-        if package not in parent_map:
-            parent_map[package] = []
+    relevant_packages = set()
+    parent_map = {}
+    for key, distribution in by_key.items():
+        parent = f"{distribution['name']}=={distribution['version']}"
+        relevant_packages.add(parent)
+        parent_map[parent] = {
+            f"{by_key[child]['name'].lower()}=={by_key[child]['version']}": None for child in edges[key]
+        }
 
-    return parent_map
+    return relevant_packages, parent_map
 
 
 def load_json_file(template_file):
@@ -111,19 +163,9 @@ def load_json_file(template_file):
     return template
 
 
-def replace_placeholders(data, replacements):
-    if isinstance(data, dict):
-        return {key: replace_placeholders(value, replacements) for key, value in data.items()}
-    elif isinstance(data, list):
-        return [replace_placeholders(item, replacements) for item in data]
-    elif isinstance(data, str):
-        return data.format(**replacements)
-    else:
-        return data
-
-
 def fill_component_template(template, component_info):
-    return replace_placeholders(template, component_info)
+    with Instrumentation.stage("render", detail=True):
+        return TemplateRenderer.render(template, component_info)
 
 
 def fill_sbom_template(template, package_manager):
@@ -137,56 +179,85 @@ def fill_sbom_template(template, package_manager):
         "tool_version": "0.1.0",
         "package_manager": package_manager
     }
-    return replace_placeholders(template, replacements)
-
+    return TemplateRenderer.render(template, replacements)
+
+
+def generate_sbom(parent_map, sbom_components, sbom_dependencies, component_template, package_manager, max_workers=None,
+                  previous_components=None, archive_hashes=None):
+    RegistryClient.start_budget()
+    parents = (parent.lower().split("==") for parent in parent_map)
+    # Digests pip's report recorded for the archives it resolved, by (lowercased name, version)
+    archive_hashes = archive_hashes if archive_hashes and ArtifactHasher.ENABLED else {}
+
+    # Requirements are enriched and hashed on pipeline threads while earlier batches are rendered here
+    def enrich(batch):
+        # Only packages without a component in the previous SBOM need registry metadata
+        reused = [IncrementalSbom.reuse(previous_components, f"pkg:{package_manager}/{parent_name}@{parent_version}")
+                  for parent_name, parent_version in batch]
+        pending = [tuple(parent) for parent, component in zip(batch, reused) if component is None]
+        pypi_infos = dict(zip(pending, RegistryClient.fetch_all(pending, fetch_pypi_info, max_workers)))
+        return [(parent, component, pypi_infos.get(tuple(parent))) for parent, component in zip(batch, reused)]
+
+    # Wheels are only looked up in pip's local wheel cache when the report recorded no digest for them
+    def locate_wheel(item):
+        parent, component, pypi_info = item
+        if component is not None or tuple(parent) in archive_hashes:
+            return None
+        return ArtifactHasher.pip_wheel_path(*parent)
+
+    def hash_wheels(batch):
+        return [(item, archive_hashes.get(tuple(item[0])) or hashes)
+                for item, hashes in ArtifactHasher.hash_batch(batch, locate_wheel)]
+
+    stages = [("enrich", enrich), ("hash", hash_wheels)]
 
-def generate_sbom(parent_map, sbom_components, sbom_dependencies, component_template, package_manager):
     # Generate components list
-    for parent, children in parent_map.items():
-        parent_name, parent_version = parent.lower().split("==")
-        pypi_info = fetch_pypi_info(parent_name, parent_version)
+    for ((parent_name, parent_version), component, pypi_info), hashes in Pipeline.run(parents, stages):
         purl = f"{parent_name}@{parent_version}"  # Without "pkg:npm/" prefix for the bom-ref
-        parent_purl = f"pkg:{package_manager}/{purl}"  # Full purl with "pkg:{package_manager}/" prefix
-
-        if pypi_info:
-            info = pypi_info.get('info', {})
-            project_urls = info.get('project_urls', {})
-            external_references = []
-            for key, url in project_urls.items():
-                if "github.com" in url.lower():
-                    external_references.append({"type": "vcs", "url": url})
-                else:
-                    external_references.append({"type": key.lower(), "url": url})
-
-            component_info = {
-                "component_bom_ref": purl,
-                "component_name": parent_name,
-                "component_version": parent_version,
-                "component_publisher": info.get('author', 'Unknown'),
-                "component_description": info.get('summary', 'No description available'),
-                "component_purl": purl,
-                "license_id": info.get("license", "Unknown"),
-                "package_manager": package_manager
-            }
-
-            component = fill_component_template(component_template, component_info)
-            component["externalReferences"] = external_references
+
+        if component is not None:
             sbom_components.append(component)
+            continue
 
-    # Generate dependencies list
-    for parent, children in parent_map.items():
-        parent_purl = f"pkg:{package_manager}/{parent.lower().split('==')[0]}@{parent.split('==')[1]}"
-        depends_on = [
-            f"pkg:{package_manager}/{child.lower().split('==')[0]}@{child.split('==')[1]}" for child in children
-        ]
-        dependency = {
-            "ref": parent_purl,
-            "dependsOn": depends_on
+        info = pypi_info.get('info', {}) if pypi_info else {}
+        project_urls = info.get('project_urls', {})
+        external_references = []
+        for key, url in project_urls.items():
+            if "github.com" in url.lower():
+                external_references.append({"type": "vcs", "url": url})
+            else:
+                external_references.append({"type": key.lower(), "url": url})
+
+        component_info = {
+            "component_bom_ref": purl,
+            "component_name": parent_name,
+            "component_version": parent_version,
+            "component_publisher": info.get('author', 'Unknown'),
+            "component_description": info.get('summary', 'No description available'),
+            "component_purl": purl,
+            "license_id": info.get("license", "Unknown"),
+            "package_manager": package_manager
         }
-        sbom_dependencies.append(dependency)
 
+        component = fill_component_template(component_template, component_info)
+        component["externalReferences"] = external_references
+        if hashes:
+            component["hashes"] = hashes
+        if not pypi_info:
+            # Written with the resolved name and version rather than left out of the SBOM
+            RegistryClient.mark_unenriched(component, RegistryClient.failure_reason("pypi", parent_name, parent_version))
+        sbom_components.append(component)
+
+    # Generate dependencies list; each "name==version" is turned into a purl once
+    graph = DependencyGraph.DependencyGraph()
+    node_id = graph.interner(lambda requirement: f"pkg:{package_manager}/{requirement.lower().split('==')[0]}@{requirement.split('==')[1]}")
+    for parent, children in parent_map.items():
+        graph.add_ids(node_id(parent), [node_id(child) for child in children])
 
-def add_top_level_dependencies(sbom, requirements_txt, package_manager):
+    sbom_dependencies.extend(graph.iter_dependencies())
+
+
+def build_top_level_dependency(sbom, requirements_txt, package_manager):
     top_level_refs = []
     with open(requirements_txt, 'r') as file:
         for line in file:
@@ -197,79 +268,150 @@ def add_top_level_dependencies(sbom, requirements_txt, package_manager):
                 name, version = line.lower().split('==', 1)
                 top_level_refs.append(f"pkg:{package_manager}/{name}@{version.lstrip('^~<>')}")
 
-    top_level_entry = {
+    return {
         "ref": sbom["metadata"]["component"]["bom-ref"],
         "dependsOn": top_level_refs
     }
 
-    sbom["dependencies"].insert(0, top_level_entry)
+
+def add_top_level_dependencies(sbom, requirements_txt, package_manager):
+    sbom["dependencies"].insert(0, build_top_level_dependency(sbom, requirements_txt, package_manager))
 
 
 def fetch_pypi_info(package_name, version):
-    url = f"https://pypi.org/pypi/{package_name}/{version}/json"
-    response = requests.get(url)
-    if response.status_code == 200:
-        return response.json()
-    else:
-        print(f"Failed to fetch data for {package_name}=={version}")
-        return None
+    url = RegistryClient.metadata_url("pypi", package_name, version)
+    pypi_info = RegistryClient.fetch_metadata("pypi", package_name, version, url)
+    if pypi_info is None and not RegistryClient.budget_exhausted():
+        print(f"Failed to fetch data for {package_name}=={version} ({RegistryClient.failure_reason('pypi', package_name, version)})")
+    return pypi_info
+
+
+def run_pip_report(python_executable, requirements_file):
+    command = [python_executable, "-m", "pip", "install", "--dry-run", "--ignore-installed", "--quiet",
+               "--report", "-", "-r", requirements_file]
+    if RegistryClient.OFFLINE:
+        # Resolve against local distributions only, e.g. a wheelhouse given by PIP_FIND_LINKS
+        command.append("--no-index")
+    result = SubprocessPool.run(
+        command,
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, check=True, encoding='utf-8'
+    )
+    return json.loads(result.stdout)
+
+
+def parse_pip_report(report):
+    """
+    Builds relevant_packages, parent_map and archive_hashes from a pip installation report.
+    archive_hashes maps (lowercased name, version) to the CycloneDX hashes of the archive
+    pip resolved, for the packages whose download_info records a digest.
+    """
+    distributions = []
+    requested_extras = {}
+    archive_hashes = {}
+    for item in report.get("install", []):
+        metadata = item.get("metadata", {})
+        distributions.append(metadata)
+        if item.get("requested_extras"):
+            requested_extras[MetadataSnapshot.canonicalize_name(metadata["name"])] = item["requested_extras"]
+        hashes = ArtifactHasher.archive_info_hashes(item.get("download_info", {}).get("archive_info", {}))
+        if hashes:
+            archive_hashes[(metadata["name"].lower(), metadata["version"])] = hashes
+
+    relevant_packages, parent_map = build_parent_map(distributions, report.get("environment", {}), requested_extras)
+    return relevant_packages, parent_map, archive_hashes
+
+
+def resolve_with_pip_report(requirements_file, python_executable=sys.executable):
+    try:
+        report = run_pip_report(python_executable, requirements_file)
+    except subprocess.CalledProcessError as e:
+        print(f"Error resolving dependencies: {e.stderr}")
+        sys.exit(1)
 
+    return parse_pip_report(report)
 
-def main():
-    requirements_file = "../input/requirements.txt"
-    if not os.path.exists(requirements_file):
-        print(f"{requirements_file} does not exist.")
-        return
 
+def resolve_with_virtualenv(requirements_file):
     env_dir = ".temp_env"
     if os.path.exists(env_dir):
         shutil.rmtree(env_dir)
 
     python_executable = create_virtualenv(env_dir)
 
-    # Manually install pip in the virtual environment
-    download_get_pip(python_executable)
+    try:
+        # Manually install pip in the virtual environment
+        download_get_pip(python_executable)
 
-    # Capture the list of installed packages before installing dependencies
-    pre_install_packages = capture_installed_packages(python_executable)
+        # Capture the list of installed packages before installing dependencies
+        pre_install_packages = capture_installed_packages(python_executable)
 
-    # Install the specified dependencies
-    install_dependencies(python_executable, requirements_file)
+        # Install the specified dependencies
+        install_dependencies(python_executable, requirements_file)
 
-    # Capture the list of installed packages after installation
-    post_install_packages = capture_installed_packages(python_executable)
+        # Capture the list of installed packages after installation
+        post_install_packages = capture_installed_packages(python_executable)
 
-    # Determine relevant packages (newly installed ones)
-    relevant_packages = post_install_packages - pre_install_packages
+        # Determine relevant packages (newly installed ones)
+        relevant_keys = {MetadataSnapshot.canonicalize_name(package.split("==")[0])
+                         for package in post_install_packages - pre_install_packages if "==" in package}
 
-    # Generate the dependency tree
-    dependency_tree = get_dependency_tree(python_executable)
+        # Build the dependency graph from the installed distributions' Requires-Dist metadata
+        installed = get_installed_metadata(python_executable)
+        distributions = [d for d in installed["distributions"] if MetadataSnapshot.canonicalize_name(d["name"]) in relevant_keys]
+        relevant_packages, parent_map = build_parent_map(distributions, installed["environment"])
+    finally:
+        shutil.rmtree(env_dir)
 
-    # Parse the dependency tree to filter only relevant packages
-    parent_map = parse_dependency_tree(dependency_tree, relevant_packages, python_executable)
+    # Installed distributions carry no archive digests; their wheels are hashed from pip's cache
+    return relevant_packages, parent_map, {}
+
+
+def pip_supports_report(python_executable=sys.executable):
+    # --dry-run and --report were added in pip 22.2
+    result = SubprocessPool.run([python_executable, "-m", "pip", "--version"], stdout=subprocess.PIPE, text=True)
+    match = re.match(r"pip (\d+)\.(\d+)", result.stdout)
+    return bool(match) and (int(match.group(1)), int(match.group(2))) >= (22, 2)
+
+
+def resolve_dependencies(requirements_file):
+    if RESOLVER == "report" and pip_supports_report():
+        return resolve_with_pip_report(requirements_file)
+    return resolve_with_virtualenv(requirements_file)
+
+
+def main(requirements_file=str(Paths.INPUT_DIR / "requirements.txt"), output_file=str(Paths.SBOMS_DIR / "pypi_sbom.json"), previous_sbom=None):
+    if not os.path.exists(requirements_file):
+        print(f"{requirements_file} does not exist.")
+        return
+
+    with Instrumentation.stage("resolve"):
+        relevant_packages, parent_map, archive_hashes = resolve_dependencies(requirements_file)
 
     # Load the SBOM and component templates
-    sbom_template = load_json_file("../templates/sbom_template.json")
-    component_template = load_json_file("../templates/sbom_component_template.json")
+    sbom_template = TemplateRenderer.load_template(str(Paths.TEMPLATES_DIR / "sbom_template.json"))
+    component_template = TemplateRenderer.load_template(str(Paths.TEMPLATES_DIR / "sbom_component_template.json"))
 
     package_manager = "pypi"  # Set your package manager here
 
     sbom = fill_sbom_template(sbom_template, package_manager)
-    generate_sbom(parent_map, sbom["components"], sbom["dependencies"], component_template, package_manager)
-    add_top_level_dependencies(sbom, requirements_file, package_manager)
 
-    # Write SBOM to a file
-    with open("../sboms/pypi_sbom.json", "w") as sbom_file:
-        json.dump(sbom, sbom_file, indent=4)
+    previous_components = IncrementalSbom.load_previous_components(IncrementalSbom.previous_sbom_for(output_file, previous_sbom))
 
-    print("SBOM.json generated successfully!")
+    # Stream the SBOM to a file as components are generated
+    with Instrumentation.stage("generate", profile=True), SbomWriter.StreamingSbomWriter(output_file, sbom) as writer:
+        writer.dependencies.append(build_top_level_dependency(sbom, requirements_file, package_manager))
+        generate_sbom(parent_map, writer.components, writer.dependencies, component_template, package_manager,
+                      previous_components=previous_components, archive_hashes=archive_hashes)
 
-    shutil.rmtree(env_dir)
+    print("SBOM.json generated successfully!")
+    print(RegistryClient.cache_summary())
+    if RegistryClient.enrichment_summary():
+        print(RegistryClient.enrichment_summary())
 
 
 if __name__ == "__main__":
     main()
 
 
-def run():
-    main()
\ No newline at end of file
+def run(**kwargs):
+    main(**kwargs)
@@ -0,0 +1,52 @@
+import os
+
+from SBOM_Generators import Instrumentation, RegistryClient, SbomTools, SbomWriter
+
+# Set by --incremental: generators reuse the components of the SBOM they are about to overwrite
+ENABLED = os.environ.get("SBOM_INCREMENTAL", "0") == "1"
+
+
+def previous_sbom_for(output_file, previous_sbom=None):
+    """
+    Returns the SBOM to carry components over from: previous_sbom when given,
+    otherwise the file the SBOM for output_file is about to be written to in incremental mode.
+    """
+    if previous_sbom:
+        return previous_sbom
+    return SbomWriter.output_path(output_file) if ENABLED else None
+
+
+def load_previous_components(previous_sbom):
+    """
+    Indexes the components of a previously generated SBOM by purl. Components that
+    were already enriched and rendered for the same purl are reused as they are;
+    placeholders written without registry metadata are left out so they are fetched again.
+    Returns an empty index when there is no usable previous SBOM.
+    """
+    if not previous_sbom or not os.path.isfile(previous_sbom):
+        return {}
+
+    index = {}
+    try:
+        with Instrumentation.stage("parse"):
+            document = SbomTools.open_sbom(previous_sbom)
+            for component in document.get("components", []):
+                purl = component.get("purl") or component.get("bom-ref")
+                if purl and not RegistryClient.is_unenriched(component):
+                    index[purl] = component
+    except (OSError, ValueError) as e:
+        print(f"Ignoring previous SBOM {previous_sbom}: {e}")
+        return {}
+
+    print(f"Loaded {len(index)} components from previous SBOM {previous_sbom}")
+    return index
+
+
+def reuse(previous_components, purl):
+    """
+    Returns the previous component for purl, or None when it has to be generated.
+    """
+    component = previous_components.get(purl) if previous_components else None
+    if component is not None:
+        Instrumentation.count("components_reused")
+    return component
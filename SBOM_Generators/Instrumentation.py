@@ -0,0 +1,167 @@
+import cProfile
+import json
+import os
+import sys
+import threading
+import time
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+# Set by enable(): records the per-call trace and the fine-grained (per component) stages
+PROFILING = False
+CPROFILE_DIR = None
+
+_lock = threading.Lock()
+_local = threading.local()
+_stages = {}
+_counters = {}
+_events = []
+_profiles = {}
+_origin = time.perf_counter()
+
+
+def enable(cprofile_dir=None):
+    global PROFILING, CPROFILE_DIR
+    PROFILING = True
+    CPROFILE_DIR = cprofile_dir
+
+
+class stage:
+    """
+    Times a generator stage (wall and process CPU time). Time spent in nested stages on the
+    same thread is attributed to the inner stage only. Stages on different threads (e.g.
+    Pipeline workers) overlap, so their totals are thread time and can add up to more than
+    the run time; process CPU time also includes whatever other threads did meanwhile.
+
+    detail=True marks per-component stages (render, serialize) that are only timed when
+    profiling is enabled; profile=True runs the block under cProfile when a cProfile
+    output directory was given.
+    """
+
+    __slots__ = ("name", "detail", "profile", "_active", "_start", "_cpu")
+
+    def __init__(self, name, detail=False, profile=False):
+        self.name = name
+        self.detail = detail
+        self.profile = profile
+
+    def __enter__(self):
+        self._active = PROFILING or not self.detail
+        if not self._active:
+            return self
+
+        stack = getattr(_local, "stack", None)
+        if stack is None:
+            stack = _local.stack = []
+        stack.append([0.0, 0.0])
+
+        if self.profile and CPROFILE_DIR:
+            with _lock:
+                profiler = _profiles.setdefault(self.name, cProfile.Profile())
+            profiler.enable()
+
+        self._start = time.perf_counter()
+        self._cpu = time.process_time()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if not self._active:
+            return False
+
+        wall = time.perf_counter() - self._start
+        cpu = time.process_time() - self._cpu
+        if self.profile and CPROFILE_DIR:
+            _profiles[self.name].disable()
+
+        stack = _local.stack
+        nested_wall, nested_cpu = stack.pop()
+        if stack:
+            stack[-1][0] += wall
+            stack[-1][1] += cpu
+
+        with _lock:
+            totals = _stages.get(self.name)
+            if totals is None:
+                totals = _stages[self.name] = {"seconds": 0.0, "cpu_seconds": 0.0, "calls": 0}
+            totals["seconds"] += wall - nested_wall
+            totals["cpu_seconds"] += cpu - nested_cpu
+            totals["calls"] += 1
+            if PROFILING and not self.detail:
+                _events.append({
+                    "stage": self.name,
+                    "thread": threading.current_thread().name,
+                    "start": self._start - _origin,
+                    "seconds": wall,
+                    "cpu_seconds": cpu,
+                })
+        return False
+
+
+def count(name, amount=1):
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + amount
+
+
+def snapshot():
+    with _lock:
+        return {name: dict(totals) for name, totals in _stages.items()}
+
+
+def counters():
+    with _lock:
+        return dict(_counters)
+
+
+def peak_rss_bytes(who="self"):
+    if resource is None:
+        return None
+    usage = resource.getrusage(resource.RUSAGE_SELF if who == "self" else resource.RUSAGE_CHILDREN)
+    # ru_maxrss is reported in bytes on macOS and in kilobytes elsewhere
+    return usage.ru_maxrss if sys.platform == "darwin" else usage.ru_maxrss * 1024
+
+
+def report():
+    with _lock:
+        events = list(_events)
+    return {
+        "stages": snapshot(),
+        "counters": counters(),
+        "peak_rss_bytes": peak_rss_bytes("self"),
+        "children_peak_rss_bytes": peak_rss_bytes("children"),
+        "events": events,
+    }
+
+
+def write_trace(trace_file, **extra):
+    """
+    Writes the collected stages, counters, peak RSS and trace events as JSON, and dumps
+    any cProfile data to <CPROFILE_DIR>/<stage>.prof.
+    """
+    trace = {"created_at": time.time(), "argv": sys.argv}
+    trace.update(report())
+    trace.update(extra)
+    with open(trace_file, "w") as f:
+        json.dump(trace, f, indent=4)
+    dump_profiles()
+
+
+def dump_profiles():
+    if CPROFILE_DIR:
+        os.makedirs(CPROFILE_DIR, exist_ok=True)
+        with _lock:
+            profiles = dict(_profiles)
+        for name, profiler in profiles.items():
+            profiler.dump_stats(os.path.join(CPROFILE_DIR, f"{name}.prof"))
+
+
+def reset():
+    global _origin
+    with _lock:
+        _stages.clear()
+        _counters.clear()
+        _events.clear()
+        _profiles.clear()
+        _origin = time.perf_counter()
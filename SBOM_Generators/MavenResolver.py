@@ -0,0 +1,460 @@
+import os
+import re
+import xml.etree.ElementTree as ET
+from collections import deque
+
+from SBOM_Generators import StreamingParsers
+
+# Local repository in the standard ~/.m2 layout: <group/as/path>/<artifact>/<version>/<artifact>-<version>.pom
+REPOSITORY = os.environ.get("SBOM_MAVEN_REPO", os.path.join(os.path.expanduser("~"), ".m2", "repository"))
+
+# Scopes that end up in the SBOM, the same set the CycloneDX plugin records as maven.scopes
+INCLUDED_SCOPES = ("compile", "provided", "runtime", "system")
+
+# (scope of a dependency, scope declared by its own dependency) -> scope of the transitive dependency.
+# Pairs that are missing (anything under provided/test/system in the dependency's POM) are not inherited.
+SCOPE_PROPAGATION = {
+    ("compile", "compile"): "compile",
+    ("compile", "runtime"): "runtime",
+    ("provided", "compile"): "provided",
+    ("provided", "runtime"): "provided",
+    ("runtime", "compile"): "runtime",
+    ("runtime", "runtime"): "runtime",
+    ("test", "compile"): "test",
+    ("test", "runtime"): "test",
+}
+
+# Maven scope -> CycloneDX component scope
+COMPONENT_SCOPES = {
+    "compile": "required",
+    "runtime": "required",
+    "provided": "optional",
+    "system": "optional",
+    "test": "excluded",
+}
+
+PROPERTY_PATTERN = re.compile(r"\$\{([^}]+)\}")
+RANGE_PATTERN = re.compile(r"([\[(])([^\])]*)([\])])")
+
+
+def _child(element, name):
+    if element is not None:
+        for child in element:
+            if StreamingParsers.local_name(child.tag) == name:
+                return child
+    return None
+
+
+def _children(element, name):
+    return [child for child in element if StreamingParsers.local_name(child.tag) == name] if element is not None else []
+
+
+def _text(element, name, default=None):
+    child = _child(element, name)
+    if child is None or child.text is None:
+        return default
+    return child.text.strip()
+
+
+def _parse_dependency(element):
+    exclusions = set()
+    for exclusion in _children(_child(element, "exclusions"), "exclusion"):
+        exclusions.add((_text(exclusion, "groupId", "*"), _text(exclusion, "artifactId", "*")))
+    return {
+        "groupId": _text(element, "groupId", ""),
+        "artifactId": _text(element, "artifactId", ""),
+        "version": _text(element, "version"),
+        "type": _text(element, "type", "jar"),
+        "classifier": _text(element, "classifier", ""),
+        "scope": _text(element, "scope"),
+        "optional": _text(element, "optional", "false") == "true",
+        "exclusions": exclusions,
+    }
+
+
+def parse_pom(pom_file):
+    """
+    Reads the parts of a POM that influence dependency resolution and the SBOM, without
+    applying inheritance or interpolation.
+    """
+    root = ET.parse(pom_file).getroot()
+    parent = _child(root, "parent")
+    dependency_management = _child(root, "dependencyManagement")
+    return {
+        "file": pom_file,
+        "groupId": _text(root, "groupId"),
+        "artifactId": _text(root, "artifactId", ""),
+        "version": _text(root, "version"),
+        "packaging": _text(root, "packaging", "jar"),
+        "name": _text(root, "name", ""),
+        "description": _text(root, "description", ""),
+        "url": _text(root, "url", ""),
+        "scm_url": _text(_child(root, "scm"), "url", ""),
+        "licenses": [
+            {key: value for key, value in (("name", _text(entry, "name")), ("url", _text(entry, "url"))) if value}
+            for entry in _children(_child(root, "licenses"), "license")
+        ],
+        "parent": None if parent is None else {
+            "groupId": _text(parent, "groupId", ""),
+            "artifactId": _text(parent, "artifactId", ""),
+            "version": _text(parent, "version", ""),
+            "relativePath": _text(parent, "relativePath", "../pom.xml"),
+        },
+        "properties": {StreamingParsers.local_name(child.tag): (child.text or "").strip()
+                       for properties in _children(root, "properties") for child in properties
+                       if StreamingParsers.local_name(child.tag)},
+        "dependencies": [_parse_dependency(element)
+                         for element in _children(_child(root, "dependencies"), "dependency")],
+        "managed": [_parse_dependency(element)
+                    for element in _children(_child(dependency_management, "dependencies"), "dependency")],
+        "modules": [(module.text or "").strip() for module in _children(_child(root, "modules"), "module")],
+    }
+
+
+def dependency_key(dependency):
+    return dependency["groupId"], dependency["artifactId"], dependency["type"], dependency["classifier"]
+
+
+def version_key(version):
+    """
+    Orders versions roughly like Maven's ComparableVersion: numeric parts numerically,
+    and qualifiers such as alpha/beta/SNAPSHOT before the plain release.
+    """
+    key = []
+    for token in re.split(r"[.\-]", version.lower()):
+        if token.isdigit():
+            key.append((2, int(token), ""))
+        elif token not in ("", "final", "ga", "release"):
+            key.append((0, 0, token))
+    # A missing part sorts above a qualifier but below any number
+    key.append((1, 0, ""))
+    return key
+
+
+def _in_range(version, specification):
+    key = version_key(version)
+    for lower_bracket, bounds, upper_bracket in RANGE_PATTERN.findall(specification):
+        if "," not in bounds:
+            if version == bounds.strip():
+                return True
+            continue
+        lower, upper = (bound.strip() for bound in bounds.split(",", 1))
+        if lower and (key < version_key(lower) or (lower_bracket == "(" and key == version_key(lower))):
+            continue
+        if upper and (key > version_key(upper) or (upper_bracket == ")" and key == version_key(upper))):
+            continue
+        return True
+    return False
+
+
+class MavenResolver:
+    """
+    Resolves a project's dependency tree from pom.xml and a local repository without running
+    Maven: parent POMs are inherited, properties interpolated, dependencyManagement (including
+    imported BOMs) applied, and transitive dependencies mediated nearest-first with scope
+    propagation, optional dependencies and exclusions handled as Maven does.
+    """
+
+    def __init__(self, repository=None, scopes=INCLUDED_SCOPES):
+        self.repository = repository or REPOSITORY
+        self.scopes = scopes
+        self._raw = {}
+        self._models = {}
+        self._missing = set()
+
+    def pom_path(self, group_id, artifact_id, version):
+        return os.path.join(self.repository, *group_id.split("."), artifact_id, version, f"{artifact_id}-{version}.pom")
+
+    def resolve_version(self, group_id, artifact_id, version):
+        """
+        Picks the highest locally available version satisfying a range such as [1.0,2.0).
+        """
+        if not version or version[0] not in "[(":
+            return version
+        artifact_dir = os.path.join(self.repository, *group_id.split("."), artifact_id)
+        candidates = []
+        if os.path.isdir(artifact_dir):
+            candidates = [name for name in os.listdir(artifact_dir) if _in_range(name, version)]
+        if not candidates:
+            print(f"No local version of {group_id}:{artifact_id} matches {version}")
+            return version
+        return max(candidates, key=version_key)
+
+    def _parse(self, pom_file):
+        pom_file = os.path.abspath(pom_file)
+        if pom_file not in self._raw:
+            self._raw[pom_file] = parse_pom(pom_file)
+        return self._raw[pom_file]
+
+    def _parent_file(self, pom):
+        parent = pom["parent"]
+        if parent["relativePath"]:
+            candidate = os.path.normpath(os.path.join(os.path.dirname(pom["file"]), parent["relativePath"]))
+            if os.path.isdir(candidate):
+                candidate = os.path.join(candidate, "pom.xml")
+            if os.path.isfile(candidate):
+                local = self._parse(candidate)
+                if (local["groupId"] or (local["parent"] or {}).get("groupId"), local["artifactId"]) == \
+                        (parent["groupId"], parent["artifactId"]):
+                    return candidate
+        return self.pom_path(parent["groupId"], parent["artifactId"], parent["version"])
+
+    def model(self, pom_file, _chain=()):
+        """
+        Returns the effective model of a POM: coordinates, merged properties, interpolated
+        dependencies with managed versions/scopes applied, and the dependencyManagement table.
+        raw_managed and raw_dependencies hold the uninterpolated entries children inherit.
+        """
+        pom_file = os.path.abspath(pom_file)
+        if pom_file in self._models:
+            return self._models[pom_file]
+        if pom_file in _chain:
+            raise ValueError(f"Cycle in parent or import POMs: {' -> '.join(_chain + (pom_file,))}")
+
+        pom = self._parse(pom_file)
+        parent_model = None
+        if pom["parent"] is not None:
+            parent_file = self._parent_file(pom)
+            if os.path.isfile(parent_file):
+                parent_model = self.model(parent_file, _chain + (pom_file,))
+            else:
+                self._warn_missing(parent_file)
+
+        group_id = pom["groupId"] or (pom["parent"] or {}).get("groupId", "")
+        version = pom["version"] or (pom["parent"] or {}).get("version", "")
+
+        properties = dict(parent_model["properties"]) if parent_model else {}
+        properties.update(pom["properties"])
+        context = dict(properties)
+        context.update({
+            "project.groupId": group_id, "project.artifactId": pom["artifactId"], "project.version": version,
+            "pom.groupId": group_id, "pom.artifactId": pom["artifactId"], "pom.version": version,
+            "groupId": group_id, "artifactId": pom["artifactId"], "version": version,
+        })
+        if pom["parent"] is not None:
+            context.update({"project.parent." + key: value for key, value in pom["parent"].items()})
+
+        def lookup(match):
+            name = match.group(1)
+            if name in context:
+                return context[name]
+            if name.startswith("env."):
+                return os.environ.get(name[4:], match.group(0))
+            return match.group(0)
+
+        def interpolate(value):
+            # Properties may refer to other properties, so substitute until nothing changes
+            for _ in range(10):
+                if not value or "${" not in value:
+                    break
+                value = PROPERTY_PATTERN.sub(lookup, value)
+            return value
+
+        def interpolated(dependency):
+            dependency = dict(dependency)
+            for field in ("groupId", "artifactId", "version", "type", "classifier", "scope"):
+                dependency[field] = interpolate(dependency[field])
+            return dependency
+
+        # Inherited entries are kept uninterpolated and only interpolated here, with the merged
+        # properties, so that a child overriding e.g. ${lib.version} changes the parent's entries
+        # as it does in Maven. Child entries replace inherited ones with the same key.
+        raw_managed = dict(parent_model["raw_managed"]) if parent_model else {}
+        raw_managed.update((dependency_key(dependency), dependency) for dependency in pom["managed"])
+        raw_dependencies = dict(parent_model["raw_dependencies"]) if parent_model else {}
+        raw_dependencies.update((dependency_key(dependency), dependency) for dependency in pom["dependencies"])
+
+        # Declared entries win over imported BOMs, which are applied in order, first one wins
+        managed = {}
+        imports = []
+        for dependency in map(interpolated, raw_managed.values()):
+            if dependency["scope"] == "import" and dependency["type"] == "pom":
+                imports.append(dependency)
+            else:
+                managed[dependency_key(dependency)] = dependency
+        for dependency in imports:
+            imported = self.model_for(dependency["groupId"], dependency["artifactId"], dependency["version"],
+                                      _chain + (pom_file,))
+            for key, entry in (imported["managed"] if imported else {}).items():
+                managed.setdefault(key, entry)
+
+        dependencies = {}
+        for dependency in map(interpolated, raw_dependencies.values()):
+            entry = managed.get(dependency_key(dependency))
+            if entry is not None:
+                if not dependency["version"]:
+                    dependency["version"] = entry["version"]
+                if not dependency["scope"]:
+                    dependency["scope"] = entry["scope"]
+                dependency["exclusions"] = dependency["exclusions"] | entry["exclusions"]
+            dependency["scope"] = dependency["scope"] or "compile"
+            dependencies[dependency_key(dependency)] = dependency
+
+        model = {
+            "file": pom_file,
+            "groupId": group_id,
+            "artifactId": pom["artifactId"],
+            "version": version,
+            "packaging": pom["packaging"],
+            "name": interpolate(pom["name"]),
+            "description": interpolate(pom["description"]) or (parent_model["description"] if parent_model else ""),
+            "url": interpolate(pom["url"]) or (parent_model["url"] if parent_model else ""),
+            "scm_url": interpolate(pom["scm_url"]) or (parent_model["scm_url"] if parent_model else ""),
+            "licenses": pom["licenses"] or (parent_model["licenses"] if parent_model else []),
+            "properties": properties,
+            "managed": managed,
+            "dependencies": list(dependencies.values()),
+            "raw_managed": raw_managed,
+            "raw_dependencies": raw_dependencies,
+            "modules": pom["modules"],
+        }
+        self._models[pom_file] = model
+        return model
+
+    def model_for(self, group_id, artifact_id, version, _chain=()):
+        pom_file = self.pom_path(group_id, artifact_id, self.resolve_version(group_id, artifact_id, version))
+        if not os.path.isfile(pom_file):
+            self._warn_missing(pom_file)
+            return None
+        return self.model(pom_file, _chain)
+
+    def _warn_missing(self, pom_file):
+        if pom_file not in self._missing:
+            self._missing.add(pom_file)
+            print(f"POM not found in local repository: {pom_file}")
+
+    @staticmethod
+    def purl(group_id, artifact_id, version, type_="jar", classifier=""):
+        purl = f"pkg:maven/{group_id}/{artifact_id}@{version}?type={type_}"
+        return f"{purl}&classifier={classifier}" if classifier else purl
+
+    def _component(self, dependency, version, scope, model):
+        purl = self.purl(dependency["groupId"], dependency["artifactId"], version, dependency["type"],
+                         dependency["classifier"])
+        external_references = []
+        if model and model["url"]:
+            external_references.append({"type": "website", "url": model["url"]})
+        if model and model["scm_url"]:
+            external_references.append({"type": "vcs", "url": model["scm_url"]})
+        return {
+            "group": dependency["groupId"],
+            "name": dependency["artifactId"],
+            "version": version,
+            "description": model["description"] if model else "",
+            "scope": COMPONENT_SCOPES.get(scope, "required"),
+            "licenses": [{"license": entry} for entry in (model["licenses"] if model else [])],
+            "purl": purl,
+            "externalReferences": external_references,
+            "type": "library",
+            "bom-ref": purl,
+        }
+
+    def _walk(self, project, components, edges):
+        """
+        Breadth-first walk of one project's dependency tree. The first (nearest) occurrence
+        of an artifact decides its version and scope; later occurrences link to it.
+        """
+        project_ref = self.purl(project["groupId"], project["artifactId"], project["version"],
+                                "jar" if project["packaging"] in ("jar", "bundle") else project["packaging"])
+        edges.setdefault(project_ref, {})
+        resolved = {}
+
+        queue = deque((project_ref, dependency, dependency["scope"], frozenset(dependency["exclusions"]), True)
+                      for dependency in project["dependencies"])
+        while queue:
+            parent_ref, dependency, scope, exclusions, direct = queue.popleft()
+            key = dependency_key(dependency)
+            if key in resolved:
+                edges[parent_ref][resolved[key]] = None
+                continue
+
+            version = dependency["version"]
+            if not direct:
+                # The project's dependencyManagement also pins transitive dependencies
+                managed = project["managed"].get(key)
+                if managed is not None:
+                    version = managed["version"] or version
+                    # A managed scope never widens a dependency that only arrives through provided/test
+                    if managed["scope"] and scope not in ("provided", "test"):
+                        scope = managed["scope"]
+            if scope not in self.scopes:
+                continue
+
+            model = None if scope == "system" else self.model_for(dependency["groupId"], dependency["artifactId"],
+                                                                  version)
+            version = model["version"] if model else self.resolve_version(dependency["groupId"],
+                                                                          dependency["artifactId"], version)
+            component = self._component(dependency, version, scope, model)
+            ref = component["bom-ref"]
+            resolved[key] = ref
+            edges[parent_ref][ref] = None
+            edges.setdefault(ref, {})
+            components.setdefault(ref, component)
+
+            for child in (model["dependencies"] if model else []):
+                if child["optional"]:
+                    continue
+                if {(child["groupId"], child["artifactId"]), (child["groupId"], "*"), ("*", "*")} & exclusions:
+                    continue
+                child_scope = SCOPE_PROPAGATION.get((scope, child["scope"]))
+                if child_scope is None:
+                    continue
+                queue.append((ref, child, child_scope, exclusions | child["exclusions"], False))
+        return project_ref
+
+    def _projects(self, pom_file):
+        pending = [os.path.abspath(pom_file)]
+        seen = set()
+        while pending:
+            current = pending.pop(0)
+            if current in seen or not os.path.isfile(current):
+                continue
+            seen.add(current)
+            model = self.model(current)
+            yield model
+            for module in model["modules"]:
+                candidate = os.path.normpath(os.path.join(os.path.dirname(current), module))
+                pending.append(os.path.join(candidate, "pom.xml") if os.path.isdir(candidate) else candidate)
+
+    def resolve(self, pom_file):
+        """
+        Returns a CycloneDX-shaped BOM dict (metadata.component, components, dependencies)
+        for pom_file and the modules it aggregates, as generate_custom_sbom consumes it.
+        """
+        components = {}
+        edges = {}
+        root_ref = None
+        root = None
+        for project in self._projects(pom_file):
+            project_ref = self._walk(project, components, edges)
+            if root is None:
+                root, root_ref = project, project_ref
+            else:
+                # Modules are components of the aggregate, as in makeAggregateBom
+                components.setdefault(project_ref, self._component(
+                    {"groupId": project["groupId"], "artifactId": project["artifactId"],
+                     "type": project_ref.split("?type=")[1], "classifier": ""},
+                    project["version"], "compile", project))
+
+        return {
+            "bomFormat": "CycloneDX",
+            "specVersion": "1.4",
+            "version": 1,
+            "metadata": {
+                "component": {
+                    "group": root["groupId"],
+                    "name": root["artifactId"],
+                    "version": root["version"],
+                    "licenses": [{"license": entry} for entry in root["licenses"]],
+                    "purl": root_ref,
+                    "type": "library",
+                    "bom-ref": root_ref,
+                },
+            },
+            "components": list(components.values()),
+            "dependencies": [{"ref": ref, "dependsOn": list(depends_on)} for ref, depends_on in edges.items()],
+        }
+
+
+def resolve_bom(pom_file, repository=None):
+    return MavenResolver(repository).resolve(pom_file)
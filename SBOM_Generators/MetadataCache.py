@@ -0,0 +1,173 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+DEFAULT_CACHE_PATH = Path(os.environ.get("SBOM_CACHE_DIR", Path.home() / ".cache" / "sbom-generator")) / "metadata.sqlite"
+DEFAULT_TTL = int(os.environ.get("SBOM_CACHE_TTL", str(7 * 24 * 3600)))  # seconds
+DEFAULT_MAX_BYTES = int(os.environ.get("SBOM_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+# Eviction frees space down to this fraction of max_bytes, so that it runs rarely and in batches
+LOW_WATER = 0.9
+
+
+class MetadataCache:
+    """
+    Persistent registry metadata cache keyed by (ecosystem, name, version).
+
+    Entries older than ttl seconds are treated as misses, and the least recently
+    used entries are evicted down to LOW_WATER * max_bytes once the stored payloads
+    exceed max_bytes. Expired
+    entries keep their ETag / Last-Modified validators so callers can revalidate
+    them instead of downloading them again. The SQLite file may be shared by
+    several processes.
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, ttl=DEFAULT_TTL, max_bytes=DEFAULT_MAX_BYTES):
+        self.path = Path(path)
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.revalidations = 0
+        self._lock = threading.Lock()
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path), timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS metadata ("
+            " ecosystem TEXT NOT NULL,"
+            " name TEXT NOT NULL,"
+            " version TEXT NOT NULL,"
+            " payload BLOB NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " fetched_at REAL NOT NULL,"
+            " accessed_at REAL NOT NULL,"
+            " etag TEXT,"
+            " last_modified TEXT,"
+            " PRIMARY KEY (ecosystem, name, version))"
+        )
+        # Caches created before validators were stored lack these columns
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(metadata)")}
+        for column in ("etag", "last_modified"):
+            if column not in columns:
+                self._conn.execute(f"ALTER TABLE metadata ADD COLUMN {column} TEXT")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS metadata_accessed_at ON metadata (accessed_at)")
+        self._total_bytes = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM metadata").fetchone()[0]
+
+    def get(self, ecosystem, name, version):
+        entry = self.get_entry(ecosystem, name, version)
+        if entry is None or entry["expired"]:
+            return None
+        return entry["value"]
+
+    def get_entry(self, ecosystem, name, version):
+        """
+        Returns {"value", "etag", "last_modified", "expired"} for a cached entry, or None.
+        Expired entries count as misses.
+        """
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT payload, fetched_at, etag, last_modified FROM metadata"
+                " WHERE ecosystem = ? AND name = ? AND version = ?",
+                (ecosystem, name, version)
+            ).fetchone()
+
+            if row is None:
+                self.misses += 1
+                return None
+
+            expired = now - row[1] > self.ttl
+            if expired:
+                self.misses += 1
+            else:
+                self.hits += 1
+            self._conn.execute(
+                "UPDATE metadata SET accessed_at = ? WHERE ecosystem = ? AND name = ? AND version = ?",
+                (now, ecosystem, name, version)
+            )
+        return {"value": json.loads(row[0]), "etag": row[2], "last_modified": row[3], "expired": expired}
+
+    def put(self, ecosystem, name, version, value, etag=None, last_modified=None):
+        payload = json.dumps(value, separators=(",", ":")).encode("utf-8")
+        now = time.time()
+        with self._lock:
+            old = self._conn.execute(
+                "SELECT size FROM metadata WHERE ecosystem = ? AND name = ? AND version = ?",
+                (ecosystem, name, version)
+            ).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO metadata"
+                " (ecosystem, name, version, payload, size, fetched_at, accessed_at, etag, last_modified)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (ecosystem, name, version, payload, len(payload), now, now, etag, last_modified)
+            )
+            self._total_bytes += len(payload) - (old[0] if old else 0)
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+
+    def touch(self, ecosystem, name, version):
+        """
+        Marks an entry as freshly fetched after the registry confirmed it is unchanged (HTTP 304).
+        """
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "UPDATE metadata SET fetched_at = ?, accessed_at = ? WHERE ecosystem = ? AND name = ? AND version = ?",
+                (now, now, ecosystem, name, version)
+            )
+            self.revalidations += 1
+
+    def _evict(self):
+        # The running total is trusted rather than recounted, which would make every put at the
+        # cap scan the whole table; it is recounted when the cache is next opened
+        target = self.max_bytes * LOW_WATER
+        cursor = self._conn.execute("SELECT rowid, size FROM metadata ORDER BY accessed_at")
+        doomed = []
+        for rowid, size in cursor:
+            if self._total_bytes <= target:
+                break
+            doomed.append((rowid,))
+            self._total_bytes -= size
+        cursor.close()
+
+        self._conn.executemany("DELETE FROM metadata WHERE rowid = ?", doomed)
+        self.evictions += len(doomed)
+
+    def stats(self):
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM metadata").fetchone()[0]
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "revalidations": self.revalidations,
+            "entries": entries,
+            "bytes": self._total_bytes
+        }
+
+    def keys(self, ecosystem=None):
+        """
+        Returns the (ecosystem, name, version) of every cached entry, optionally of one ecosystem.
+        """
+        with self._lock:
+            if ecosystem is None:
+                rows = self._conn.execute("SELECT ecosystem, name, version FROM metadata").fetchall()
+            else:
+                rows = self._conn.execute("SELECT ecosystem, name, version FROM metadata WHERE ecosystem = ?",
+                                          (ecosystem,)).fetchall()
+        return [tuple(row) for row in rows]
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM metadata")
+            self._total_bytes = 0
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,238 @@
+import hashlib
+import json
+import mmap
+import os
+import re
+import struct
+import tempfile
+import time
+
+# Set by --snapshot: registry metadata is looked up in this file before the cache or the network
+DEFAULT_SNAPSHOT_PATH = os.environ.get("SBOM_SNAPSHOT") or None
+
+MAGIC = b"SBOMSNAP"
+FORMAT_VERSION = 1
+
+# magic, format version, reserved, entry count, slot count, index offset, created at
+HEADER = struct.Struct("<8sIIQQQd")
+# key hash (0 = empty slot), record offset, key length, value length
+SLOT = struct.Struct("<QQII")
+
+
+def canonicalize_name(name):
+    """
+    Normalizes a PyPI project name as PEP 503 does: case-insensitive, with runs of "-", "_"
+    and "." equivalent.
+    """
+    return re.sub(r"[-_.]+", "-", name).lower()
+
+
+def make_key(ecosystem, name, version):
+    # PyPI names are case- and separator-insensitive; npm names are compared exactly
+    if ecosystem == "pypi":
+        name = canonicalize_name(name)
+    return f"{ecosystem}\0{name}\0{version}".encode("utf-8")
+
+
+def split_key(key):
+    ecosystem, name, version = key.decode("utf-8").split("\0")
+    return ecosystem, name, version
+
+
+def _hash(key):
+    # The low bit is forced on so that 0 can mark empty slots
+    return int.from_bytes(hashlib.blake2b(key, digest_size=8).digest(), "little") | 1
+
+
+def _slot_count(entries):
+    # Power of two at most half full keeps linear probes short
+    count = 8
+    while count < entries * 2:
+        count *= 2
+    return count
+
+
+class MetadataSnapshot:
+    """
+    Read-only view of a snapshot file written by write_snapshot.
+
+    The file holds the metadata records back to back followed by an open-addressing hash
+    index of (key hash, offset, lengths) slots. It is memory-mapped, so a lookup hashes the
+    key, probes a slot or two and decodes a single record; only the pages touched are read
+    and the snapshot is never loaded into memory as a whole. Safe to share between threads.
+    """
+
+    def __init__(self, path):
+        self.path = str(path)
+        self._file = open(self.path, "rb")
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self._file.close()
+            raise ValueError(f"{self.path} is not a metadata snapshot")
+
+        if len(self._map) < HEADER.size:
+            self.close()
+            raise ValueError(f"{self.path} is not a metadata snapshot")
+        magic, version, _, self.entry_count, self._slots, self._index, self.created_at = HEADER.unpack_from(self._map)
+        if magic != MAGIC or version != FORMAT_VERSION or self._index + self._slots * SLOT.size > len(self._map):
+            self.close()
+            raise ValueError(f"{self.path} is not a metadata snapshot (or was written by another version)")
+
+    def __len__(self):
+        return self.entry_count
+
+    def __contains__(self, key):
+        return self._find(key) is not None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _find(self, key):
+        key_hash = _hash(key)
+        mask = self._slots - 1
+        slot = key_hash & mask
+        while True:
+            stored_hash, offset, key_length, value_length = SLOT.unpack_from(self._map, self._index + slot * SLOT.size)
+            if stored_hash == 0:
+                return None
+            if stored_hash == key_hash and self._map[offset:offset + key_length] == key:
+                return offset + key_length, value_length
+            slot = (slot + 1) & mask
+
+    def get_raw(self, key):
+        found = self._find(key)
+        if found is None:
+            return None
+        offset, length = found
+        return self._map[offset:offset + length]
+
+    def get(self, ecosystem, name, version):
+        """
+        Returns the metadata recorded for name@version, or None if the snapshot lacks it.
+        """
+        raw = self.get_raw(make_key(ecosystem, name, version))
+        return None if raw is None else json.loads(raw)
+
+    def records(self):
+        """
+        Yields every (key, raw JSON) pair in index slot order, which follows the key hashes
+        rather than the order the records were written in.
+        """
+        for slot in range(self._slots):
+            stored_hash, offset, key_length, value_length = SLOT.unpack_from(self._map, self._index + slot * SLOT.size)
+            if stored_hash:
+                yield (self._map[offset:offset + key_length],
+                       self._map[offset + key_length:offset + key_length + value_length])
+
+    def close(self):
+        if getattr(self, "_map", None) is not None:
+            self._map.close()
+            self._map = None
+        self._file.close()
+
+
+def write_snapshot(path, records, before_replace=None):
+    """
+    Writes (key, raw JSON) records to a new snapshot at path; a later record replaces an
+    earlier one with the same key. Payloads are streamed to disk as they come, and only
+    their offsets are held in memory until the index is appended. The file is replaced
+    atomically, so readers never see a half-written snapshot. before_replace is called
+    right before that, to close whatever still maps the old file: Windows refuses to
+    replace a file that is open.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(prefix=".snapshot-", dir=directory)
+    try:
+        # key -> (offset, key length, value length)
+        locations = {}
+        with os.fdopen(fd, "wb") as f:
+            f.write(b"\0" * HEADER.size)
+            offset = HEADER.size
+            for key, value in records:
+                f.write(key)
+                f.write(value)
+                locations[key] = (offset, len(key), len(value))
+                offset += len(key) + len(value)
+
+            slots = _slot_count(len(locations))
+            mask = slots - 1
+            index = bytearray(slots * SLOT.size)
+            for key, (record_offset, key_length, value_length) in locations.items():
+                key_hash = _hash(key)
+                slot = key_hash & mask
+                while SLOT.unpack_from(index, slot * SLOT.size)[0]:
+                    slot = (slot + 1) & mask
+                SLOT.pack_into(index, slot * SLOT.size, key_hash, record_offset, key_length, value_length)
+            f.write(index)
+
+            f.seek(0)
+            f.write(HEADER.pack(MAGIC, FORMAT_VERSION, 0, len(locations), slots, offset, time.time()))
+        if before_replace is not None:
+            before_replace()
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    return len(locations)
+
+
+def encode(value):
+    return json.dumps(value, separators=(",", ":")).encode("utf-8")
+
+
+def open_snapshot(path):
+    """
+    Opens the snapshot at path, or returns None if there is none yet.
+    """
+    if not path or not os.path.isfile(path):
+        return None
+    return MetadataSnapshot(path)
+
+
+def refresh_snapshot(path, keys, fetch, refresh=False, before_replace=None):
+    """
+    Brings the snapshot at path up to date for keys, a list of (ecosystem, name, version).
+    Only keys the snapshot lacks are fetched (all of them with refresh=True); records
+    already present are copied over unchanged, including ones not listed in keys.
+    fetch(keys) must return the metadata for each key in order, None where unavailable.
+    before_replace is passed on to write_snapshot.
+    """
+    existing = open_snapshot(path)
+    wanted = list(dict.fromkeys((ecosystem, name, version) for ecosystem, name, version in keys))
+    pending = [key for key in wanted if refresh or existing is None or make_key(*key) not in existing]
+    values = fetch(pending) if pending else []
+
+    fetched = {}
+    unavailable = []
+    for key, value in zip(pending, values):
+        if value is None:
+            unavailable.append(key)
+        else:
+            fetched[make_key(*key)] = encode(value)
+
+    def records():
+        if existing is not None:
+            for key, value in existing.records():
+                if key not in fetched:
+                    yield key, value
+        yield from fetched.items()
+
+    def close_existing():
+        # The old snapshot has been copied by now and must not be mapped while it is replaced
+        if existing is not None:
+            existing.close()
+        if before_replace is not None:
+            before_replace()
+
+    try:
+        total = write_snapshot(path, records(), close_existing)
+    finally:
+        if existing is not None:
+            existing.close()
+    return {"entries": total, "fetched": len(fetched), "unavailable": unavailable}
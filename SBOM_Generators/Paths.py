@@ -0,0 +1,8 @@
+from pathlib import Path
+
+# Inputs, templates and outputs are resolved from the repository root so that the generators
+# do not depend on the working directory
+ROOT_DIR = Path(__file__).resolve().parent.parent
+INPUT_DIR = ROOT_DIR / "input"
+TEMPLATES_DIR = ROOT_DIR / "templates"
+SBOMS_DIR = ROOT_DIR / "sboms"
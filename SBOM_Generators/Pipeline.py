@@ -0,0 +1,136 @@
+import os
+import queue
+import threading
+from itertools import islice
+
+from SBOM_Generators import Instrumentation
+
+# Set by --no-pipeline: stages run one after another on the calling thread, batch by batch
+ENABLED = os.environ.get("SBOM_PIPELINE", "1") != "0"
+
+# Items travel between stages in batches of this size
+BATCH_SIZE = int(os.environ.get("SBOM_PIPELINE_BATCH", "256"))
+
+# Batches a stage may run ahead of the next one before it blocks
+QUEUE_DEPTH = int(os.environ.get("SBOM_PIPELINE_DEPTH", "4"))
+
+# How often blocked stages check whether the pipeline was abandoned
+_POLL_SECONDS = 0.05
+
+_DONE = object()
+
+
+class _Failed:
+    __slots__ = ("error",)
+
+    def __init__(self, error):
+        self.error = error
+
+
+def _put(outbox, item, stop):
+    while not stop.is_set():
+        try:
+            outbox.put(item, timeout=_POLL_SECONDS)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def _get(inbox, stop):
+    while not stop.is_set():
+        try:
+            return inbox.get(timeout=_POLL_SECONDS)
+        except queue.Empty:
+            continue
+    return None
+
+
+def _produce(source, name, batch_size, outbox, stop):
+    iterator = iter(source)
+    try:
+        while True:
+            with Instrumentation.stage(name):
+                batch = list(islice(iterator, batch_size))
+            if not batch:
+                break
+            if not _put(outbox, batch, stop):
+                return
+    except BaseException as e:
+        _put(outbox, _Failed(e), stop)
+        return
+    _put(outbox, _DONE, stop)
+
+
+def _work(name, function, inbox, outbox, stop):
+    while True:
+        batch = _get(inbox, stop)
+        if batch is None:
+            return
+        if batch is _DONE or isinstance(batch, _Failed):
+            _put(outbox, batch, stop)
+            return
+        try:
+            with Instrumentation.stage(name):
+                batch = function(batch)
+        except BaseException as e:
+            _put(outbox, _Failed(e), stop)
+            return
+        if not _put(outbox, batch, stop):
+            return
+
+
+def run(source, stages, source_stage="parse", batch_size=None, depth=None):
+    """
+    Streams the items of source through stages, a list of (name, function) pairs where
+    function maps a batch (list) of items to the batch handed to the next stage, and
+    yields the items coming out of the last stage in source order.
+
+    Reading source and every stage run on their own thread, connected by queues holding
+    at most depth batches, so while the caller consumes one batch the next ones are being
+    enriched and parsed; a stage that gets ahead blocks until the one after it catches up.
+    The first exception raised by source or a stage is re-raised to the caller.
+    """
+    batch_size = batch_size or BATCH_SIZE
+    if not ENABLED:
+        yield from _run_inline(source, stages, source_stage, batch_size)
+        return
+
+    stop = threading.Event()
+    queues = [queue.Queue(maxsize=depth or QUEUE_DEPTH) for _ in range(len(stages) + 1)]
+    threads = [threading.Thread(target=_produce, args=(source, source_stage, batch_size, queues[0], stop),
+                                name=f"pipeline-{source_stage}", daemon=True)]
+    for (name, function), inbox, outbox in zip(stages, queues, queues[1:]):
+        threads.append(threading.Thread(target=_work, args=(name, function, inbox, outbox, stop),
+                                        name=f"pipeline-{name}", daemon=True))
+    for thread in threads:
+        thread.start()
+
+    try:
+        while True:
+            batch = queues[-1].get()
+            if batch is _DONE:
+                break
+            if isinstance(batch, _Failed):
+                raise batch.error
+            Instrumentation.count("pipeline_batches")
+            yield from batch
+    finally:
+        # Also reached when the caller stops early; blocked stages notice and exit
+        stop.set()
+        for thread in threads:
+            thread.join()
+
+
+def _run_inline(source, stages, source_stage, batch_size):
+    iterator = iter(source)
+    while True:
+        with Instrumentation.stage(source_stage):
+            batch = list(islice(iterator, batch_size))
+        if not batch:
+            return
+        for name, function in stages:
+            with Instrumentation.stage(name):
+                batch = function(batch)
+        Instrumentation.count("pipeline_batches")
+        yield from batch
@@ -0,0 +1,110 @@
+import importlib
+import sys
+import threading
+
+# Installed packages add ecosystems by declaring an entry point in this group, e.g.
+#   [project.entry-points."sbom_generators.ecosystems"]
+#   cargo = "sbom_cargo.generator"
+# The module must define run(**kwargs), MANIFEST (the manifest file name it handles)
+# and MANIFEST_ARGUMENT (the keyword argument of run() that receives its path).
+ENTRY_POINT_GROUP = "sbom_generators.ecosystems"
+
+# Built-in ecosystems: name -> (generator module, manifest file name, keyword argument of its main()).
+# Modules are only imported once an ecosystem is used, so a Maven run never imports requests or venv.
+BUILTIN = {
+    "maven": ("SBOM_Generators.GenMavenBom", "pom.xml", "pom_file"),
+    "npm": ("SBOM_Generators.GenNpmBom", "package.json", "package_json_file"),
+    "pypi": ("SBOM_Generators.GenPypiBom", "requirements.txt", "requirements_file"),
+}
+
+_plugins = None
+_plugins_lock = threading.Lock()
+# Generator module name -> {module attribute: value} set with configure()
+_settings = {}
+
+
+def _entry_point_modules():
+    """
+    Returns {name: module} for the ecosystems installed packages declare. Scanning the
+    installed distributions costs more than importing a generator, so it only happens
+    when an ecosystem is not built in or every ecosystem is asked for.
+    """
+    global _plugins
+    with _plugins_lock:
+        if _plugins is None:
+            # importlib.metadata alone takes longer to import than the CLI needs to start
+            from importlib.metadata import entry_points
+
+            _plugins = {}
+            try:
+                found = entry_points(group=ENTRY_POINT_GROUP)
+            except TypeError:  # Python < 3.10 returns a dict of groups
+                found = entry_points().get(ENTRY_POINT_GROUP, [])
+            for entry_point in found:
+                if entry_point.name not in BUILTIN:
+                    _plugins[entry_point.name] = entry_point.value.split(":", 1)[0]
+        return _plugins
+
+
+def names():
+    """
+    Built-in ecosystems first, then installed plugins in name order.
+    """
+    return list(BUILTIN) + sorted(_entry_point_modules())
+
+
+def is_known(name):
+    return name in BUILTIN or name in _entry_point_modules()
+
+
+def module_name(name):
+    if name in BUILTIN:
+        return BUILTIN[name][0]
+    try:
+        return _entry_point_modules()[name]
+    except KeyError:
+        raise KeyError(f"Unknown ecosystem {name!r}; available: {', '.join(names())}") from None
+
+
+def configure(name, **settings):
+    """
+    Sets module-level options of an ecosystem's generator, e.g. configure("maven", RESOLVER="native"),
+    without importing it: they are applied when import_generator() imports it, or right away
+    if it already has been.
+    """
+    module = module_name(name)
+    _settings.setdefault(module, {}).update(settings)
+    if module in sys.modules:
+        _apply_settings(sys.modules[module])
+
+
+def _apply_settings(module):
+    for attribute, value in _settings.get(module.__name__, {}).items():
+        setattr(module, attribute, value)
+    return module
+
+
+def import_generator(module):
+    """
+    Imports a generator module by name with the options configure() recorded for it.
+    """
+    return _apply_settings(importlib.import_module(module))
+
+
+def load(name):
+    """
+    Imports and returns the generator module of an ecosystem.
+    """
+    return import_generator(module_name(name))
+
+
+def manifests():
+    """
+    Returns {manifest file name: (ecosystem, generator module, keyword argument)} for every
+    ecosystem. Plugins are imported to learn which manifest they handle.
+    """
+    table = {manifest: (name, module, argument) for name, (module, manifest, argument) in BUILTIN.items()}
+    for name in sorted(_entry_point_modules()):
+        module = load(name)
+        table.setdefault(module.MANIFEST, (name, module.__name__, module.MANIFEST_ARGUMENT))
+    return table
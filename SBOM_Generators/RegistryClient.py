@@ -0,0 +1,518 @@
+import os
+import random
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from email.utils import parsedate_to_datetime
+
+from SBOM_Generators import Instrumentation, MetadataCache, MetadataSnapshot
+
+# Registry base URLs can be pointed at a local stand-in registry (e.g. for benchmarking)
+NPM_REGISTRY_URL = os.environ.get("SBOM_NPM_REGISTRY", "https://registry.npmjs.org").rstrip("/")
+PYPI_REGISTRY_URL = os.environ.get("SBOM_PYPI_REGISTRY", "https://pypi.org/pypi").rstrip("/")
+
+# Maximum number of registry requests in flight at once
+MAX_WORKERS = int(os.environ.get("SBOM_FETCH_WORKERS", "16"))
+
+# Registry metadata is cached on disk unless disabled with SBOM_CACHE=0
+CACHE_ENABLED = os.environ.get("SBOM_CACHE", "1") != "0"
+CACHE_PATH = MetadataCache.DEFAULT_CACHE_PATH
+
+# Cache ecosystem of whole npm packuments (the metadata of every version of a package). They
+# are cached and revalidated like version documents but never exported to snapshots, which
+# hold the versions taken from them instead.
+NPM_PACKUMENT = "npm-packument"
+
+# Metadata snapshot consulted before the cache and the network
+SNAPSHOT_PATH = MetadataSnapshot.DEFAULT_SNAPSHOT_PATH
+
+# Set by --offline: metadata comes from the snapshot only and the registries are never contacted
+OFFLINE = os.environ.get("SBOM_OFFLINE", "0") == "1"
+
+# Seconds a registry request may take to connect, and between bytes received
+REQUEST_TIMEOUT = float(os.environ.get("SBOM_REQUEST_TIMEOUT", "10"))
+# Response bodies are read this many bytes at a time, checking the enrichment budget in between
+CHUNK_SIZE = 16 * 1024
+
+# Times a request is repeated after a timeout, connection error or a RETRY_STATUSES response.
+# Retries back off exponentially with full jitter, or wait as long as Retry-After says.
+MAX_RETRIES = int(os.environ.get("SBOM_FETCH_RETRIES", "3"))
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 30.0
+# A server asking to wait longer than this is given up on
+MAX_RETRY_DELAY = 60.0
+
+# Set by --enrich-budget: seconds a generator may spend on registry requests. Once they are
+# spent no further requests are made; stale cache entries are used where there are any and
+# the remaining components are written as placeholders marked unenriched.
+ENRICH_BUDGET = float(os.environ["SBOM_ENRICH_BUDGET"]) if os.environ.get("SBOM_ENRICH_BUDGET") else None
+
+# CycloneDX properties marking a component written without registry metadata
+UNENRICHED_PROPERTY = "sscrm:enrichment"
+UNENRICHED_REASON_PROPERTY = "sscrm:enrichment:reason"
+
+_session = None
+_session_lock = threading.Lock()
+_cache = None
+_cache_lock = threading.Lock()
+_snapshot = None
+_snapshot_lock = threading.Lock()
+_inflight = {}
+_inflight_lock = threading.Lock()
+_deadline = None
+# (ecosystem, name, version or None for every version) -> why its metadata is missing
+_failures = {}
+_unenriched = 0
+
+
+class BudgetExhausted(RuntimeError):
+    pass
+
+
+def configure(max_workers=None, npm_registry=None, pypi_registry=None, cache_enabled=None, cache_path=None,
+              snapshot_path=None, offline=None, request_timeout=None, max_retries=None, enrich_budget=None):
+    global MAX_WORKERS, NPM_REGISTRY_URL, PYPI_REGISTRY_URL, CACHE_ENABLED, CACHE_PATH, SNAPSHOT_PATH, OFFLINE
+    global REQUEST_TIMEOUT, MAX_RETRIES, ENRICH_BUDGET
+    global _session, _cache, _snapshot
+    if request_timeout is not None:
+        REQUEST_TIMEOUT = float(request_timeout)
+    if max_retries is not None:
+        MAX_RETRIES = max(0, int(max_retries))
+    if enrich_budget is not None:
+        ENRICH_BUDGET = float(enrich_budget)
+    with _snapshot_lock:
+        if snapshot_path is not None:
+            SNAPSHOT_PATH = snapshot_path
+            if _snapshot is not None:
+                _snapshot.close()
+                _snapshot = None
+        if offline is not None:
+            OFFLINE = offline
+    with _cache_lock:
+        if cache_enabled is not None:
+            CACHE_ENABLED = cache_enabled
+        if cache_path is not None:
+            CACHE_PATH = cache_path
+        if (cache_enabled is not None or cache_path is not None) and _cache is not None:
+            _cache.close()
+            _cache = None
+    with _session_lock:
+        if max_workers is not None:
+            MAX_WORKERS = max(1, int(max_workers))
+            # The connection pool is sized from MAX_WORKERS, so rebuild it on next use
+            _session = None
+        if npm_registry is not None:
+            NPM_REGISTRY_URL = npm_registry.rstrip("/")
+        if pypi_registry is not None:
+            PYPI_REGISTRY_URL = pypi_registry.rstrip("/")
+
+
+def get_session():
+    """
+    Returns a shared requests session whose keep-alive connection pool is large
+    enough for MAX_WORKERS concurrent requests against the same registry host.
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            # Imported on first use: requests accounts for most of the CLI's import time,
+            # and runs served entirely from the cache or a snapshot never need it
+            import requests
+            from requests.adapters import HTTPAdapter
+
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=MAX_WORKERS)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            _session = session
+        return _session
+
+
+def get_cache():
+    global _cache
+    if not CACHE_ENABLED:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = MetadataCache.MetadataCache(CACHE_PATH)
+        return _cache
+
+
+def get_snapshot():
+    """
+    Returns the metadata snapshot at SNAPSHOT_PATH, or None when none is configured.
+    """
+    global _snapshot
+    if not SNAPSHOT_PATH:
+        return None
+    with _snapshot_lock:
+        if _snapshot is None:
+            _snapshot = MetadataSnapshot.MetadataSnapshot(SNAPSHOT_PATH)
+        return _snapshot
+
+
+def metadata_url(ecosystem, name, version):
+    if ecosystem == "pypi":
+        return f"{PYPI_REGISTRY_URL}/{name}/{version}/json"
+    return f"{NPM_REGISTRY_URL}/{name}/{version}"
+
+
+def start_budget():
+    """
+    Starts the ENRICH_BUDGET clock of a generator run and forgets the failures of earlier runs.
+    """
+    global _deadline, _unenriched
+    _deadline = time.monotonic() + ENRICH_BUDGET if ENRICH_BUDGET is not None else None
+    _failures.clear()
+    _unenriched = 0
+
+
+def remaining_budget():
+    """
+    Seconds left of the enrichment budget, or None when there is no budget.
+    """
+    return None if _deadline is None else max(0.0, _deadline - time.monotonic())
+
+
+def budget_exhausted():
+    remaining = remaining_budget()
+    return remaining is not None and remaining <= 0
+
+
+def _retry_after(response):
+    """
+    Seconds the Retry-After header of response asks to wait, or None.
+    """
+    value = response.headers.get("Retry-After") if response is not None else None
+    if not value:
+        return None
+    if value.strip().isdigit():
+        return float(value)
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def _backoff(attempt, response):
+    delay = random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+    retry_after = _retry_after(response)
+    return delay if retry_after is None else retry_after + delay * 0.1
+
+
+def _read_body(response, url):
+    """
+    Reads a streamed response body in CHUNK_SIZE pieces. The requests timeout only bounds the
+    wait between bytes, so a registry trickling a large document would otherwise hold the
+    request past the enrichment deadline; the body is abandoned with BudgetExhausted instead.
+    """
+    chunks = []
+    try:
+        for chunk in response.iter_content(CHUNK_SIZE):
+            chunks.append(chunk)
+            if budget_exhausted():
+                raise BudgetExhausted(f"Enrichment budget of {ENRICH_BUDGET:g} s exhausted while fetching {url}")
+    finally:
+        # Returns the connection to the pool, or drops it when the body was not read to the end
+        response.close()
+    # What response.content would have read, so .json() and .content work as usual
+    response._content = b"".join(chunks)
+
+
+def http_get(url, headers=None):
+    """
+    GETs url, retrying timeouts, connection errors and RETRY_STATUSES responses up to
+    MAX_RETRIES times. Requests time out after REQUEST_TIMEOUT seconds, or when the
+    enrichment budget runs out, whichever is sooner; the budget is also checked while the
+    body is read. Returns the last response, or raises the last error (BudgetExhausted when
+    no time was left to try or to finish reading).
+    """
+    if OFFLINE:
+        raise RuntimeError(f"Refusing to fetch {url} in offline mode")
+    session = get_session()
+    # requests is loaded by get_session
+    from requests import ConnectionError, Timeout
+    from requests.exceptions import ChunkedEncodingError
+
+    attempt = 0
+    while True:
+        remaining = remaining_budget()
+        if remaining is not None and remaining <= 0:
+            raise BudgetExhausted(f"Enrichment budget of {ENRICH_BUDGET:g} s exhausted before fetching {url}")
+        timeout = REQUEST_TIMEOUT if remaining is None else min(REQUEST_TIMEOUT, remaining)
+
+        response = error = None
+        try:
+            response = session.get(url, headers=headers, timeout=timeout, stream=True)
+            _read_body(response, url)
+        except (ConnectionError, ChunkedEncodingError, Timeout) as e:
+            Instrumentation.count("http_timeouts" if isinstance(e, Timeout) else "http_errors")
+            # A body cut short is not a response to fall back on
+            response, error = None, e
+        else:
+            Instrumentation.count("http_requests")
+            Instrumentation.count("http_bytes", len(response.content))
+            if response.status_code not in RETRY_STATUSES:
+                return response
+
+        delay = _backoff(attempt, response)
+        remaining = remaining_budget()
+        if attempt >= MAX_RETRIES or delay > MAX_RETRY_DELAY or (remaining is not None and delay >= remaining):
+            if response is not None:
+                return response
+            raise error
+        Instrumentation.count("http_retries")
+        time.sleep(delay)
+        attempt += 1
+
+
+def _record_failure(key, reason):
+    if key is not None:
+        _failures[key] = reason
+    Instrumentation.count("fetch_failures")
+
+
+def _failed_response(key, response):
+    _record_failure(key, "not-found" if response.status_code == 404 else f"http-{response.status_code}")
+
+
+def _failed_request(key, error):
+    # A request timing out at the deadline was cut short by the budget, not by the registry
+    if isinstance(error, BudgetExhausted) or budget_exhausted():
+        _record_failure(key, "budget-exhausted")
+        return
+    # Only reached after http_get, which loads requests
+    from requests import Timeout
+    _record_failure(key, "timeout" if isinstance(error, Timeout) else "unavailable")
+
+
+def failure_reason(ecosystem, name, version):
+    """
+    Why the metadata of name@version could not be fetched in this run.
+    """
+    return _failures.get((ecosystem, name, version)) or _failures.get((ecosystem, name, None)) or "unavailable"
+
+
+def coalesce(key, fetch):
+    """
+    Runs fetch() once for all concurrent callers asking for the same key; callers
+    that arrive while a request is in flight wait for and share its result.
+    """
+    with _inflight_lock:
+        future = _inflight.get(key)
+        owner = future is None
+        if owner:
+            future = Future()
+            _inflight[key] = future
+
+    if not owner:
+        return future.result()
+
+    try:
+        result = fetch()
+        future.set_result(result)
+        return result
+    except BaseException as e:
+        future.set_exception(e)
+        raise
+    finally:
+        with _inflight_lock:
+            del _inflight[key]
+
+
+def fetch_metadata(ecosystem, name, version, url, use_snapshot=True):
+    """
+    Returns the registry JSON for name@version, served from the on-disk cache when possible.
+    Expired cache entries are revalidated with If-None-Match / If-Modified-Since.
+    use_snapshot=False skips the snapshot, for refreshing it.
+    """
+    return coalesce((ecosystem, name, version),
+                    lambda: _fetch_metadata(ecosystem, name, version, url, use_snapshot))
+
+
+def fetch_npm_packument(name, url):
+    """
+    Returns the npm packument of name, from the cache or revalidated as fetch_metadata does.
+    Failures are recorded for every version of name.
+    """
+    return coalesce((NPM_PACKUMENT, name, ""), lambda: _fetch_metadata(
+        NPM_PACKUMENT, name, "", url, use_snapshot=False, failure_key=("npm", name, None)))
+
+
+def _from_snapshot(ecosystem, name, version):
+    snapshot = get_snapshot()
+    value = snapshot.get(ecosystem, name, version) if snapshot is not None else None
+    if snapshot is not None:
+        Instrumentation.count("snapshot_hits" if value is not None else "snapshot_misses")
+    return value
+
+
+def _fetch_metadata(ecosystem, name, version, url, use_snapshot=True, failure_key=None):
+    key = failure_key or (ecosystem, name, version)
+    value = _from_snapshot(ecosystem, name, version) if use_snapshot else None
+    if value is not None:
+        return value
+    if OFFLINE:
+        _record_failure(key, "not-in-snapshot")
+        return None
+
+    cache = get_cache()
+    entry = cache.get_entry(ecosystem, name, version) if cache is not None else None
+    if entry is not None and not entry["expired"]:
+        Instrumentation.count("cache_hits")
+        return entry["value"]
+    if cache is not None:
+        Instrumentation.count("cache_misses")
+
+    headers = {}
+    if entry is not None:
+        if entry["etag"]:
+            headers["If-None-Match"] = entry["etag"]
+        if entry["last_modified"]:
+            headers["If-Modified-Since"] = entry["last_modified"]
+
+    try:
+        response = http_get(url, headers=headers)
+    except (BudgetExhausted, OSError) as e:
+        if entry is not None:
+            # Outdated metadata beats none
+            Instrumentation.count("stale_cache_served")
+            return entry["value"]
+        _failed_request(key, e)
+        return None
+    if response.status_code == 304 and entry is not None:
+        Instrumentation.count("cache_revalidations")
+        cache.touch(ecosystem, name, version)
+        return entry["value"]
+    if response.status_code != 200:
+        if entry is not None and response.status_code in RETRY_STATUSES:
+            Instrumentation.count("stale_cache_served")
+            return entry["value"]
+        _failed_response(key, response)
+        return None
+
+    try:
+        data = response.json()
+    except ValueError:  # e.g. a proxy's HTML error page served with 200
+        if entry is not None:
+            Instrumentation.count("stale_cache_served")
+            return entry["value"]
+        _record_failure(key, "invalid-json")
+        return None
+    if cache is not None:
+        cache.put(ecosystem, name, version, data,
+                  etag=response.headers.get("ETag"), last_modified=response.headers.get("Last-Modified"))
+    return data
+
+
+def store_metadata(ecosystem, name, version, data):
+    """
+    Caches metadata that was obtained in bulk (e.g. from an npm packument).
+    """
+    cache = get_cache()
+    if cache is not None and data is not None and not OFFLINE:
+        cache.put(ecosystem, name, version, data)
+
+
+def get_cached_metadata(ecosystem, name, version):
+    value = _from_snapshot(ecosystem, name, version)
+    if value is not None or OFFLINE:
+        return value
+
+    cache = get_cache()
+    value = cache.get(ecosystem, name, version) if cache is not None else None
+    if value is not None:
+        Instrumentation.count("cache_hits")
+    return value
+
+
+def mark_unenriched(component, reason):
+    """
+    Flags a component written without registry metadata, so that it is not mistaken for
+    a complete one and gets enriched again by the next incremental run.
+    """
+    global _unenriched
+    component.setdefault("properties", []).extend([
+        {"name": UNENRICHED_PROPERTY, "value": "unenriched"},
+        {"name": UNENRICHED_REASON_PROPERTY, "value": reason},
+    ])
+    _unenriched += 1
+    Instrumentation.count("unenriched_components")
+    return component
+
+
+def is_unenriched(component):
+    return any(prop.get("name") == UNENRICHED_PROPERTY for prop in component.get("properties", ()))
+
+
+def enrichment_summary():
+    """
+    Describes the components written without metadata since start_budget(), or None.
+    """
+    if not _unenriched:
+        return None
+    reasons = {}
+    for reason in _failures.values():
+        reasons[reason] = reasons.get(reason, 0) + 1
+    details = ", ".join(f"{count} {reason}" for reason, count in sorted(reasons.items()))
+    summary = f"{_unenriched} components written without registry metadata ({details})"
+    if budget_exhausted():
+        summary += f"; the enrichment budget of {ENRICH_BUDGET:g} s ran out"
+    return summary
+
+
+def cache_summary():
+    if OFFLINE:
+        return f"Offline: metadata read from snapshot {SNAPSHOT_PATH}"
+    cache = get_cache()
+    if cache is None:
+        return "Metadata cache disabled"
+    stats = cache.stats()
+    return (f"Metadata cache: {stats['hits']} hits, {stats['misses']} misses, "
+            f"{stats['revalidations']} revalidated, {stats['evictions']} evictions")
+
+
+def fetch_all(keys, fetch, max_workers=None):
+    """
+    Calls fetch(*key) for every key concurrently and returns the results in the
+    same order as keys, so callers can emit components deterministically.
+    """
+    keys = list(keys)
+    if not keys:
+        return []
+
+    workers = min(max_workers or MAX_WORKERS, len(keys))
+    if workers <= 1:
+        return [fetch(*key) for key in keys]
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(lambda key: fetch(*key), keys))
+
+
+def export_snapshot(snapshot_path, keys=None, refresh=False):
+    """
+    Writes registry metadata for keys, a list of (ecosystem, name, version), to the snapshot
+    at snapshot_path, or for every entry of the metadata cache when keys is None. Metadata
+    already in the snapshot is kept and only the rest is fetched, from the cache or the
+    registries as usual, unless refresh is set, in which case every key is fetched again
+    without consulting any snapshot.
+    """
+    if keys is None:
+        cache = get_cache()
+        keys = [key for key in cache.keys() if key[0] != NPM_PACKUMENT] if cache is not None else []
+
+    def fetch(pending):
+        return fetch_all(pending, lambda ecosystem, name, version: fetch_metadata(
+            ecosystem, name, version, metadata_url(ecosystem, name, version), use_snapshot=not refresh))
+
+    def release_snapshot():
+        # --snapshot may map the very file being rewritten; it is reopened on next use
+        global _snapshot
+        with _snapshot_lock:
+            if _snapshot is not None and os.path.realpath(_snapshot.path) == os.path.realpath(snapshot_path):
+                _snapshot.close()
+                _snapshot = None
+
+    with Instrumentation.stage("snapshot"):
+        return MetadataSnapshot.refresh_snapshot(snapshot_path, keys, fetch, refresh, release_snapshot)
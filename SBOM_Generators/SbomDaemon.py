@@ -0,0 +1,372 @@
+import glob
+import itertools
+import json
+import multiprocessing
+import os
+import socketserver
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from SBOM_Generators import BatchRunner, Paths, Plugins, RegistryClient, TemplateRenderer
+
+DEFAULT_ADDRESS = "127.0.0.1:8765"
+
+# Latency samples kept per route, and finished jobs kept for GET /jobs/<id>
+LATENCY_SAMPLES = 1024
+JOB_HISTORY = 1000
+
+def _init_daemon_worker(slots, initializer, options):
+    """
+    Runs once per worker process. Everything loaded here stays warm for every job the
+    worker runs: generator modules and their imports, compiled templates, the metadata
+    cache connection and the HTTP connection pool.
+    """
+    BatchRunner.init_worker(slots, initializer, options)
+    for name in Plugins.names():
+        Plugins.load(name)
+    for template_file in glob.glob(os.path.join(Paths.TEMPLATES_DIR, "*.json")):
+        TemplateRenderer.load_template(template_file)
+    RegistryClient.get_session()
+    RegistryClient.get_cache()
+
+
+def _ping():
+    return os.getpid()
+
+
+def _confine(path, output_dir):
+    """
+    Resolves path (following symlinks) and rejects it unless it lies inside output_dir, so
+    that API clients can only have SBOMs written and read where the daemon keeps them.
+    """
+    resolved = os.path.realpath(path)
+    root = os.path.realpath(output_dir)
+    if os.path.commonpath([resolved, root]) != root or resolved == root:
+        raise ValueError(f"{path} is outside the output directory {root}")
+    return resolved
+
+
+def plan_job(manifest, output_dir, output_file=None, previous_sbom=None):
+    """
+    Turns a manifest path into a job as BatchRunner plans them, optionally with an explicit
+    output file and previous SBOM, both of which must lie inside output_dir.
+    """
+    manifest = os.path.abspath(manifest)
+    if os.path.basename(manifest) not in Plugins.manifests():
+        raise ValueError(f"{manifest} is not a manifest of a known ecosystem ({', '.join(Plugins.manifests())})")
+    if not os.path.isfile(manifest):
+        raise ValueError(f"{manifest} does not exist")
+
+    job = BatchRunner.plan_jobs([manifest], output_dir)[0]
+    if output_file:
+        job["arguments"]["output_file"] = _confine(output_file, output_dir)
+    if previous_sbom:
+        job["arguments"]["previous_sbom"] = _confine(previous_sbom, output_dir)
+    return job
+
+
+class _Latencies:
+    def __init__(self):
+        self.count = 0
+        self.samples = deque(maxlen=LATENCY_SAMPLES)
+
+    def add(self, seconds):
+        self.count += 1
+        self.samples.append(seconds)
+
+    def summary(self):
+        samples = list(self.samples)
+        return {
+            "count": self.count,
+            "p50_ms": BatchRunner.percentile(samples, 0.50) * 1000,
+            "p95_ms": BatchRunner.percentile(samples, 0.95) * 1000,
+            "p99_ms": BatchRunner.percentile(samples, 0.99) * 1000,
+            "max_ms": max(samples, default=0.0) * 1000,
+        }
+
+
+class SbomDaemon:
+    """
+    Long-running SBOM generator. Jobs run on a pool of worker processes that live as long
+    as the daemon, so each job starts with warm imports, templates, metadata cache and
+    registry connections. Jobs arrive through the HTTP API (serve) or from manifests that
+    changed on disk (watch); jobs for a manifest that is already queued are coalesced.
+    """
+
+    def __init__(self, output_dir, jobs=None, max_subprocesses=None, initializer=None, options=None):
+        self.output_dir = os.path.abspath(output_dir)
+        self.workers = jobs or os.cpu_count() or 1
+        self.started_at = time.time()
+        slots = multiprocessing.BoundedSemaphore(max_subprocesses or self.workers)
+        self._executor = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_daemon_worker,
+                                             initargs=(slots, initializer, options or {}))
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._jobs = {}
+        self._finished = deque()
+        # manifest -> id of its queued job, for coalescing
+        self._queued = {}
+        self._latencies = {}
+        self._job_seconds = _Latencies()
+        self._queue_seconds = _Latencies()
+        self._totals = {"submitted": 0, "coalesced": 0, "completed": 0, "failed": 0, "max_queue_depth": 0}
+        self._counters = {}
+        self._server = None
+
+        # Start the workers now so the first job does not pay for their warm-up
+        for future in [self._executor.submit(_ping) for _ in range(self.workers)]:
+            future.result()
+
+    def submit(self, manifest, output_file=None, previous_sbom=None):
+        """
+        Queues a generation job and returns its record; a job already queued for the same
+        manifest and output is returned instead of queueing another one.
+        """
+        job = plan_job(manifest, self.output_dir, output_file, previous_sbom)
+        key = (os.path.abspath(manifest), job["arguments"]["output_file"])
+        with self._lock:
+            queued = self._jobs.get(self._queued.get(key))
+            if queued is not None and _status(queued) == "queued":
+                self._totals["coalesced"] += 1
+                return queued
+
+            record = {"id": next(self._ids), "manifest": key[0], "ecosystem": job["ecosystem"], "output_file": key[1],
+                      "status": "queued", "submitted_at": time.time(), "result": None, "done": threading.Event()}
+            self._jobs[record["id"]] = record
+            self._queued[key] = record["id"]
+            self._totals["submitted"] += 1
+            record["future"] = self._executor.submit(BatchRunner.run_job, job, record["submitted_at"])
+            self._totals["max_queue_depth"] = max(self._totals["max_queue_depth"], self._queue_depth())
+
+        record["future"].add_done_callback(lambda future: self._finish(record, key, future))
+        return record
+
+    def _queue_depth(self):
+        return sum(1 for record in self._jobs.values() if _status(record) == "queued")
+
+    def _finish(self, record, key, future):
+        try:
+            result = future.result()
+        except Exception as e:  # the worker process itself died
+            result = {"error": repr(e), "queue_seconds": 0.0, "run_seconds": 0.0, "counters": {}}
+
+        with self._lock:
+            record["result"] = result
+            record["status"] = "failed" if result["error"] else "done"
+            self._totals["failed" if result["error"] else "completed"] += 1
+            self._job_seconds.add(result["run_seconds"])
+            self._queue_seconds.add(result["queue_seconds"])
+            for name, amount in result.get("counters", {}).items():
+                self._counters[name] = self._counters.get(name, 0) + amount
+            if self._queued.get(key) == record["id"]:
+                del self._queued[key]
+
+            self._finished.append(record["id"])
+            while len(self._finished) > JOB_HISTORY:
+                self._jobs.pop(self._finished.popleft(), None)
+        record["done"].set()
+        status = "ok" if not result["error"] else f"FAILED ({result['error']})"
+        print(f"[job {record['id']}] {record['ecosystem']:<6} {record['manifest']} {result['run_seconds']:.2f} s {status}")
+
+    def job(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def record_latency(self, route, seconds):
+        with self._lock:
+            latencies = self._latencies.get(route)
+            if latencies is None:
+                latencies = self._latencies[route] = _Latencies()
+            latencies.add(seconds)
+
+    def metrics(self):
+        with self._lock:
+            return {
+                "uptime_seconds": time.time() - self.started_at,
+                "workers": self.workers,
+                "queue_depth": self._queue_depth(),
+                "running": sum(1 for record in self._jobs.values() if _status(record) == "running"),
+                "jobs": dict(self._totals),
+                "job_seconds": self._job_seconds.summary(),
+                "queue_seconds": self._queue_seconds.summary(),
+                "requests": {route: latencies.summary() for route, latencies in sorted(self._latencies.items())},
+                "counters": dict(self._counters),
+            }
+
+    def watch(self, paths, interval=2.0):
+        """
+        Polls the manifests under paths and queues a job whenever one is created or modified.
+        Runs on a daemon thread until the process exits.
+        """
+        manifests = BatchRunner.collect_manifests(paths)
+        print(f"Watching {len(manifests)} manifests")
+
+        def mtimes():
+            found = {}
+            for manifest in BatchRunner.collect_manifests(paths):
+                try:
+                    found[manifest] = os.stat(manifest).st_mtime_ns
+                except OSError:
+                    continue
+            return found
+
+        def poll():
+            seen = mtimes()
+            while True:
+                time.sleep(interval)
+                current = mtimes()
+                for manifest, mtime_ns in current.items():
+                    if seen.get(manifest) != mtime_ns:
+                        print(f"{manifest} changed, regenerating")
+                        try:
+                            self.submit(manifest)
+                        except ValueError as e:
+                            print(e)
+                seen = current
+
+        thread = threading.Thread(target=poll, name="sbom-watch", daemon=True)
+        thread.start()
+        return thread
+
+    def serve(self, address=DEFAULT_ADDRESS):
+        """
+        Serves the HTTP API on "host:port" or "unix:/path/to/socket" until shut down.
+        """
+        if address.startswith("unix:"):
+            path = address[len("unix:"):]
+            if os.path.exists(path):
+                os.remove(path)
+            self._server = _UnixHTTPServer(path, _Handler)
+        else:
+            host, _, port = address.rpartition(":")
+            self._server = ThreadingHTTPServer((host or "127.0.0.1", int(port)), _Handler)
+        self._server.sbom_daemon = self
+        print(f"SBOM daemon listening on {address} with {self.workers} workers")
+        try:
+            self._server.serve_forever()
+        finally:
+            self._server.server_close()
+            if address.startswith("unix:") and os.path.exists(address[len("unix:"):]):
+                os.remove(address[len("unix:"):])
+
+    def shutdown(self):
+        if self._server is not None:
+            self._server.shutdown()
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+
+class _UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def get_request(self):
+        request, _ = super().get_request()
+        # BaseHTTPRequestHandler expects a (host, port) client address
+        return request, ("unix", 0)
+
+
+def _status(record):
+    # A worker has picked the job up once its future is running
+    if record["status"] == "queued" and record["future"].running():
+        return "running"
+    return record["status"]
+
+
+def _public(record):
+    document = {key: value for key, value in record.items() if key not in ("done", "future")}
+    document["status"] = _status(record)
+    return document
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """
+    POST /jobs          {"manifest": path, "output_file"?: path, "previous_sbom"?: path, "wait"?: true}
+                        as application/json; output_file and previous_sbom must be inside the output directory
+    GET  /jobs/<id>     job status and, once finished, its result
+    GET  /metrics       queue depth, job and request latencies, aggregated counters
+    GET  /health
+    """
+
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, document):
+        body = json.dumps(document, indent=4).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _timed(self, route, handle):
+        start = time.perf_counter()
+        try:
+            handle()
+        finally:
+            self.server.sbom_daemon.record_latency(route, time.perf_counter() - start)
+
+    def do_GET(self):
+        daemon = self.server.sbom_daemon
+        parts = self.path.strip("/").split("/")
+        if parts == ["health"]:
+            self._timed("GET /health", lambda: self._send(200, {"status": "ok"}))
+        elif parts == ["metrics"]:
+            self._timed("GET /metrics", lambda: self._send(200, daemon.metrics()))
+        elif len(parts) == 2 and parts[0] == "jobs" and parts[1].isdigit():
+            def handle():
+                record = daemon.job(int(parts[1]))
+                if record is None:
+                    self._send(404, {"error": f"no job {parts[1]}"})
+                else:
+                    self._send(200, _public(record))
+            self._timed("GET /jobs/<id>", handle)
+        else:
+            self._send(404, {"error": f"unknown path {self.path}"})
+
+    def do_POST(self):
+        if self.path.rstrip("/") != "/jobs":
+            self._send(404, {"error": f"unknown path {self.path}"})
+            return
+
+        # Browsers send cross-origin text/plain or form POSTs without a preflight, JSON ones never
+        content_type = self.headers.get("Content-Type", "").split(";")[0].strip().lower()
+        if content_type != "application/json":
+            self._send(415, {"error": "job requests must be sent as application/json"})
+            return
+
+        def handle():
+            try:
+                request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                record = self.server.sbom_daemon.submit(request["manifest"], request.get("output_file"),
+                                                   request.get("previous_sbom"))
+            except (KeyError, ValueError) as e:
+                self._send(400, {"error": f"bad job request: {e}"})
+                return
+            if request.get("wait", True):
+                record["done"].wait()
+                self._send(200, _public(record))
+            else:
+                self._send(202, _public(record))
+
+        self._timed("POST /jobs", handle)
+
+
+def run_daemon(address, watch_paths, output_dir, jobs=None, max_subprocesses=None, initializer=None, options=None,
+               watch_interval=2.0):
+    daemon = SbomDaemon(output_dir, jobs, max_subprocesses, initializer, options)
+    if watch_paths:
+        daemon.watch(watch_paths, watch_interval)
+    try:
+        if address:
+            daemon.serve(address)
+        else:
+            while True:
+                time.sleep(3600)
+    except KeyboardInterrupt:
+        print("Shutting down")
+    finally:
+        daemon.shutdown()
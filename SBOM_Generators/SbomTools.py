@@ -0,0 +1,219 @@
+import hashlib
+import itertools
+import json
+import os
+import uuid
+
+from SBOM_Generators import SbomWriter, StreamingParsers
+
+STREAMED = {"components": list, "dependencies": list}
+
+
+# File names --merge, --diff and friends pick up when given a directory
+SBOM_SUFFIXES = tuple(extension + suffix for extension in (".json", ".ndjson")
+                      for suffix in ("",) + tuple(SbomWriter.SUFFIXES.values()))
+
+
+def open_sbom(sbom_file):
+    """
+    Opens an SBOM in any format and compression StreamingSbomWriter writes.
+    """
+    # Components and dependencies are streamed so that large SBOMs never sit in memory whole
+    if StreamingParsers.is_ndjson(sbom_file, STREAMED):
+        return StreamingParsers.StreamedNdjsonDocument(sbom_file, SbomWriter.NDJSON_RECORDS)
+    return StreamingParsers.StreamedJsonDocument(sbom_file, STREAMED)
+
+
+def component_key(component):
+    return component.get("bom-ref") or component.get("purl") or ""
+
+
+def split_version(purl):
+    """
+    Splits "pkg:npm/@scope/name@1.0.0" into ("pkg:npm/@scope/name", "1.0.0").
+    """
+    purl = purl.split("?", 1)[0]
+    head, separator, version = purl.rpartition("@")
+    if not separator or head.endswith("/") or "/" not in head:
+        return purl, ""
+    return head, version
+
+
+def _digest(component):
+    return hashlib.sha1(json.dumps(component, sort_keys=True).encode("utf-8")).digest()
+
+
+def _edges(sbom):
+    for dependency in sbom.get("dependencies", []):
+        ref = dependency.get("ref", "")
+        for depends_on in dependency.get("dependsOn", []):
+            yield ref, depends_on
+
+
+def diff_sboms(old_file, new_file):
+    """
+    Compares two SBOMs in one pass over each. Components are matched on bom-ref (or purl);
+    a package present in both at different versions is reported as version-changed rather
+    than as an addition plus a removal.
+    """
+    # Only a digest of each old component is kept, so memory is bounded by the number of refs
+    old_index = {component_key(component): _digest(component) for component in open_sbom(old_file).get("components", [])}
+    old_edges = set(_edges(open_sbom(old_file)))
+
+    added = []
+    modified = []
+    seen = set()
+    for component in open_sbom(new_file).get("components", []):
+        key = component_key(component)
+        if key in seen:
+            continue
+        seen.add(key)
+        digest = old_index.get(key)
+        if digest is None:
+            added.append(key)
+        elif digest != _digest(component):
+            modified.append(key)
+    removed = [key for key in old_index if key not in seen]
+
+    # Pair additions and removals of the same package into version changes
+    removed_versions = {}
+    for key in removed:
+        name, version = split_version(key)
+        removed_versions.setdefault(name, []).append(version)
+    added_versions = {}
+    for key in added:
+        name, version = split_version(key)
+        added_versions.setdefault(name, []).append(version)
+    changed = [
+        {"name": name, "from": removed_versions[name], "to": versions}
+        for name, versions in added_versions.items() if name in removed_versions
+    ]
+    changed_names = {change["name"] for change in changed}
+
+    new_edges = set()
+    edges_added = []
+    for edge in _edges(open_sbom(new_file)):
+        if edge in new_edges:
+            continue
+        new_edges.add(edge)
+        if edge not in old_edges:
+            edges_added.append(list(edge))
+    edges_removed = [list(edge) for edge in old_edges if edge not in new_edges]
+
+    return {
+        "added": [key for key in added if split_version(key)[0] not in changed_names],
+        "removed": [key for key in removed if split_version(key)[0] not in changed_names],
+        "version_changed": changed,
+        "modified": modified,
+        "edges_added": sorted(edges_added),
+        "edges_removed": sorted(edges_removed),
+    }
+
+
+def print_diff(diff):
+    for key in diff["added"]:
+        print(f"+ {key}")
+    for key in diff["removed"]:
+        print(f"- {key}")
+    for change in diff["version_changed"]:
+        print(f"~ {change['name']} {', '.join(change['from'])} -> {', '.join(change['to'])}")
+    for key in diff["modified"]:
+        print(f"* {key}")
+    for ref, depends_on in diff["edges_added"]:
+        print(f"+ {ref} -> {depends_on}")
+    for ref, depends_on in diff["edges_removed"]:
+        print(f"- {ref} -> {depends_on}")
+    print(f"{len(diff['added'])} added, {len(diff['removed'])} removed, {len(diff['version_changed'])} version changed, "
+          f"{len(diff['modified'])} modified, {len(diff['edges_added'])} edges added, "
+          f"{len(diff['edges_removed'])} edges removed")
+
+
+def collect_sbom_files(paths):
+    """
+    Expands directories to the SBOMs (SBOM_SUFFIXES) below them and text files to the SBOM paths
+    they list one per line; files keep the order they were given in.
+    """
+    sbom_files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for dirpath, dirnames, filenames in os.walk(path):
+                dirnames.sort()
+                sbom_files.extend(os.path.join(dirpath, name) for name in sorted(filenames)
+                                  if name.endswith(SBOM_SUFFIXES) and name != "batch_report.json")
+        elif path.endswith(SBOM_SUFFIXES):
+            sbom_files.append(path)
+        else:
+            base = os.path.dirname(os.path.abspath(path))
+            with open(path) as f:
+                entries = [line.strip() for line in f if line.strip() and not line.strip().startswith("#")]
+            sbom_files.extend(collect_sbom_files([os.path.join(base, entry) for entry in entries]))
+    return list(dict.fromkeys(sbom_files))
+
+
+def registry_keys(sbom_files, ecosystems=("npm", "pypi")):
+    """
+    Returns the (ecosystem, name, version) of every npm and PyPI component in the SBOMs,
+    i.e. the registry metadata needed to regenerate them.
+    """
+    keys = {}
+    for sbom_file in sbom_files:
+        for component in open_sbom(sbom_file).get("components", []):
+            head, version = split_version(component.get("purl", ""))
+            ecosystem, _, name = head[len("pkg:"):].partition("/")
+            if head.startswith("pkg:") and ecosystem in ecosystems and name and version:
+                keys[(ecosystem, name, version)] = None
+    return list(keys)
+
+
+def merge_sboms(sbom_files, output_file, name="merged-sbom", version="0.1.0"):
+    """
+    Merges SBOMs into one in a single pass over the inputs. Components are deduplicated on
+    bom-ref (the first occurrence wins) and streamed straight to the output; the dependsOn
+    lists of entries sharing a ref are unioned in order. The header is taken from the
+    first input with a fresh serial number and a new root component, name@version, which
+    depends on the root component of every input; those become ordinary components.
+    Dependency entries that refer to an input's root by its purl rather than its bom-ref
+    (as the Maven generator's do) are pointed at the bom-ref.
+    """
+    # The output may live in a directory being merged, e.g. from a previous run
+    output_file = SbomWriter.output_path(output_file)
+    sbom_files = [sbom_file for sbom_file in sbom_files if os.path.abspath(sbom_file) != os.path.abspath(output_file)]
+    if not sbom_files:
+        raise ValueError("No SBOMs to merge")
+
+    header = open_sbom(sbom_files[0]).header()
+    header["serialNumber"] = f"urn:uuid:{uuid.uuid4()}"
+    root_ref = f"pkg:generic/{name}@{version}"
+    header["metadata"] = dict(header.get("metadata", {}), component={
+        "bom-ref": root_ref, "name": name, "type": "application", "version": version})
+
+    seen = set()
+    # ref -> ordered set of dependsOn refs
+    dependencies = {root_ref: {}}
+    with SbomWriter.StreamingSbomWriter(output_file, header) as writer:
+        for sbom_file in sbom_files:
+            sbom = open_sbom(sbom_file)
+            input_root = sbom.header().get("metadata", {}).get("component")
+            input_components = sbom.get("components", [])
+            if input_root:
+                dependencies[root_ref][component_key(input_root)] = None
+                input_components = itertools.chain([input_root], input_components)
+            for component in input_components:
+                key = component_key(component)
+                if key not in seen:
+                    seen.add(key)
+                    writer.components.append(component)
+            aliases = {}
+            if input_root and input_root.get("purl") and input_root["purl"] not in seen:
+                aliases[input_root["purl"]] = component_key(input_root)
+            for dependency in sbom.get("dependencies", []):
+                ref = dependency.get("ref", "")
+                depends_on = dependencies.setdefault(aliases.get(ref, ref), {})
+                for ref in dependency.get("dependsOn", []):
+                    depends_on[aliases.get(ref, ref)] = None
+
+        for ref, depends_on in dependencies.items():
+            writer.dependencies.append({"ref": ref, "dependsOn": list(depends_on)})
+
+    print(f"Merged {len(sbom_files)} SBOMs into {output_file}: {len(seen)} components, {len(dependencies)} dependency entries")
+    return {"inputs": len(sbom_files), "components": len(seen), "dependencies": len(dependencies)}
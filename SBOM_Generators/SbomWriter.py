@@ -0,0 +1,252 @@
+import gzip
+import io
+import json
+import os
+import tempfile
+import uuid
+from functools import partial
+
+from SBOM_Generators import Instrumentation, SchemaValidation
+
+STREAMED_KEYS = ("components", "dependencies")
+
+# Set by --output-format:
+#   pretty   json.dump(sbom, f, indent=4), byte for byte
+#   compact  the same document without whitespace
+#   ndjson   the header (the document without components and dependencies) on the first
+#            line, then one {"component": ...} or {"dependency": ...} object per line
+FORMAT = os.environ.get("SBOM_OUTPUT_FORMAT", "pretty")
+FORMATS = ("pretty", "compact", "ndjson")
+
+# Set by --compress; the matching suffix is appended to the output file name
+COMPRESSION = os.environ.get("SBOM_COMPRESSION", "none")
+COMPRESSIONS = ("none", "gzip", "zstd")
+SUFFIXES = {"gzip": ".gz", "zstd": ".zst"}
+GZIP_LEVEL = 6
+ZSTD_LEVEL = 3
+
+# Set by --json-encoder: "auto" serializes compact and ndjson output with orjson when it is
+# installed. Pretty output always uses json, as orjson cannot indent by four spaces.
+ENCODER = os.environ.get("SBOM_JSON_ENCODER", "auto")
+ENCODERS = ("auto", "json", "orjson")
+
+# Tag of each streamed key's entries in ndjson output
+NDJSON_RECORDS = {"components": "component", "dependencies": "dependency"}
+
+
+def indent_json(value, level):
+    """
+    Serializes value exactly as json.dump(..., indent=4) would at the given nesting level.
+    """
+    return json.dumps(value, indent=4).replace("\n", "\n" + "    " * level)
+
+
+def compact_encoder():
+    """
+    Returns a function serializing a value to JSON text without whitespace.
+    """
+    if ENCODER != "json":
+        try:
+            # Optional accelerator, so only imported when compact output is written
+            import orjson
+        except ImportError:
+            if ENCODER == "orjson":
+                raise RuntimeError("--json-encoder orjson needs the orjson package") from None
+        else:
+            dumps = orjson.dumps
+            return lambda value: dumps(value).decode("utf-8")
+    return partial(json.dumps, separators=(",", ":"), ensure_ascii=False)
+
+
+def output_path(output_file):
+    """
+    Returns the file an SBOM meant for output_file is written to under the current
+    format and compression, e.g. sbom.ndjson.gz for sbom.json. Idempotent.
+    """
+    for suffix in SUFFIXES.values():
+        if output_file.endswith(suffix):
+            output_file = output_file[:-len(suffix)]
+    root, extension = os.path.splitext(output_file)
+    if FORMAT == "ndjson" and extension == ".json":
+        output_file = root + ".ndjson"
+    return output_file + SUFFIXES.get(COMPRESSION, "")
+
+
+def open_output(path):
+    """
+    Opens path for writing text, compressed as COMPRESSION says.
+    """
+    if COMPRESSION == "gzip":
+        return io.TextIOWrapper(gzip.open(path, "wb", compresslevel=GZIP_LEVEL), encoding="utf-8")
+    if COMPRESSION == "zstd":
+        try:
+            # Not in the standard library; only needed for zstd output
+            import zstandard
+        except ImportError:
+            raise RuntimeError("--compress zstd needs the zstandard package") from None
+        writer = zstandard.ZstdCompressor(level=ZSTD_LEVEL).stream_writer(open(path, "wb"), closefd=True)
+        return io.TextIOWrapper(writer, encoding="utf-8")
+    return open(path, "w", encoding="utf-8")
+
+
+class _Sink:
+    """
+    List-like stand-in for sbom["components"] / sbom["dependencies"] that forwards
+    appended entries to the writer instead of keeping them in memory.
+    """
+
+    def __init__(self, write):
+        self._write = write
+        self.count = 0
+
+    def append(self, entry):
+        self._write(entry)
+        self.count += 1
+
+    def extend(self, entries):
+        for entry in entries:
+            self.append(entry)
+
+    def __len__(self):
+        return self.count
+
+
+class StreamingSbomWriter:
+    """
+    Writes an SBOM incrementally: the filled sbom template header is written once,
+    every component goes to disk as soon as it is appended, and dependencies are
+    spooled to a temporary file and copied after the components on close. In the
+    default pretty format the output is byte-for-byte what
+    json.dump(sbom, f, indent=4) produces; see FORMAT for the others. The output
+    goes to output_path(output_file), available as writer.output_file. It is written to
+    a temporary file next to it that only replaces it on close, so a failed run leaves
+    the previous SBOM in place.
+
+    Unless SchemaValidation.MODE is "off", every entry is also validated against
+    CycloneDX 1.4 as it is written, and the violations are reported on close.
+    """
+
+    def __init__(self, output_file, sbom_header):
+        self.output_file = output_path(output_file)
+        self.header = sbom_header
+        self.format = FORMAT
+        self.components = _Sink(self._write_component)
+        self.dependencies = _Sink(self._spool_dependency)
+        self._closed = False
+        self.validator = None
+        if SchemaValidation.MODE != "off":
+            self.validator = SchemaValidation.StreamValidator(sbom_header, self.output_file)
+
+        # Spooled dependencies are re-indented for pretty output and copied as they are otherwise
+        self._dumps = json.dumps if self.format == "pretty" else compact_encoder()
+        directory, name = os.path.split(self.output_file)
+        self._temp_file = os.path.join(directory, f".{name}.{uuid.uuid4().hex}.tmp")
+        self._file = open_output(self._temp_file)
+        self._spool = tempfile.TemporaryFile("w+", encoding="utf-8")
+
+        rest = {key: value for key, value in sbom_header.items() if key not in STREAMED_KEYS}
+        if self.format == "ndjson":
+            self._file.write(self._dumps(rest) + "\n")
+        elif self.format == "compact":
+            self._file.write(self._dumps(rest)[:-1] + (',"components":[' if rest else '"components":['))
+        else:
+            self._file.write("{")
+            separator = "\n"
+            for key, value in rest.items():
+                self._file.write(f"{separator}    {json.dumps(key)}: {indent_json(value, 1)}")
+                separator = ",\n"
+            self._file.write(f'{separator}    "components": [')
+
+    def _write_component(self, component):
+        if self.validator:
+            self.validator.component(component)
+        with Instrumentation.stage("serialize", detail=True):
+            if self.format == "ndjson":
+                self._file.write(f'{{"component":{self._dumps(component)}}}\n')
+            elif self.format == "compact":
+                self._file.write(("," if self.components.count else "") + self._dumps(component))
+            else:
+                separator = "," if self.components.count else ""
+                self._file.write(f"{separator}\n        {indent_json(component, 2)}")
+
+    def _spool_dependency(self, dependency):
+        if self.validator:
+            self.validator.dependency(dependency)
+        with Instrumentation.stage("serialize", detail=True):
+            self._spool.write(self._dumps(dependency))
+            self._spool.write("\n")
+
+    def _copy_dependencies(self):
+        self._spool.seek(0)
+        with Instrumentation.stage("serialize"):
+            if self.format == "ndjson":
+                for line in self._spool:
+                    self._file.write(f'{{"dependency":{line[:-1]}}}\n')
+            elif self.format == "compact":
+                separator = ""
+                for line in self._spool:
+                    self._file.write(separator + line[:-1])
+                    separator = ","
+            else:
+                separator = ""
+                for line in self._spool:
+                    self._file.write(f"{separator}\n        {indent_json(json.loads(line), 2)}")
+                    separator = ","
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        try:
+            if self.format == "ndjson":
+                self._copy_dependencies()
+            elif self.format == "compact":
+                self._file.write('],"dependencies":[')
+                self._copy_dependencies()
+                self._file.write("]}")
+            else:
+                self._file.write("\n    ]" if self.components.count else "]")
+                self._file.write(',\n    "dependencies": [')
+                self._copy_dependencies()
+                self._file.write("\n    ]" if self.dependencies.count else "]")
+                self._file.write("\n}")
+            Instrumentation.count("components", self.components.count)
+            Instrumentation.count("dependencies", self.dependencies.count)
+            self._file.close()
+            if self.validator:
+                self._report_validation()
+            os.replace(self._temp_file, self.output_file)
+        except BaseException:
+            self._discard()
+            raise
+        finally:
+            self._spool.close()
+
+    def _report_validation(self):
+        errors = self.validator.finish()
+        print(self.validator.summary())
+        if errors and SchemaValidation.MODE == "strict":
+            raise SchemaValidation.ValidationError(
+                f"{self.output_file} is not valid CycloneDX 1.4 ({self.validator.errors} violations)")
+
+    def _discard(self):
+        self._file.close()
+        if os.path.exists(self._temp_file):
+            os.remove(self._temp_file)
+
+    def abort(self):
+        """
+        Closes the writer and removes the partially written output, leaving output_file as it was.
+        """
+        self._closed = True
+        self._spool.close()
+        self._discard()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
@@ -0,0 +1,430 @@
+import os
+import re
+
+from SBOM_Generators import Instrumentation
+
+# Set by --validate: "warn" reports schema violations after writing an SBOM, "strict" also
+# fails the run, "off" skips validation
+MODE = os.environ.get("SBOM_VALIDATE", "warn")
+MODES = ("off", "warn", "strict")
+
+# Messages kept per SBOM; violations beyond these are only counted
+MAX_MESSAGES = 20
+
+
+class ValidationError(ValueError):
+    pass
+
+
+# The parts of the CycloneDX 1.4 JSON schema (bom-1.4.schema.json) the generators emit.
+# License ids are checked to be strings rather than against the SPDX list.
+HASH_ALGORITHMS = ["MD5", "SHA-1", "SHA-256", "SHA-384", "SHA-512", "SHA3-256", "SHA3-384", "SHA3-512",
+                   "BLAKE2b-256", "BLAKE2b-384", "BLAKE2b-512", "BLAKE3"]
+EXTERNAL_REFERENCE_TYPES = ["vcs", "issue-tracker", "website", "advisories", "bom", "mailing-list", "social", "chat",
+                            "documentation", "support", "distribution", "license", "build-meta", "build-system",
+                            "release-notes", "other"]
+COMPONENT_TYPES = ["application", "framework", "library", "container", "operating-system", "device", "firmware", "file"]
+
+STRING = {"type": "string"}
+OBJECT = {"type": "object"}
+
+HASH = {
+    "type": "object",
+    "required": ["alg", "content"],
+    "properties": {
+        "alg": {"enum": HASH_ALGORITHMS},
+        "content": {"type": "string",
+                    "pattern": r"^([a-fA-F0-9]{32}|[a-fA-F0-9]{40}|[a-fA-F0-9]{64}|[a-fA-F0-9]{96}|[a-fA-F0-9]{128})$"},
+    },
+    "additionalProperties": False,
+}
+
+EXTERNAL_REFERENCE = {
+    "type": "object",
+    "required": ["url", "type"],
+    "properties": {
+        "url": STRING,
+        "comment": STRING,
+        "type": {"enum": EXTERNAL_REFERENCE_TYPES},
+        "hashes": {"type": "array", "items": HASH},
+    },
+    "additionalProperties": False,
+}
+
+LICENSE = {
+    "type": "object",
+    "oneOf": [{"required": ["id"]}, {"required": ["name"]}],
+    "properties": {"id": STRING, "name": STRING, "text": OBJECT, "url": STRING},
+    "additionalProperties": False,
+}
+
+LICENSE_CHOICE = {
+    "type": "object",
+    "oneOf": [{"required": ["license"]}, {"required": ["expression"]}],
+    "properties": {"license": LICENSE, "expression": STRING},
+    "additionalProperties": False,
+}
+
+PROPERTY = {
+    "type": "object",
+    "properties": {"name": STRING, "value": STRING},
+    "additionalProperties": False,
+}
+
+COMPONENT = {
+    "type": "object",
+    "required": ["type", "name"],
+    "properties": {
+        "type": {"enum": COMPONENT_TYPES},
+        "mime-type": {"type": "string", "pattern": r"^[-+a-z0-9.]+/[-+a-z0-9.]+$"},
+        "bom-ref": STRING,
+        "supplier": OBJECT,
+        "author": STRING,
+        "publisher": STRING,
+        "group": STRING,
+        "name": STRING,
+        "version": STRING,
+        "description": STRING,
+        "scope": {"enum": ["required", "optional", "excluded"]},
+        "hashes": {"type": "array", "items": HASH},
+        "licenses": {"type": "array", "items": LICENSE_CHOICE},
+        "copyright": STRING,
+        "cpe": STRING,
+        "purl": STRING,
+        "swid": OBJECT,
+        "modified": {"type": "boolean"},
+        "pedigree": OBJECT,
+        "externalReferences": {"type": "array", "items": EXTERNAL_REFERENCE},
+        "properties": {"type": "array", "items": PROPERTY},
+        "components": {"type": "array"},
+        "evidence": OBJECT,
+        "releaseNotes": OBJECT,
+        "signature": OBJECT,
+    },
+    "additionalProperties": False,
+}
+
+DEPENDENCY = {
+    "type": "object",
+    "required": ["ref"],
+    "properties": {
+        "ref": STRING,
+        "dependsOn": {"type": "array", "uniqueItems": True, "items": STRING},
+    },
+    "additionalProperties": False,
+}
+
+TOOL = {
+    "type": "object",
+    "properties": {
+        "vendor": STRING,
+        "name": STRING,
+        "version": STRING,
+        "hashes": {"type": "array", "items": HASH},
+        "externalReferences": {"type": "array", "items": EXTERNAL_REFERENCE},
+    },
+    "additionalProperties": False,
+}
+
+# The document without its streamed components and dependencies
+HEADER = {
+    "type": "object",
+    "required": ["bomFormat", "specVersion"],
+    "properties": {
+        "$schema": STRING,
+        "bomFormat": {"enum": ["CycloneDX"]},
+        "specVersion": {"enum": ["1.4"]},
+        "serialNumber": {
+            "type": "string",
+            "pattern": r"^urn:uuid:[0-9a-f]{8}-[0-9a-f]{4}-[1-5][0-9a-f]{3}-[89ab][0-9a-f]{3}-[0-9a-f]{12}$",
+        },
+        "version": {"type": "integer", "minimum": 1},
+        "metadata": {
+            "type": "object",
+            "properties": {
+                "timestamp": STRING,
+                "tools": {"type": "array", "items": TOOL},
+                "authors": {"type": "array"},
+                "component": COMPONENT,
+                "manufacture": OBJECT,
+                "supplier": OBJECT,
+                "licenses": {"type": "array", "items": LICENSE_CHOICE},
+                "properties": {"type": "array", "items": PROPERTY},
+            },
+            "additionalProperties": False,
+        },
+        "components": {"type": "array"},
+        "services": {"type": "array"},
+        "externalReferences": {"type": "array", "items": EXTERNAL_REFERENCE},
+        "dependencies": {"type": "array"},
+        "compositions": {"type": "array"},
+        "properties": {"type": "array", "items": PROPERTY},
+        "vulnerabilities": {"type": "array"},
+        "signature": OBJECT,
+    },
+    "additionalProperties": False,
+}
+
+_TYPES = {
+    "string": (str,),
+    "object": (dict,),
+    "array": (list,),
+    "boolean": (bool,),
+    "integer": (int,),
+}
+
+
+def compile_schema(schema):
+    """
+    Turns a schema into a function check(value, path, report) that calls report(path, message)
+    for every violation. Every schema node becomes one closure, and fields that only need a
+    type check are checked inline by their object, so checking an entry costs little more
+    than a dict lookup per field. With path None no paths are built, which is how valid
+    entries are checked (see StreamValidator._check).
+    """
+    kind = schema.get("type")
+    if kind == "object":
+        return _compile_object(schema)
+    if kind == "array":
+        return _compile_array(schema)
+    return _compile_value(schema)
+
+
+def _type_error(value, type_name):
+    return f"expected {type_name}, got {type(value).__name__}"
+
+
+def _compile_object(schema):
+    required = tuple(schema.get("required", ()))
+    # oneOf is only used to pick exactly one of several keys, e.g. a license id or name
+    alternatives = tuple(key for alternative in schema.get("oneOf", ()) for key in alternative["required"])
+    closed = schema.get("additionalProperties") is False
+    # Fields whose schema is a bare type are checked with isinstance right here
+    typed = {}
+    checks = {}
+    for key, subschema in schema.get("properties", {}).items():
+        if subschema.keys() == {"type"} and subschema["type"] != "integer":
+            typed[key] = _TYPES[subschema["type"]]
+        else:
+            checks[key] = compile_schema(subschema)
+
+    def check_object(value, path, report):
+        if not isinstance(value, dict):
+            report(path, _type_error(value, "object"))
+            return
+        for key in required:
+            if key not in value:
+                report(path, f"missing required {key!r}")
+        if alternatives:
+            matches = 0
+            for key in alternatives:
+                if key in value:
+                    matches += 1
+            if matches != 1:
+                report(path, "needs exactly one of " + " or ".join(alternatives))
+        for key, item in value.items():
+            expected = typed.get(key)
+            if expected is not None:
+                if not isinstance(item, expected):
+                    report(path and f"{path}.{key}", _type_error(item, schema["properties"][key]["type"]))
+                continue
+            check = checks.get(key)
+            if check is not None:
+                check(item, path and f"{path}.{key}", report)
+            elif closed:
+                report(path, f"unexpected property {key!r}")
+
+    return check_object
+
+
+def _compile_array(schema):
+    check_item = compile_schema(schema["items"]) if "items" in schema else None
+    unique = schema.get("uniqueItems", False)
+
+    def check_array(value, path, report):
+        if not isinstance(value, list):
+            report(path, _type_error(value, "array"))
+            return
+        if check_item is not None:
+            for index, item in enumerate(value):
+                check_item(item, path and f"{path}[{index}]", report)
+        if unique and len(set(map(_hashable, value))) != len(value):
+            report(path, "items are not unique")
+
+    return check_array
+
+
+def _compile_value(schema):
+    checks = []
+
+    if "type" in schema:
+        type_name = schema["type"]
+        expected = _TYPES[type_name]
+        # bool is an int subclass but not a JSON integer
+        rejected = bool if type_name == "integer" else ()
+
+        def check_type(value, path, report):
+            if not isinstance(value, expected) or isinstance(value, rejected):
+                report(path, _type_error(value, type_name))
+                return False
+            return True
+        checks.append(check_type)
+
+    if "enum" in schema:
+        allowed = frozenset(schema["enum"])
+        if len(allowed) <= 8:
+            expected_values = "one of " + ", ".join(schema["enum"])
+        else:
+            expected_values = f"one of the {len(allowed)} allowed values"
+
+        def check_enum(value, path, report):
+            if not isinstance(value, str) or value not in allowed:
+                report(path, f"{value!r} is not {expected_values}")
+        checks.append(check_enum)
+
+    if "pattern" in schema:
+        pattern = re.compile(schema["pattern"])
+
+        def check_pattern(value, path, report):
+            if isinstance(value, str) and not pattern.search(value):
+                report(path, f"{value!r} does not match {schema['pattern']}")
+        checks.append(check_pattern)
+
+    if "minimum" in schema:
+        minimum = schema["minimum"]
+
+        def check_minimum(value, path, report):
+            if isinstance(value, (int, float)) and value < minimum:
+                report(path, f"{value} is less than {minimum}")
+        checks.append(check_minimum)
+
+    if len(checks) == 1:
+        return checks[0]
+
+    def check(value, path, report):
+        for step in checks:
+            # A value of the wrong type is not checked any further
+            if step(value, path, report) is False:
+                return
+
+    return check
+
+
+def _hashable(value):
+    return value if isinstance(value, str) else repr(value)
+
+
+class _Invalid(Exception):
+    pass
+
+
+def _reject(path, message):
+    raise _Invalid
+
+
+check_header = compile_schema(HEADER)
+check_component = compile_schema(COMPONENT)
+check_dependency = compile_schema(DEPENDENCY)
+
+
+class StreamValidator:
+    """
+    Validates an SBOM entry by entry as it is written. The header is checked up front,
+    every component and dependency entry as it is emitted, and the bom-refs seen so far
+    are kept in a set so that dependency refs can be resolved without a second pass:
+    refs not yet emitted are parked and only reported if still unknown at finish().
+    """
+
+    def __init__(self, header, source="SBOM"):
+        self.source = source
+        self.errors = 0
+        self.messages = []
+        self._refs = set()
+        self._unresolved = {}
+        self._dependency_refs = set()
+        self._components = 0
+        self._dependencies = 0
+
+        check_header(header, "$", self._report)
+        root_ref = header.get("metadata", {}).get("component", {}).get("bom-ref")
+        if root_ref:
+            self._refs.add(root_ref)
+
+    def _report(self, path, message):
+        self.errors += 1
+        if len(self.messages) < MAX_MESSAGES:
+            self.messages.append(f"{path}: {message}")
+
+    def _check(self, check, entry, path):
+        # Almost every entry is valid: check it without building paths, and only walk it
+        # again with paths to report what is wrong when that fails
+        try:
+            check(entry, None, _reject)
+        except _Invalid:
+            check(entry, path, self._report)
+
+    def component(self, component):
+        with Instrumentation.stage("validate", detail=True):
+            index = self._components
+            self._components += 1
+            self._check(check_component, component, f"components[{index}]")
+            ref = component.get("bom-ref") if isinstance(component, dict) else None
+            if ref is not None:
+                if ref in self._refs:
+                    self._report(f"components[{index}]", f"duplicate bom-ref {ref!r}")
+                self._refs.add(ref)
+                self._unresolved.pop(ref, None)
+
+    def dependency(self, dependency):
+        with Instrumentation.stage("validate", detail=True):
+            index = self._dependencies
+            self._dependencies += 1
+            self._check(check_dependency, dependency, f"dependencies[{index}]")
+            if not isinstance(dependency, dict):
+                return
+            ref = dependency.get("ref")
+            if ref in self._dependency_refs:
+                self._report(f"dependencies[{index}]", f"duplicate dependency entry for {ref!r}")
+            self._dependency_refs.add(ref)
+            refs = self._refs
+            for target in (ref, *dependency.get("dependsOn", ())):
+                if target not in refs and target not in self._unresolved:
+                    self._unresolved[target] = index
+
+    def finish(self):
+        """
+        Reports refs that never matched an emitted bom-ref and returns the violation count.
+        """
+        for ref, index in self._unresolved.items():
+            self._report(f"dependencies[{index}]", f"{ref!r} does not match any component bom-ref")
+        dangling = len(self._unresolved)
+        self._unresolved = {}
+        Instrumentation.count("schema_violations", self.errors)
+        Instrumentation.count("dangling_refs", dangling)
+        return self.errors
+
+    def summary(self):
+        if not self.errors:
+            return f"{self.source}: valid CycloneDX 1.4 ({self._components} components, {self._dependencies} dependencies)"
+        lines = [f"{self.source}: {self.errors} CycloneDX 1.4 schema violations"]
+        lines.extend(f"  {message}" for message in self.messages)
+        if self.errors > len(self.messages):
+            lines.append(f"  ... and {self.errors - len(self.messages)} more")
+        return "\n".join(lines)
+
+
+def validate_sbom(sbom_file):
+    """
+    Validates an SBOM already on disk in one streaming pass and returns the StreamValidator.
+    """
+    # Imported here as SbomTools builds on the writer, which imports this module
+    from SBOM_Generators import SbomTools
+
+    sbom = SbomTools.open_sbom(sbom_file)
+    validator = StreamValidator(sbom.header(), sbom_file)
+    for component in sbom.get("components", []):
+        validator.component(component)
+    for dependency in sbom.get("dependencies", []):
+        validator.dependency(dependency)
+    validator.finish()
+    return validator
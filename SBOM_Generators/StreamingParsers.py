@@ -0,0 +1,468 @@
+import gzip
+import io
+import json
+import re
+import xml.etree.ElementTree as ET
+from json.decoder import scanstring
+
+CHUNK_SIZE = 1 << 16
+
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+_STRUCTURAL = re.compile(r'["{}\[\]]')
+_STRING_BODY = re.compile(r'(?:[^"\\]|\\.)*"', re.DOTALL)
+_decoder = json.JSONDecoder()
+
+GZIP_MAGIC = b"\x1f\x8b"
+ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+
+# An ndjson header line longer than this is not looked for
+NDJSON_HEADER_LIMIT = 1 << 20
+
+
+def open_text(file_path):
+    """
+    Opens a UTF-8 text file for reading, decompressing gzip and zstd files (recognized by
+    their magic bytes, not their name).
+    """
+    with open(file_path, "rb") as f:
+        magic = f.read(4)
+    if magic.startswith(GZIP_MAGIC):
+        return gzip.open(file_path, "rt", encoding="utf-8")
+    if magic == ZSTD_MAGIC:
+        # Not in the standard library; only needed for zstd files
+        import zstandard
+        return io.TextIOWrapper(zstandard.ZstdDecompressor().stream_reader(open(file_path, "rb"), closefd=True),
+                                encoding="utf-8")
+    return open(file_path, "r", encoding="utf-8")
+
+
+def is_ndjson(file_path, streamed):
+    """
+    True when the first line of file_path is a complete JSON object without any of the
+    streamed keys, i.e. the header of an ndjson document. Pretty JSON starts with a bare
+    "{" line and compact JSON holds the whole document on its first line.
+    """
+    with open_text(file_path) as f:
+        line = f.readline(NDJSON_HEADER_LIMIT)
+    if not line.endswith("\n"):
+        return False
+    try:
+        header = json.loads(line)
+    except ValueError:
+        return False
+    return isinstance(header, dict) and not any(key in header for key in streamed)
+
+
+class _JsonStream:
+    """
+    Minimal pull reader over a JSON file. Only the values the caller asks for are
+    decoded (with the C-accelerated json decoder); everything else is skipped by a
+    structural scan, so memory stays proportional to the largest single entry.
+    """
+
+    def __init__(self, fp):
+        self.fp = fp
+        self.buffer = ""
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self, size=CHUNK_SIZE):
+        if self.eof:
+            return False
+        chunk = self.fp.read(size)
+        if not chunk:
+            self.eof = True
+            return False
+        self.buffer = self.buffer[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self):
+        while True:
+            self.pos = _WHITESPACE.match(self.buffer, self.pos).end()
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self._fill():
+                return ""
+
+    def expect(self, char):
+        found = self.peek()
+        if found != char:
+            raise ValueError(f"Expected {char!r} but found {found!r} in JSON stream")
+        self.pos += 1
+
+    def read_value(self):
+        self.peek()
+        size = CHUNK_SIZE
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self.buffer, self.pos)
+                # A number that ends exactly at the buffer boundary may continue in the next chunk
+                if end < len(self.buffer) or self.eof:
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            # Grow reads geometrically so large values are not re-decoded too many times
+            self._fill(size)
+            size *= 2
+
+    def read_key(self):
+        self.expect('"')
+        while True:
+            try:
+                key, end = scanstring(self.buffer, self.pos)
+                break
+            except json.JSONDecodeError:
+                if not self._fill():
+                    raise
+        self.pos = end
+        self.expect(":")
+        return key
+
+    def skip_value(self):
+        first = self.peek()
+        if first not in "{[":
+            self.read_value()
+            return
+
+        depth = 0
+        while True:
+            match = _STRUCTURAL.search(self.buffer, self.pos)
+            if match is None:
+                self.pos = len(self.buffer)
+                if not self._fill():
+                    raise ValueError("Unexpected end of JSON stream")
+                continue
+
+            char = match.group()
+            if char == '"':
+                body = _STRING_BODY.match(self.buffer, match.end())
+                if body is None:
+                    self.pos = match.start()
+                    if not self._fill():
+                        raise ValueError("Unterminated string in JSON stream")
+                    continue
+                self.pos = body.end()
+                continue
+
+            self.pos = match.end()
+            depth += 1 if char in "{[" else -1
+            if depth == 0:
+                return
+
+    def next_member(self, first):
+        """
+        Advances past ',' between members; returns False at the closing '}' or ']'.
+        """
+        char = self.peek()
+        if char in "}]":
+            self.pos += 1
+            return False
+        if not first:
+            self.expect(",")
+        return True
+
+
+def _iter_object(stream):
+    stream.expect("{")
+    first = True
+    while stream.next_member(first):
+        first = False
+        yield stream.read_key()
+
+
+def _seek(stream, key_path):
+    """
+    Positions the stream at the value found under key_path, or returns False.
+    """
+    for key in key_path:
+        if stream.peek() != "{":
+            return False
+        for member in _iter_object(stream):
+            if member == key:
+                break
+            stream.skip_value()
+        else:
+            return False
+    return True
+
+
+def iter_object_items(file_path, key_path):
+    """
+    Yields (key, value) for each member of the JSON object at key_path, e.g. ("packages",).
+    """
+    with open_text(file_path) as f:
+        stream = _JsonStream(f)
+        if not _seek(stream, key_path) or stream.peek() != "{":
+            return
+        for key in _iter_object(stream):
+            yield key, stream.read_value()
+
+
+def iter_array_items(file_path, key_path):
+    """
+    Yields each element of the JSON array at key_path, e.g. ("components",).
+    """
+    with open_text(file_path) as f:
+        stream = _JsonStream(f)
+        if not _seek(stream, key_path) or stream.peek() != "[":
+            return
+        stream.expect("[")
+        first = True
+        while stream.next_member(first):
+            first = False
+            yield stream.read_value()
+
+
+def load_object_except(file_path, skipped_keys):
+    """
+    Decodes the top-level JSON object while skipping the (large) values under skipped_keys.
+    """
+    result = {}
+    with open_text(file_path) as f:
+        stream = _JsonStream(f)
+        for key in _iter_object(stream):
+            if key in skipped_keys:
+                stream.skip_value()
+            else:
+                result[key] = stream.read_value()
+    return result
+
+
+class StreamedObject:
+    def __init__(self, file_path, key_path):
+        self.file_path = file_path
+        self.key_path = key_path
+
+    def items(self):
+        return iter_object_items(self.file_path, self.key_path)
+
+    def keys(self):
+        return (key for key, _ in self.items())
+
+    def values(self):
+        return (value for _, value in self.items())
+
+    def __iter__(self):
+        return self.keys()
+
+
+class StreamedArray:
+    def __init__(self, file_path, key_path):
+        self.file_path = file_path
+        self.key_path = key_path
+
+    def __iter__(self):
+        return iter_array_items(self.file_path, self.key_path)
+
+
+class StreamedJsonDocument:
+    """
+    Read-only, dict-like view of a large JSON document. Top-level keys listed in
+    streamed ({"packages": dict} or {"components": list}) are returned as lazily
+    re-readable iterables; every other key is decoded on first access.
+    """
+
+    def __init__(self, file_path, streamed):
+        self.file_path = file_path
+        self.streamed = streamed
+        self._rest = None
+
+    def _load_rest(self):
+        if self._rest is None:
+            self._rest = load_object_except(self.file_path, self.streamed)
+        return self._rest
+
+    def header(self):
+        """
+        Returns the document without its streamed keys.
+        """
+        return dict(self._load_rest())
+
+    def get(self, key, default=None):
+        if key in self.streamed:
+            view = StreamedObject if self.streamed[key] is dict else StreamedArray
+            return view(self.file_path, (key,))
+        return self._load_rest().get(key, default)
+
+    def __getitem__(self, key):
+        if key in self.streamed:
+            return self.get(key)
+        return self._load_rest()[key]
+
+    def __contains__(self, key):
+        return key in self.streamed or key in self._load_rest()
+
+
+class StreamedNdjsonDocument:
+    """
+    StreamedJsonDocument over an ndjson document: a header object on the first line,
+    then one {tag: entry} object per line, where records maps each streamed key to
+    the tag of its entries ({"components": "component"}).
+    """
+
+    def __init__(self, file_path, records):
+        self.file_path = file_path
+        self.records = records
+        self._rest = None
+
+    def _load_rest(self):
+        if self._rest is None:
+            with open_text(self.file_path) as f:
+                self._rest = json.loads(f.readline())
+        return self._rest
+
+    def _iter_records(self, tag):
+        with open_text(self.file_path) as f:
+            f.readline()
+            for line in f:
+                record = _decoder.decode(line)
+                if tag in record:
+                    yield record[tag]
+
+    def header(self):
+        return dict(self._load_rest())
+
+    def get(self, key, default=None):
+        if key in self.records:
+            return _Records(self, self.records[key])
+        return self._load_rest().get(key, default)
+
+    def __getitem__(self, key):
+        if key in self.records:
+            return self.get(key)
+        return self._load_rest()[key]
+
+    def __contains__(self, key):
+        return key in self.records or key in self._load_rest()
+
+
+class _Records:
+    def __init__(self, document, tag):
+        self.document = document
+        self.tag = tag
+
+    def __iter__(self):
+        return self.document._iter_records(self.tag)
+
+
+def local_name(tag):
+    """
+    Returns an XML tag without its {namespace} prefix, or "" for comments and processing
+    instructions, whose tag is not a string.
+    """
+    return tag.rsplit("}", 1)[-1] if isinstance(tag, str) else ""
+
+
+def _child_text(element, name):
+    for child in element:
+        if local_name(child.tag) == name:
+            return (child.text or "").strip()
+    return None
+
+
+def _xml_component(element):
+    """
+    Converts a CycloneDX <component> element to the dict shape of the JSON format.
+    """
+    component = {}
+    if element.get("type"):
+        component["type"] = element.get("type")
+    if element.get("bom-ref"):
+        component["bom-ref"] = element.get("bom-ref")
+
+    for child in element:
+        name = local_name(child.tag)
+        if name == "licenses":
+            licenses = []
+            for entry in child:
+                if local_name(entry.tag) == "expression":
+                    licenses.append({"expression": (entry.text or "").strip()})
+                    continue
+                license_info = {}
+                for field in ("id", "name", "url"):
+                    value = _child_text(entry, field)
+                    if value is not None:
+                        license_info[field] = value
+                licenses.append({"license": license_info})
+            component["licenses"] = licenses
+        elif name == "externalReferences":
+            component["externalReferences"] = [
+                {"type": reference.get("type", ""), "url": _child_text(reference, "url") or ""}
+                for reference in child
+            ]
+        elif name == "hashes":
+            component["hashes"] = [{"alg": h.get("alg", ""), "content": (h.text or "").strip()} for h in child]
+        elif len(child) == 0:
+            # The JSON output collapses the whitespace of wrapped text such as descriptions
+            component[name] = " ".join((child.text or "").split())
+    return component
+
+
+def iter_cyclonedx_xml(file_path):
+    """
+    Yields ("metadata", dict), ("component", dict) and ("dependency", dict) events from a
+    CycloneDX bom.xml with iterparse, discarding each element once it has been converted.
+    """
+    stack = []
+    for event, element in ET.iterparse(file_path, events=("start", "end")):
+        if event == "start":
+            stack.append(element)
+            continue
+
+        stack.pop()
+        path = [local_name(e.tag) for e in stack] + [local_name(element.tag)]
+        handled = True
+        if path == ["bom", "metadata"]:
+            metadata = {}
+            for child in element:
+                if local_name(child.tag) == "component":
+                    metadata["component"] = _xml_component(child)
+            yield "metadata", metadata
+        elif path == ["bom", "components", "component"]:
+            yield "component", _xml_component(element)
+        elif path == ["bom", "dependencies", "dependency"]:
+            yield "dependency", {
+                "ref": element.get("ref", ""),
+                "dependsOn": [child.get("ref", "") for child in element if local_name(child.tag) == "dependency"]
+            }
+        else:
+            handled = False
+
+        if handled and stack:
+            stack[-1].remove(element)
+
+
+class StreamedXmlEvents:
+    def __init__(self, file_path, kind):
+        self.file_path = file_path
+        self.kind = kind
+
+    def __iter__(self):
+        return (value for kind, value in iter_cyclonedx_xml(self.file_path) if kind == self.kind)
+
+
+class CycloneDxXmlDocument:
+    """
+    Dict-like view of a CycloneDX bom.xml matching the JSON document's shape:
+    "metadata" is parsed up front, "components" and "dependencies" are streamed.
+    """
+
+    def __init__(self, file_path):
+        self.file_path = file_path
+        self.metadata = {}
+        for kind, value in iter_cyclonedx_xml(file_path):
+            if kind == "metadata":
+                self.metadata = value
+                break
+
+    def get(self, key, default=None):
+        if key == "metadata":
+            return self.metadata
+        if key == "components":
+            return StreamedXmlEvents(self.file_path, "component")
+        if key == "dependencies":
+            return StreamedXmlEvents(self.file_path, "dependency")
+        return default
@@ -0,0 +1,17 @@
+import subprocess
+
+# Optional semaphore (threading or multiprocessing) bounding how many package-manager
+# subprocesses (npm, mvn, pip) run at once across a batch
+_slots = None
+
+
+def set_limit(semaphore):
+    global _slots
+    _slots = semaphore
+
+
+def run(command, **kwargs):
+    if _slots is None:
+        return subprocess.run(command, **kwargs)
+    with _slots:
+        return subprocess.run(command, **kwargs)
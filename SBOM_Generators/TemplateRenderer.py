@@ -0,0 +1,112 @@
+import json
+import os
+import threading
+from string import Formatter
+
+
+class CompiledTemplate:
+    """
+    A JSON template (e.g. sbom_component_template.json) parsed once into a render plan.
+
+    Every string holding "{placeholder}" fields becomes a slot that is filled with the
+    same semantics as str.format(**values). Constant strings are emitted as-is and
+    non-empty constant subtrees are shared between renders instead of being walked and
+    rebuilt, so treat them as read-only; replace them (component["licenses"] = [...])
+    rather than mutating them in place.
+    """
+
+    def __init__(self, template):
+        self.template = template
+        self.slots = []
+        self._constants = {}
+        expression = self._compile(template, ())
+        source = f"def render(values):\n    return {expression}\n"
+        namespace = dict(self._constants)
+        exec(compile(source, "<sbom template>", "exec"), namespace)
+        self.source = source
+        self.render = namespace["render"]
+
+    def _constant(self, value):
+        name = f"_c{len(self._constants)}"
+        self._constants[name] = value
+        return name
+
+    def _compile(self, node, path):
+        if not has_placeholders(node):
+            if isinstance(node, (dict, list)) and node:
+                return self._constant(node)
+            return repr(node)
+
+        if isinstance(node, dict):
+            items = ", ".join(f"{key!r}: {self._compile(value, path + (key,))}" for key, value in node.items())
+            return "{" + items + "}"
+        if isinstance(node, list):
+            return "[" + ", ".join(self._compile(item, path + (index,)) for index, item in enumerate(node)) + "]"
+
+        self.slots.append(path)
+        return self._compile_string(node)
+
+    def _compile_string(self, text):
+        parts = []
+        for literal, field_name, format_spec, conversion in Formatter().parse(text):
+            if literal:
+                parts.append(literal.replace("{", "{{").replace("}", "}}"))
+            if field_name is None:
+                continue
+            if not field_name.isidentifier() or "{" in (format_spec or ""):
+                # Attribute/index lookups and nested specs keep the generic str.format path
+                return f"{self._constant(text)}.format(**values)"
+            # The field name is bound as a constant so no quotes appear inside the f-string expression
+            field = "{values[" + self._constant(field_name) + "]"
+            if conversion:
+                field += "!" + conversion
+            if format_spec:
+                field += ":" + format_spec
+            parts.append(field + "}")
+        return "f" + repr("".join(parts))
+
+
+def has_placeholders(node):
+    if isinstance(node, dict):
+        return any(has_placeholders(value) for value in node.values())
+    if isinstance(node, list):
+        return any(has_placeholders(item) for item in node)
+    if isinstance(node, str):
+        return any(field_name is not None for _, field_name, _, _ in Formatter().parse(node))
+    return False
+
+
+def compile_template(template):
+    if isinstance(template, CompiledTemplate):
+        return template
+    return CompiledTemplate(template)
+
+
+def render(template, values):
+    """
+    Fills a compiled template, or compiles and fills a raw template dict.
+    """
+    return compile_template(template).render(values)
+
+
+_loaded = {}
+_loaded_lock = threading.Lock()
+
+
+def load_template(path):
+    """
+    Returns the compiled template in the JSON file at path. Compiled templates are kept
+    until the file changes, so a long-running process compiles each template only once.
+    """
+    path = os.path.abspath(path)
+    mtime_ns = os.stat(path).st_mtime_ns
+    with _loaded_lock:
+        loaded = _loaded.get(path)
+    if loaded is not None and loaded[0] == mtime_ns:
+        return loaded[1]
+
+    with open(path, "r") as file:
+        template = CompiledTemplate(json.load(file))
+    with _loaded_lock:
+        _loaded[path] = (mtime_ns, template)
+    return template
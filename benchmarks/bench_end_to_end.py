@@ -0,0 +1,171 @@
+"""
+End-to-end generator benchmark on synthetic inputs against a local stand-in registry.
+
+For every ecosystem and size, GenNpmBom.generate_sbom_npm_from_lockfile,
+GenMavenBom.generate_custom_sbom and GenPypiBom.generate_sbom run in a fresh process
+with an empty metadata cache (cold), then again with the cache populated (warm).
+Reported: components/s, registry request latency percentiles, stage times and peak RSS.
+
+    python -m benchmarks.bench_end_to_end [--sizes 1000,10000,100000] [--latency-ms 10]
+                                          [--ecosystems npm,maven,pypi] [--json results.json]
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import tempfile
+import threading
+import time
+
+from benchmarks import synthetic_inputs
+from benchmarks.standin_registry import StandInRegistry
+
+ECOSYSTEMS = ("npm", "maven", "pypi")
+
+
+def _peak_rss_mb():
+    from SBOM_Generators import Instrumentation
+    peak = Instrumentation.peak_rss_bytes()
+    return peak / 1e6 if peak is not None else None
+
+
+def _percentiles(values):
+    if not values:
+        return {"p50": 0.0, "p90": 0.0, "p99": 0.0, "max": 0.0}
+    ordered = sorted(values)
+
+    def at(fraction):
+        return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+    return {"p50": at(0.50), "p90": at(0.90), "p99": at(0.99), "max": ordered[-1]}
+
+
+def _generate(ecosystem, paths):
+    """
+    Runs one generator over the synthetic inputs and returns (components, dependencies).
+    """
+    from SBOM_Generators import GenMavenBom, GenNpmBom, GenPypiBom, Paths, TemplateRenderer
+
+    if ecosystem == "npm":
+        lockfile = GenNpmBom.load_package_lock_json(paths["package_lock"])
+        package_json = GenNpmBom.load_json_file(paths["package_json"])
+        sbom_template = GenNpmBom.load_json_file(str(Paths.TEMPLATES_DIR / "sbom_template.json"))
+        component_template = TemplateRenderer.compile_template(
+            GenNpmBom.load_json_file(str(Paths.TEMPLATES_DIR / "sbom_component_template.json")))
+        sbom = GenNpmBom.generate_sbom_npm_from_lockfile(lockfile, sbom_template, component_template, "npm", package_json)
+        return len(sbom["components"]), len(sbom["dependencies"])
+
+    if ecosystem == "maven":
+        cyclonedx_bom = GenMavenBom.load_cyclonedx_sbom(paths["cyclonedx_bom"])
+        component_template = TemplateRenderer.compile_template(
+            GenMavenBom.load_json_file(str(Paths.TEMPLATES_DIR / "sbom_component_template_maven.json")))
+        components, dependencies = [], []
+        GenMavenBom.generate_custom_sbom(cyclonedx_bom, components, dependencies, component_template, "maven")
+        return len(components), len(dependencies)
+
+    with open(paths["pipdeptree"]) as f:
+        parent_map = synthetic_inputs.parent_map_from_pipdeptree(json.load(f))
+    component_template = TemplateRenderer.compile_template(
+        GenPypiBom.load_json_file(str(Paths.TEMPLATES_DIR / "sbom_component_template.json")))
+    components, dependencies = [], []
+    GenPypiBom.generate_sbom(parent_map, components, dependencies, component_template, "pypi")
+    return len(components), len(dependencies)
+
+
+def run_case(ecosystem, paths, npm_url, pypi_url, cache_dir, workers):
+    """
+    Executed in a fresh worker process so that peak RSS belongs to this case alone.
+    """
+    from SBOM_Generators import Instrumentation, RegistryClient
+
+    RegistryClient.configure(max_workers=workers, npm_registry=npm_url, pypi_registry=pypi_url,
+                             cache_enabled=True, cache_path=os.path.join(cache_dir, "metadata.sqlite"))
+
+    # Time every registry round trip as the generators see it
+    latencies = []
+    latencies_lock = threading.Lock()
+    http_get = RegistryClient.http_get
+
+    def timed_http_get(url, headers=None):
+        start = time.perf_counter()
+        try:
+            return http_get(url, headers)
+        finally:
+            elapsed = time.perf_counter() - start
+            with latencies_lock:
+                latencies.append(elapsed)
+
+    RegistryClient.http_get = timed_http_get
+
+    baseline_rss = _peak_rss_mb()
+    passes = {}
+    for name in ("cold", "warm"):
+        Instrumentation.reset()
+        latencies.clear()
+        start = time.perf_counter()
+        components, dependencies = _generate(ecosystem, paths)
+        seconds = time.perf_counter() - start
+        passes[name] = {
+            "seconds": seconds,
+            "components": components,
+            "dependencies": dependencies,
+            "components_per_second": components / seconds if seconds else 0.0,
+            "requests": len(latencies),
+            "request_latency_ms": {key: value * 1000 for key, value in _percentiles(latencies).items()},
+            "stages": {stage: totals["seconds"] for stage, totals in Instrumentation.snapshot().items()},
+            "counters": Instrumentation.counters(),
+            "peak_rss_mb": _peak_rss_mb(),
+        }
+    return {"ecosystem": ecosystem, "baseline_rss_mb": baseline_rss, "passes": passes}
+
+
+def print_result(size, result):
+    for name, stats in result["passes"].items():
+        latency = stats["request_latency_ms"]
+        rss = f"{stats['peak_rss_mb']:7.1f} MB" if stats["peak_rss_mb"] is not None else "    n/a"
+        print(f"  {result['ecosystem']:<5} {size:>7} {name:<4} {stats['seconds']:8.2f} s "
+              f"{stats['components_per_second']:10.0f} comp/s {stats['requests']:7d} req  "
+              f"p50 {latency['p50']:6.1f} p90 {latency['p90']:6.1f} p99 {latency['p99']:6.1f} ms  peak RSS {rss}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="1000,10000,100000", help="Comma-separated package counts")
+    parser.add_argument("--ecosystems", default=",".join(ECOSYSTEMS))
+    parser.add_argument("--latency-ms", type=float, default=10.0, help="Stand-in registry response delay")
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--workers", type=int, default=16, help="Concurrent registry requests")
+    parser.add_argument("--json", help="Also write the results to this JSON file")
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(",")]
+    ecosystems = [ecosystem for ecosystem in args.ecosystems.split(",") if ecosystem]
+    for ecosystem in ecosystems:
+        if ecosystem not in ECOSYSTEMS:
+            parser.error(f"unknown ecosystem {ecosystem!r}")
+
+    results = []
+    context = multiprocessing.get_context("spawn")
+    with tempfile.TemporaryDirectory(prefix="sbom-bench-") as work_dir, \
+            StandInRegistry(latency_ms=args.latency_ms, jitter_ms=args.jitter_ms) as registry:
+        print(f"Stand-in registry at {registry.url}, {args.latency_ms:g} ms latency, {args.workers} workers")
+        for size in sizes:
+            paths = synthetic_inputs.write_inputs(size, os.path.join(work_dir, f"inputs-{size}"))
+            for ecosystem in ecosystems:
+                cache_dir = tempfile.mkdtemp(dir=work_dir)
+                with context.Pool(1) as pool:
+                    result = pool.apply(run_case, (ecosystem, paths, registry.npm_url, registry.pypi_url,
+                                                   cache_dir, args.workers))
+                result["packages"] = size
+                results.append(result)
+                print_result(size, result)
+        print(f"Registry served {registry.stats()}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"latency_ms": args.latency_ms, "workers": args.workers, "results": results}, f, indent=4)
+        print(f"Results written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
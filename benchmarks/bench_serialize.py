@@ -0,0 +1,104 @@
+"""
+SBOM serialization cost and size per output mode, against the indented JSON the
+generators write by default (json.dump(sbom, f, indent=4), --output-format pretty).
+
+Every combination of --output-format, --compress and --json-encoder streams the same
+synthetic components and dependencies through StreamingSbomWriter (validation off).
+zstd and orjson rows are only run when zstandard and orjson are installed.
+
+    python -m benchmarks.bench_serialize [--components 100000] [--json results.json]
+"""
+import argparse
+import importlib.util
+import itertools
+import json
+import os
+import tempfile
+import time
+
+from SBOM_Generators import Paths, SbomWriter, SchemaValidation, TemplateRenderer
+
+def make_entries(count):
+    with open(Paths.TEMPLATES_DIR / "sbom_component_template.json") as f:
+        template = TemplateRenderer.compile_template(json.load(f))
+    components = []
+    dependencies = []
+    for i in range(count):
+        component = template.render({
+            "component_bom_ref": f"package-{i}@1.0.{i}",
+            "component_name": f"package-{i}",
+            "component_version": f"1.0.{i}",
+            "component_publisher": "Example Publisher",
+            "component_description": "A synthetic package used for benchmarking",
+            "component_purl": f"package-{i}@1.0.{i}",
+            "license_id": "MIT",
+            "package_manager": "npm",
+        })
+        # What the npm generator adds after rendering
+        component["externalReferences"] = [
+            {"type": "vcs", "url": f"git+https://github.com/example/package-{i}.git"},
+            {"type": "website", "url": f"https://example.com/package-{i}"},
+        ]
+        component["hashes"] = [{"alg": "SHA-512", "content": f"{i:0128x}"}]
+        components.append(component)
+        dependencies.append({"ref": component["bom-ref"],
+                             "dependsOn": [f"pkg:npm/package-{j}@1.0.{j}" for j in range(i + 1, min(i + 4, count))]})
+    return components, dependencies
+
+
+def modes():
+    compressions = [c for c in SbomWriter.COMPRESSIONS if c != "zstd" or importlib.util.find_spec("zstandard")]
+    encoders = ["json"] + (["orjson"] if importlib.util.find_spec("orjson") else [])
+    for output_format, compression, encoder in itertools.product(SbomWriter.FORMATS, compressions, encoders):
+        # Pretty output is always written with json
+        if output_format != "pretty" or encoder == "json":
+            yield output_format, compression, encoder
+
+
+def write(output_dir, header, components, dependencies, output_format, compression, encoder):
+    SbomWriter.FORMAT, SbomWriter.COMPRESSION, SbomWriter.ENCODER = output_format, compression, encoder
+    start = time.perf_counter()
+    with SbomWriter.StreamingSbomWriter(os.path.join(output_dir, "sbom.json"), header) as writer:
+        writer.components.extend(components)
+        writer.dependencies.extend(dependencies)
+    seconds = time.perf_counter() - start
+    size = os.path.getsize(writer.output_file)
+    os.remove(writer.output_file)
+    return seconds, size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--components", type=int, default=100000)
+    parser.add_argument("--json", help="Also write the results to this JSON file")
+    args = parser.parse_args()
+
+    SchemaValidation.MODE = "off"
+    with open(Paths.TEMPLATES_DIR / "sbom_template.json") as f:
+        header = json.load(f)
+    components, dependencies = make_entries(args.components)
+
+    results = []
+    with tempfile.TemporaryDirectory() as output_dir:
+        for output_format, compression, encoder in modes():
+            seconds, size = write(output_dir, header, components, dependencies, output_format, compression, encoder)
+            results.append({"format": output_format, "compression": compression, "encoder": encoder,
+                            "seconds": seconds, "bytes": size})
+
+    baseline = results[0]
+    print(f"{args.components} components, baseline: pretty JSON as json.dump(indent=4) writes it")
+    print(f"  {'format':<8} {'compress':<8} {'encoder':<7} {'seconds':>8} {'speedup':>8} {'bytes':>12} {'size':>7}")
+    for result in results:
+        result["speedup"] = baseline["seconds"] / result["seconds"]
+        result["size_ratio"] = result["bytes"] / baseline["bytes"]
+        print(f"  {result['format']:<8} {result['compression']:<8} {result['encoder']:<7} {result['seconds']:8.3f} "
+              f"{result['speedup']:7.1f}x {result['bytes']:12,d} {result['size_ratio']:6.1%}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"components": args.components, "results": results}, f, indent=4)
+        print(f"Results written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+CLI startup benchmark.
+
+Every case runs in a fresh interpreter, --runs times, and the median wall time is
+reported next to a bare interpreter ("python -c pass"):
+
+    interpreter        python -c pass
+    main               import main (what every --script run pays before any work)
+    main --help        python main.py --help
+    load <ecosystem>   import main, then load the ecosystem's generator through Plugins
+    plugins            import main, then scan the installed ecosystem plugins
+
+The slowest imports of "import main" are listed from python -X importtime. With
+--max-main-ms the benchmark fails when importing main costs more than that beyond the
+bare interpreter, so it can guard startup time in CI as ecosystems are added.
+
+    python -m benchmarks.bench_startup [--runs 15] [--max-main-ms 80] [--json results.json]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _cases():
+    from SBOM_Generators import Plugins
+
+    cases = [
+        ("interpreter", ["-c", "pass"]),
+        ("main", ["-c", "import main"]),
+        ("main --help", ["main.py", "--help"]),
+    ]
+    for name in Plugins.names():
+        cases.append((f"load {name}", ["-c", f"import main; main.Plugins.load({name!r})"]))
+    cases.append(("plugins", ["-c", "import main; main.Plugins.names()"]))
+    return cases
+
+
+def time_cases(cases, runs):
+    """
+    Returns {case: {"median_ms", "min_ms"}}. Cases take turns run by run, so drift in
+    machine load affects them alike.
+    """
+    samples = {name: [] for name, _ in cases}
+    for _ in range(runs):
+        for name, arguments in cases:
+            start = time.perf_counter()
+            subprocess.run([sys.executable] + arguments, cwd=ROOT, check=True,
+                           stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            samples[name].append(time.perf_counter() - start)
+    return {name: {"median_ms": statistics.median(times) * 1000, "min_ms": min(times) * 1000}
+            for name, times in samples.items()}
+
+
+def slowest_imports(limit):
+    """
+    Returns (module, cumulative microseconds) for the modules "import main" spends most time on.
+    """
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", "import main"], cwd=ROOT, check=True,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    imports = []
+    for line in result.stderr.splitlines():
+        parts = line.split("|")
+        if len(parts) != 3 or not parts[1].strip().isdigit():
+            continue
+        module = parts[2].rstrip()
+        if module == " site":
+            # Everything before this was imported by interpreter startup (site, .pth files)
+            imports = []
+        elif module != " main":
+            imports.append((module.strip(), int(parts[1])))
+    return sorted(imports, key=lambda entry: entry[1], reverse=True)[:limit]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=15, help="Interpreter launches per case")
+    parser.add_argument("--top", type=int, default=12, help="Number of slowest imports to list")
+    parser.add_argument("--max-main-ms", type=float,
+                        help="Fail if importing main takes longer than this beyond the bare interpreter")
+    parser.add_argument("--json", help="Also write the results to this JSON file")
+    args = parser.parse_args()
+
+    results = time_cases(_cases(), args.runs)
+    baseline = results["interpreter"]["median_ms"]
+    for name, result in results.items():
+        result["over_interpreter_ms"] = result["median_ms"] - baseline
+        print(f"  {name:<18} {result['median_ms']:8.1f} ms median  {result['over_interpreter_ms']:+8.1f} ms")
+
+    print("\nSlowest imports under \"import main\" (cumulative):")
+    imports = slowest_imports(args.top)
+    for module, microseconds in imports:
+        print(f"  {microseconds / 1000:8.1f} ms  {module}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"runs": args.runs, "results": results,
+                       "slowest_imports": [{"module": module, "cumulative_us": us} for module, us in imports]},
+                      f, indent=4)
+        print(f"Results written to {args.json}")
+
+    if args.max_main_ms is not None and results["main"]["over_interpreter_ms"] > args.max_main_ms:
+        print(f"import main takes {results['main']['over_interpreter_ms']:.1f} ms over the interpreter, "
+              f"more than the {args.max_main_ms:g} ms budget")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
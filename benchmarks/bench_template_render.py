@@ -0,0 +1,71 @@
+"""
+Per-component template rendering cost: the original recursive str.format walk
+versus the precompiled render plan.
+
+    python -m benchmarks.bench_template_render [--components 100000]
+"""
+import argparse
+import json
+import time
+
+from SBOM_Generators import Paths, TemplateRenderer
+
+def replace_placeholders(data, replacements):
+    # The implementation the generators used before templates were compiled
+    if isinstance(data, dict):
+        return {key: replace_placeholders(value, replacements) for key, value in data.items()}
+    elif isinstance(data, list):
+        return [replace_placeholders(item, replacements) for item in data]
+    elif isinstance(data, str):
+        return data.format(**replacements)
+    else:
+        return data
+
+
+def component_infos(count):
+    for i in range(count):
+        yield {
+            "component_bom_ref": f"package-{i}@1.0.{i}",
+            "component_name": f"package-{i}",
+            "component_group": "com.example",
+            "component_version": f"1.0.{i}",
+            "component_publisher": "Example Publisher",
+            "component_description": "A synthetic package used for benchmarking",
+            "component_type": "library",
+            "component_purl": f"package-{i}@1.0.{i}",
+            "component_scope": "required",
+            "license_id": "MIT",
+            "package_manager": "npm"
+        }
+
+
+def bench(label, render, infos):
+    start = time.perf_counter()
+    for info in infos:
+        render(info)
+    elapsed = time.perf_counter() - start
+    print(f"  {label:<10} {elapsed:8.3f} s total  {elapsed / len(infos) * 1e6:8.2f} us/component")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--components", type=int, default=100000)
+    args = parser.parse_args()
+
+    for template_name in ("sbom_component_template.json", "sbom_component_template_maven.json"):
+        with open(Paths.TEMPLATES_DIR / template_name) as f:
+            template = json.load(f)
+        infos = list(component_infos(args.components))
+        compiled = TemplateRenderer.compile_template(template)
+
+        assert compiled.render(infos[0]) == replace_placeholders(template, infos[0])
+
+        print(f"{template_name} ({args.components} components)")
+        legacy = bench("recursive", lambda info: replace_placeholders(template, info), infos)
+        plan = bench("compiled", compiled.render, infos)
+        print(f"  speedup    {legacy / plan:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
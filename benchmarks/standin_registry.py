@@ -0,0 +1,205 @@
+"""
+Local stand-in for the npm and PyPI JSON APIs, answering every package with synthetic
+metadata after a configurable delay, so enrichment can be benchmarked offline.
+
+    /npm/<name>/<version>          npm version document
+    /npm/<name>                    npm packument (all benchmark versions)
+    /pypi/<name>/<version>/json    PyPI release document
+
+Responses carry an ETag and honour If-None-Match.
+
+    python -m benchmarks.standin_registry --port 8765 --latency-ms 20
+"""
+import argparse
+import hashlib
+import json
+import random
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote
+
+from benchmarks.synthetic_inputs import NPM_VERSIONS
+
+
+def npm_version_document(name, version):
+    return {
+        "name": name,
+        "version": version,
+        "description": f"Synthetic package {name}",
+        "author": {"name": "Example Publisher"},
+        "license": "MIT",
+        "repository": {"type": "git", "url": f"git+https://github.com/example/{name}.git"},
+        "homepage": f"https://github.com/example/{name}#readme",
+        "dist": {"tarball": f"https://registry.npmjs.org/{name}/-/{name}-{version}.tgz"},
+    }
+
+
+def npm_packument(name):
+    return {
+        "name": name,
+        "dist-tags": {"latest": NPM_VERSIONS[-1]},
+        "versions": {version: npm_version_document(name, version) for version in NPM_VERSIONS},
+    }
+
+
+def pypi_release_document(name, version):
+    return {
+        "info": {
+            "name": name,
+            "version": version,
+            "author": "Example Publisher",
+            "summary": f"Synthetic package {name}",
+            "license": "MIT",
+            "project_urls": {
+                "Homepage": f"https://example.org/{name}",
+                "Source": f"https://github.com/example/{name}",
+            },
+        },
+        "urls": [],
+    }
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        super().setup()
+        # Headers and body go out in separate writes; without this Nagle's algorithm and
+        # delayed ACKs add ~40 ms to every keep-alive response
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def do_GET(self):
+        registry = self.server.registry
+        registry.delay()
+
+        document = self._route([unquote(part) for part in self.path.strip("/").split("/")])
+        if document is None:
+            self._send(404, b"")
+            return
+
+        body = json.dumps(document).encode("utf-8")
+        etag = f'"{hashlib.sha1(body).hexdigest()}"'
+        if self.headers.get("If-None-Match") == etag:
+            registry.record(304, 0)
+            self._send(304, b"", etag)
+        else:
+            registry.record(200, len(body))
+            self._send(200, body, etag)
+
+    @staticmethod
+    def _route(parts):
+        if parts[0] == "npm" and len(parts) > 1:
+            # Scoped names (@scope/name) span two path segments
+            name_parts = 2 if parts[1].startswith("@") else 1
+            name = "/".join(parts[1:1 + name_parts])
+            rest = parts[1 + name_parts:]
+            if not rest:
+                return npm_packument(name)
+            if len(rest) == 1:
+                return npm_version_document(name, rest[0])
+        elif parts[0] == "pypi" and len(parts) == 4 and parts[3] == "json":
+            return pypi_release_document(parts[1], parts[2])
+        return None
+
+    def _send(self, status, body, etag=None):
+        self.send_response(status)
+        if etag:
+            self.send_header("ETag", etag)
+        if body:
+            self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StandInRegistry:
+    """
+    Threaded HTTP server serving synthetic registry metadata. Usable as a context
+    manager; npm_url and pypi_url are the base URLs to hand to RegistryClient.configure.
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, latency_ms=0.0, jitter_ms=0.0, seed=0):
+        self.latency = latency_ms / 1000
+        self.jitter = jitter_ms / 1000
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.not_modified = 0
+        self.bytes_sent = 0
+
+        self._server = ThreadingHTTPServer((host, port), _Handler)
+        self._server.daemon_threads = True
+        self._server.registry = self
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def npm_url(self):
+        return f"{self.url}/npm"
+
+    @property
+    def pypi_url(self):
+        return f"{self.url}/pypi"
+
+    def delay(self):
+        if self.jitter:
+            with self._lock:
+                jitter = self._rng.uniform(-self.jitter, self.jitter)
+        else:
+            jitter = 0.0
+        if self.latency + jitter > 0:
+            time.sleep(self.latency + jitter)
+
+    def record(self, status, size):
+        with self._lock:
+            self.requests += 1
+            self.not_modified += status == 304
+            self.bytes_sent += size
+
+    def stats(self):
+        with self._lock:
+            return {"requests": self.requests, "not_modified": self.not_modified, "bytes_sent": self.bytes_sent}
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name="standin-registry", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=20.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    args = parser.parse_args()
+
+    with StandInRegistry(args.host, args.port, args.latency_ms, args.jitter_ms) as registry:
+        print(f"Serving npm at {registry.npm_url} and PyPI at {registry.pypi_url} (Ctrl+C to stop)")
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == "__main__":
+    main()
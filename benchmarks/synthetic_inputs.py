@@ -0,0 +1,199 @@
+"""
+Deterministic synthetic inputs for the generator benchmarks: an npm package-lock.json
+(lockfileVersion 3), a CycloneDX bom.json as written by makeAggregateBom, and a
+pipdeptree --json style dependency tree.
+
+    python -m benchmarks.synthetic_inputs --packages 10000 --output-dir bench-inputs
+"""
+import argparse
+import json
+import os
+import random
+
+# npm lockfiles carry a share of packages at a second version nested under a dependent
+NESTED_FRACTION = 0.05
+MAX_CHILDREN = 4
+NPM_VERSIONS = ("1.0.0", "1.1.0", "1.2.0", "2.0.0")
+
+
+def npm_package_name(index):
+    # Every tenth package is scoped, as in real lockfiles
+    return f"@bench/package-{index}" if index % 10 == 0 else f"package-{index}"
+
+
+def _children(rng, index, count):
+    """
+    Picks dependencies among later packages so that the graph is a DAG rooted at package 0.
+    """
+    if index + 1 >= count:
+        return []
+    return sorted(set(rng.randrange(index + 1, count) for _ in range(rng.randint(0, MAX_CHILDREN))))
+
+
+def make_package_lock(count, seed=0):
+    rng = random.Random(seed)
+    versions = [NPM_VERSIONS[i % 2] for i in range(count)]
+    packages = {
+        "": {
+            "name": "bench-project",
+            "version": "1.0.0",
+            "dependencies": {npm_package_name(i): f"^{versions[i]}" for i in range(min(count, 20))},
+        }
+    }
+    for index in range(count):
+        name = npm_package_name(index)
+        entry = {
+            "version": versions[index],
+            "resolved": f"https://registry.npmjs.org/{name}/-/{name.rsplit('/', 1)[-1]}-{versions[index]}.tgz",
+            "integrity": f"sha512-{index:064x}",
+            "license": "MIT",
+        }
+        children = _children(rng, index, count)
+        if children:
+            entry["dependencies"] = {npm_package_name(child): f"^{versions[child]}" for child in children}
+        packages[f"node_modules/{name}"] = entry
+
+        if children and rng.random() < NESTED_FRACTION:
+            # A dependent that needs another major version gets its own nested copy
+            child = children[0]
+            nested_version = NPM_VERSIONS[2 + child % 2]
+            packages[f"node_modules/{name}/node_modules/{npm_package_name(child)}"] = {
+                "version": nested_version,
+                "integrity": f"sha512-{child:064x}",
+                "license": "MIT",
+            }
+
+    return {"name": "bench-project", "version": "1.0.0", "lockfileVersion": 3, "requires": True, "packages": packages}
+
+
+def make_package_json(lockfile):
+    root = lockfile["packages"][""]
+    return {"name": root["name"], "version": root["version"], "dependencies": root["dependencies"]}
+
+
+def maven_purl(index):
+    return f"pkg:maven/com.example.group{index % 50}/artifact-{index}@1.0.{index}?type=jar"
+
+
+def make_cyclonedx_bom(count, seed=0):
+    rng = random.Random(seed)
+    root_ref = "pkg:maven/com.example/bench-project@1.0.0?type=jar"
+    components = []
+    dependencies = [{"ref": root_ref, "dependsOn": [maven_purl(i) for i in range(min(count, 20))]}]
+    for index in range(count):
+        purl = maven_purl(index)
+        components.append({
+            "publisher": "Example Publisher",
+            "group": f"com.example.group{index % 50}",
+            "name": f"artifact-{index}",
+            "version": f"1.0.{index}",
+            "description": f"Synthetic artifact {index}",
+            "scope": "required",
+            "hashes": [{"alg": "SHA-256", "content": f"{index:064x}"}],
+            "licenses": [{"license": {"id": "Apache-2.0"}}],
+            "purl": purl,
+            "externalReferences": [{"type": "vcs", "url": f"https://github.com/example/artifact-{index}"}],
+            "type": "library",
+            "bom-ref": purl,
+        })
+        dependencies.append({"ref": purl, "dependsOn": [maven_purl(child) for child in _children(rng, index, count)]})
+
+    return {
+        "bomFormat": "CycloneDX",
+        "specVersion": "1.4",
+        "serialNumber": "urn:uuid:00000000-0000-0000-0000-000000000000",
+        "version": 1,
+        "metadata": {
+            "component": {
+                "group": "com.example",
+                "name": "bench-project",
+                "version": "1.0.0",
+                "type": "library",
+                "bom-ref": root_ref,
+                "purl": root_ref,
+            }
+        },
+        "components": components,
+        "dependencies": dependencies,
+    }
+
+
+def pypi_package_name(index):
+    return f"package-{index}"
+
+
+def make_pipdeptree(count, seed=0):
+    rng = random.Random(seed)
+
+    def node(index):
+        return {"key": pypi_package_name(index), "package_name": pypi_package_name(index),
+                "installed_version": f"1.0.{index}"}
+
+    tree = []
+    for index in range(count):
+        dependencies = []
+        for child in _children(rng, index, count):
+            dependency = node(child)
+            dependency["required_version"] = f">=1.0.{child}"
+            dependencies.append(dependency)
+        tree.append({"package": node(index), "dependencies": dependencies})
+    return tree
+
+
+def make_requirements(tree, top_level=20):
+    return "".join(f"{entry['package']['key']}=={entry['package']['installed_version']}\n" for entry in tree[:top_level])
+
+
+def parent_map_from_pipdeptree(tree):
+    """
+    Converts pipdeptree output into the {"name==version": {"child==version": None}} map
+    that GenPypiBom.generate_sbom consumes.
+    """
+    parent_map = {}
+    for entry in tree:
+        package = entry["package"]
+        parent_map[f"{package['key']}=={package['installed_version']}"] = dict.fromkeys(
+            f"{dependency['key']}=={dependency['installed_version']}" for dependency in entry["dependencies"]
+        )
+    return parent_map
+
+
+def write_inputs(count, output_dir, seed=0):
+    """
+    Writes every synthetic input for count packages and returns their paths.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    lockfile = make_package_lock(count, seed)
+    tree = make_pipdeptree(count, seed)
+    documents = {
+        "package_lock": ("package-lock.json", lockfile),
+        "package_json": ("package.json", make_package_json(lockfile)),
+        "cyclonedx_bom": ("bom.json", make_cyclonedx_bom(count, seed)),
+        "pipdeptree": ("pipdeptree.json", tree),
+    }
+
+    paths = {}
+    for key, (filename, document) in documents.items():
+        paths[key] = os.path.join(output_dir, filename)
+        with open(paths[key], "w") as f:
+            json.dump(document, f, indent=2)
+
+    paths["requirements"] = os.path.join(output_dir, "requirements.txt")
+    with open(paths["requirements"], "w") as f:
+        f.write(make_requirements(tree))
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--packages", type=int, default=1000)
+    parser.add_argument("--output-dir", default="bench-inputs")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    for path in write_inputs(args.packages, args.output_dir, args.seed).values():
+        print(f"{path} ({os.path.getsize(path) / 1e6:.1f} MB)")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,20 +1,304 @@
 import argparse
-from SBOM_Generators import GenMavenBom, GenNpmBom, GenPypiBom
+import json
+import os
+import sys
+import time
+
+# Everything else is imported where it is used: --why, --diff or --help should not pay for
+# the registry client, the batch runner or the generators
+from SBOM_Generators import Plugins
+
+
+def apply_options(options):
+    if options.get('profile'):
+        from SBOM_Generators import Instrumentation
+        Instrumentation.enable(options.get('cprofile'))
+    # Applied by Plugins when the generator is imported, so setting them does not import it
+    if options.get('maven_resolver'):
+        Plugins.configure('maven', RESOLVER=options['maven_resolver'])
+    if options.get('pypi_resolver'):
+        Plugins.configure('pypi', RESOLVER=options['pypi_resolver'])
+    if options.get('maven_repo'):
+        from SBOM_Generators import MavenResolver
+        MavenResolver.REPOSITORY = options['maven_repo']
+    if options.get('incremental'):
+        from SBOM_Generators import IncrementalSbom
+        IncrementalSbom.ENABLED = True
+    if options.get('no_hashes'):
+        from SBOM_Generators import ArtifactHasher
+        ArtifactHasher.ENABLED = False
+    if options.get('output_format') or options.get('compress') or options.get('json_encoder'):
+        from SBOM_Generators import SbomWriter
+        SbomWriter.FORMAT = options.get('output_format') or SbomWriter.FORMAT
+        SbomWriter.COMPRESSION = options.get('compress') or SbomWriter.COMPRESSION
+        SbomWriter.ENCODER = options.get('json_encoder') or SbomWriter.ENCODER
+    if options.get('validate'):
+        from SBOM_Generators import SchemaValidation
+        SchemaValidation.MODE = options['validate']
+    if options.get('no_pipeline'):
+        from SBOM_Generators import Pipeline
+        Pipeline.ENABLED = False
+    if options.get('no_build_cache'):
+        from SBOM_Generators import BuildCache
+        BuildCache.ENABLED = False
+
+    # Unset options are passed as None, which leaves the defaults alone
+    registry_options = {
+        'max_workers': options.get('workers'),
+        'cache_enabled': False if options.get('no_cache') else None,
+        'cache_path': (os.path.join(options['cache_dir'], "metadata.sqlite")
+                       if options.get('cache_dir') and not options.get('no_cache') else None),
+        'snapshot_path': options.get('snapshot'),
+        'offline': True if options.get('offline') else None,
+        'request_timeout': options.get('request_timeout'),
+        'max_retries': options.get('retries'),
+        'enrich_budget': options.get('enrich_budget'),
+    }
+    if any(value is not None for value in registry_options.values()):
+        from SBOM_Generators import RegistryClient
+        RegistryClient.configure(**registry_options)
+
+
+def run_ecosystem(name, options):
+    """
+    Runs one generator in its own scratch working directory and reports how it went.
+    Executed in a worker process by run_all, so options are re-applied here.
+    """
+    from SBOM_Generators import BatchRunner, Instrumentation
+
+    apply_options(options)
+    if options.get('profile') and options.get('cprofile'):
+        # Keep each ecosystem's cProfile output apart
+        Instrumentation.enable(os.path.join(options['cprofile'], name))
+    start = time.perf_counter()
+    error = BatchRunner.run_in_scratch_dir(Plugins.module_name(name))
+    seconds = time.perf_counter() - start
+    Instrumentation.dump_profiles()
+    return {'ecosystem': name, 'seconds': seconds, 'error': error, 'instrumentation': Instrumentation.report()}
+
+
+def run_all(options):
+    # Pulls in multiprocessing, which only --script all needs
+    from concurrent.futures import ProcessPoolExecutor
+
+    start = time.perf_counter()
+    names = Plugins.names()
+    with ProcessPoolExecutor(max_workers=len(names)) as executor:
+        futures = [executor.submit(run_ecosystem, name, options) for name in names]
+        results = []
+        for name, future in zip(names, futures):
+            try:
+                results.append(future.result())
+            except Exception as e:  # the worker process itself died
+                results.append({'ecosystem': name, 'seconds': time.perf_counter() - start, 'error': repr(e)})
+    total = time.perf_counter() - start
+
+    print("\nSBOM generation summary")
+    for result in results:
+        status = "ok" if result['error'] is None else f"FAILED ({result['error']})"
+        print(f"  {result['ecosystem']:<6} {result['seconds']:8.2f} s  {status}")
+    print(f"  {'total':<6} {total:8.2f} s")
+
+    if options.get('profile'):
+        from SBOM_Generators import Instrumentation
+        Instrumentation.write_trace(options['profile'], mode='all', wall_seconds=total, ecosystems=results)
+        print(f"Profile trace written to {options['profile']}")
+
+    return 0 if all(result['error'] is None for result in results) else 1
+
+
+def explain_dependency(sbom_file, purl):
+    from SBOM_Generators import DependencyGraph, SbomTools
+
+    sbom = SbomTools.open_sbom(sbom_file)
+    graph = DependencyGraph.DependencyGraph.from_dependencies(sbom.get('dependencies', []))
+    if purl not in graph:
+        print(f"{purl} does not appear in the dependencies of {sbom_file}")
+        return
+
+    root = sbom.get('metadata', {}).get('component', {}).get('bom-ref', '')
+    path = graph.shortest_path(root, purl)
+    if path:
+        print("Shortest dependency path:")
+        for depth, ref in enumerate(path):
+            print(f"  {'  ' * depth}{ref}")
+    else:
+        print(f"{purl} is not reachable from {root}")
+    print(f"Direct dependents: {', '.join(graph.dependents_of(purl)) or 'none'}")
+    print(f"Transitive dependents: {len(graph.transitive_dependents(purl))}, "
+          f"transitive dependencies: {len(graph.transitive_dependencies(purl))}")
+
 
 def main():
+    # Both are cheap, and their tables are the choices of the output options
+    from SBOM_Generators import SbomWriter, SchemaValidation
+
     parser = argparse.ArgumentParser(description="Run project scripts individually or collectively.")
-    parser.add_argument('--script', choices=['maven', 'npm', 'pypi', 'all'], help='Specify which script to run')
+    parser.add_argument('--script', metavar='{' + ','.join(list(Plugins.BUILTIN) + ['all']) + '}',
+                        help='Specify which script to run; installed ecosystem plugins are accepted as well')
+    parser.add_argument('--workers', type=int, help='Maximum number of concurrent registry requests')
+    parser.add_argument('--maven-resolver', choices=['mvn', 'native'],
+                        help='Resolve pom.xml with the CycloneDX Maven plugin or natively from the local repository')
+    parser.add_argument('--maven-repo', help='Local Maven repository for --maven-resolver native (default: ~/.m2/repository)')
+    parser.add_argument('--pypi-resolver', choices=['report', 'venv'],
+                        help='Resolve PyPI requirements with pip --dry-run --report or a throwaway virtualenv')
+    parser.add_argument('--request-timeout', type=float, metavar='SECONDS',
+                        help='Registry request connect/read timeout (default: 10)')
+    parser.add_argument('--retries', type=int,
+                        help='Retries of registry requests that time out or fail with 429/5xx, with jittered '
+                             'exponential backoff honouring Retry-After (default: 3)')
+    parser.add_argument('--enrich-budget', type=float, metavar='SECONDS',
+                        help='Time a generator may spend fetching registry metadata; components not enriched by '
+                             'then are written as placeholders marked unenriched')
+    parser.add_argument('--no-cache', action='store_true', help='Do not use the on-disk registry metadata and artifact hash caches')
+    parser.add_argument('--cache-dir', help='Directory holding the registry metadata cache')
+    parser.add_argument('--no-hashes', action='store_true',
+                        help='Do not hash jars, npm tarballs and wheels found in local caches into component hashes')
+    parser.add_argument('--no-build-cache', action='store_true',
+                        help='Always rerun npm install / mvn makeAggregateBom instead of reusing cached results')
+    parser.add_argument('--no-pipeline', action='store_true',
+                        help='Parse, enrich, hash and render one batch after another instead of overlapping them')
+    parser.add_argument('--output-format', choices=SbomWriter.FORMATS,
+                        help='pretty: indented JSON (the default); compact: JSON without whitespace; ndjson: the '
+                             'header, then one component or dependency per line')
+    parser.add_argument('--compress', choices=SbomWriter.COMPRESSIONS,
+                        help='Compress written SBOMs (zstd needs the zstandard package); .gz/.zst is appended to '
+                             'the file name')
+    parser.add_argument('--json-encoder', choices=SbomWriter.ENCODERS,
+                        help='Encoder for compact and ndjson output (default: auto, orjson when installed)')
+    parser.add_argument('--validate', choices=SchemaValidation.MODES,
+                        help='Check every component and dependency against CycloneDX 1.4 while writing: report '
+                             'violations (warn, the default), fail the run on them (strict) or skip the check (off)')
+    parser.add_argument('--incremental', action='store_true',
+                        help='Reuse unchanged components of the existing output SBOM; only new or changed packages '
+                             'are enriched and rendered')
+    parser.add_argument('--previous-sbom', metavar='FILE',
+                        help='SBOM to carry unchanged components over from (implies --incremental for --script)')
+    parser.add_argument('--snapshot', metavar='FILE',
+                        help='Look registry metadata up in this snapshot before the cache and the registries')
+    parser.add_argument('--offline', action='store_true',
+                        help='Never contact the registries; metadata comes from --snapshot only and npm, mvn and pip '
+                             'resolve from their local caches')
+    parser.add_argument('--export-snapshot', metavar='FILE',
+                        help='Write registry metadata to a snapshot for --offline use; metadata already in FILE is '
+                             'kept and only missing packages are fetched')
+    parser.add_argument('--snapshot-from', nargs='+', metavar='PATH',
+                        help='With --export-snapshot, the SBOMs (files, directories or lists) whose npm and PyPI '
+                             'packages to export (default: everything in the metadata cache)')
+    parser.add_argument('--refresh-snapshot', action='store_true',
+                        help='With --export-snapshot, fetch every package again instead of keeping existing entries')
+    parser.add_argument('--batch', nargs='+', metavar='PATH',
+                        help='Generate one SBOM per project found in these directory trees, manifests or manifest lists')
+    parser.add_argument('--output-dir', default=os.path.join('sboms', 'batch'), help='Where --batch writes SBOMs')
+    parser.add_argument('--jobs', type=int, help='Number of --batch worker processes (default: CPU count)')
+    parser.add_argument('--max-subprocesses', type=int,
+                        help='Maximum concurrent npm/mvn/pip subprocesses across --batch workers (default: --jobs)')
+    parser.add_argument('--report', help='Where --batch writes its JSON throughput report')
+    parser.add_argument('--serve', nargs='?', const='', metavar='ADDRESS',
+                        help='Run as a daemon accepting generation jobs over HTTP on HOST:PORT or unix:/path/to/socket '
+                             '(default: 127.0.0.1:8765); uses --jobs workers and --output-dir')
+    parser.add_argument('--watch', nargs='+', metavar='PATH',
+                        help='Run as a daemon regenerating the SBOM of every manifest under these paths when it changes')
+    parser.add_argument('--watch-interval', type=float, default=2.0, help='Seconds between --watch polls')
+    parser.add_argument('--profile', nargs='?', const='sbom_trace.json', metavar='TRACE_FILE',
+                        help='Record per-stage wall/CPU time, counters and peak RSS to a JSON trace '
+                             '(default: sbom_trace.json)')
+    parser.add_argument('--cprofile', metavar='DIR',
+                        help='With --profile, also write cProfile data for the render/serialize stage to DIR')
+    parser.add_argument('--diff', nargs=2, metavar=('OLD', 'NEW'),
+                        help='Report added, removed and version-changed components and dependency edges between two SBOMs')
+    parser.add_argument('--diff-json', metavar='FILE', help='With --diff, also write the differences as JSON')
+    parser.add_argument('--merge', nargs='+', metavar='PATH',
+                        help='Merge SBOMs (files, directories of SBOMs or files listing SBOM paths) into one, '
+                             'deduplicating components and dependency edges')
+    parser.add_argument('--merge-output', default=os.path.join('sboms', 'merged_sbom.json'),
+                        help='Where --merge writes the merged SBOM')
+    parser.add_argument('--check-sbom', nargs='+', metavar='PATH',
+                        help='Validate existing SBOMs (files, directories of SBOMs or files listing SBOM paths) '
+                             'against CycloneDX 1.4')
+    parser.add_argument('--why', nargs=2, metavar=('SBOM', 'PURL'),
+                        help='Show how an SBOM\'s root component reaches PURL and what depends on it')
     args = parser.parse_args()
+    if args.script and args.script != 'all' and not Plugins.is_known(args.script):
+        parser.error(f"unknown --script {args.script!r} (choose from {', '.join(Plugins.names() + ['all'])})")
+
+    if args.offline and not args.snapshot:
+        from SBOM_Generators import RegistryClient
+        if not RegistryClient.SNAPSHOT_PATH:
+            parser.error("--offline needs a metadata snapshot (--snapshot FILE or SBOM_SNAPSHOT)")
+    if args.snapshot and not os.path.isfile(args.snapshot):
+        parser.error(f"snapshot {args.snapshot} does not exist; create it with --export-snapshot")
+
+    options = vars(args)
+    apply_options(options)
+
+    if args.why:
+        explain_dependency(*args.why)
+        return
+
+    if args.diff:
+        from SBOM_Generators import SbomTools
+        diff = SbomTools.diff_sboms(*args.diff)
+        SbomTools.print_diff(diff)
+        if args.diff_json:
+            with open(args.diff_json, 'w') as f:
+                json.dump(diff, f, indent=4)
+        return
+
+    if args.check_sbom:
+        from SBOM_Generators import SbomTools
+        invalid = 0
+        for sbom_file in SbomTools.collect_sbom_files(args.check_sbom):
+            validator = SchemaValidation.validate_sbom(sbom_file)
+            print(validator.summary())
+            invalid += bool(validator.errors)
+        sys.exit(1 if invalid else 0)
+
+    if args.merge:
+        from SBOM_Generators import SbomTools
+        SbomTools.merge_sboms(SbomTools.collect_sbom_files(args.merge), args.merge_output)
+        return
+
+    if args.export_snapshot:
+        from SBOM_Generators import RegistryClient, SbomTools
+        keys = SbomTools.registry_keys(SbomTools.collect_sbom_files(args.snapshot_from)) if args.snapshot_from else None
+        result = RegistryClient.export_snapshot(args.export_snapshot, keys, args.refresh_snapshot)
+        print(f"Snapshot {args.export_snapshot}: {result['entries']} entries, {result['fetched']} fetched, "
+              f"{len(result['unavailable'])} unavailable")
+        for ecosystem, name, version in result['unavailable']:
+            print(f"  no metadata for {ecosystem} {name}@{version}")
+        return
+
+    if args.serve is not None or args.watch:
+        # Only the daemon needs http.server and friends, so it is imported on demand
+        from SBOM_Generators import SbomDaemon
+        address = (args.serve or SbomDaemon.DEFAULT_ADDRESS) if args.serve is not None else None
+        SbomDaemon.run_daemon(address, args.watch, args.output_dir, args.jobs, args.max_subprocesses,
+                              apply_options, options, args.watch_interval)
+        return
+
+    if args.batch:
+        from SBOM_Generators import BatchRunner, Instrumentation
+        report = BatchRunner.run_batch(args.batch, args.output_dir, args.jobs, args.max_subprocesses,
+                                       apply_options, options, args.report)
+        if args.profile:
+            Instrumentation.write_trace(args.profile, mode='batch', batch=report)
+        sys.exit(1 if report['failed_jobs'] else 0)
 
-    if args.script == 'maven':
-        GenMavenBom.run()
-    elif args.script == 'npm':
-        GenNpmBom.run()
-    elif args.script == 'pypi':
-        GenPypiBom.run()
-    #elif args.script == 'all':
-        #script1.run()
-        #script2.run()
+    run_kwargs = {'previous_sbom': args.previous_sbom} if args.previous_sbom else {}
+    if args.script == 'all':
+        # Each ecosystem runs in its own process, so total time tracks the slowest one
+        sys.exit(run_all(options))
+    elif args.script and args.profile:
+        from SBOM_Generators import Instrumentation
+        start = time.perf_counter()
+        try:
+            Plugins.load(args.script).run(**run_kwargs)
+        finally:
+            Instrumentation.write_trace(args.profile, mode=args.script, wall_seconds=time.perf_counter() - start)
+            print(f"Profile trace written to {args.profile}")
+    elif args.script:
+        Plugins.load(args.script).run(**run_kwargs)
 
 
 if __name__ == '__main__':
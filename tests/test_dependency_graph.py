@@ -0,0 +1,111 @@
+import random
+import unittest
+from collections import deque
+
+from SBOM_Generators import DependencyGraph
+
+# root -> a -> c -> e, root -> b -> c, b -> d, e -> a (a cycle), d appears twice as a ref
+DEPENDENCIES = [
+    {"ref": "root", "dependsOn": ["a", "b"]},
+    {"ref": "a", "dependsOn": ["c"]},
+    {"ref": "b", "dependsOn": ["c", "d"]},
+    {"ref": "c", "dependsOn": ["e"]},
+    {"ref": "d", "dependsOn": []},
+    {"ref": "e", "dependsOn": ["a"]},
+    {"ref": "d", "dependsOn": ["e", "e"]},
+]
+
+
+def reachable(dependencies, purl, reverse=False):
+    """
+    Breadth-first walk over the plain "dependencies" list, the reference for the graph queries.
+    """
+    edges = {}
+    for dependency in dependencies:
+        for depends_on in dependency["dependsOn"]:
+            source, target = (depends_on, dependency["ref"]) if reverse else (dependency["ref"], depends_on)
+            edges.setdefault(source, {})[target] = None
+    found = {}
+    queue = deque([purl])
+    while queue:
+        for neighbour in edges.get(queue.popleft(), ()):
+            if neighbour != purl and neighbour not in found:
+                found[neighbour] = None
+                queue.append(neighbour)
+    return list(found)
+
+
+class DependencyGraphTest(unittest.TestCase):
+    def setUp(self):
+        self.graph = DependencyGraph.DependencyGraph.from_dependencies(DEPENDENCIES)
+
+    def test_round_trip(self):
+        self.assertEqual(list(self.graph.iter_dependencies()), DEPENDENCIES)
+        self.assertEqual(len(self.graph), 6)
+        self.assertEqual(self.graph.edge_count, 9)
+
+    def test_direct_queries(self):
+        self.assertEqual(self.graph.dependencies_of("b"), ["c", "d"])
+        # Repeated entries and duplicate edges are reported once
+        self.assertEqual(self.graph.dependencies_of("d"), ["e"])
+        self.assertEqual(self.graph.dependents_of("e"), ["c", "d"])
+        self.assertEqual(self.graph.dependencies_of("missing"), [])
+
+    def test_transitive_queries(self):
+        self.assertEqual(self.graph.transitive_dependencies("root"), ["a", "b", "c", "d", "e"])
+        # The cycle a -> c -> e -> a is walked once
+        self.assertEqual(self.graph.transitive_dependencies("a"), ["c", "e"])
+        self.assertEqual(self.graph.transitive_dependents("c"), ["a", "b", "root", "e", "d"])
+        self.assertEqual(self.graph.transitive_dependents("root"), [])
+        self.assertEqual(self.graph.transitive_dependencies("missing"), [])
+
+    def test_shortest_path(self):
+        self.assertEqual(self.graph.shortest_path("root", "e"), ["root", "a", "c", "e"])
+        self.assertEqual(self.graph.shortest_path("b", "e"), ["b", "c", "e"])
+        self.assertEqual(self.graph.shortest_path("e", "c"), ["e", "a", "c"])
+        self.assertEqual(self.graph.shortest_path("root", "root"), ["root"])
+        self.assertIsNone(self.graph.shortest_path("e", "root"))
+        self.assertIsNone(self.graph.shortest_path("root", "missing"))
+
+    def test_queries_see_edges_added_after_a_query(self):
+        self.assertIsNone(self.graph.shortest_path("d", "f"))
+        self.graph.add("e", ["f"])
+        self.assertEqual(self.graph.shortest_path("d", "f"), ["d", "e", "f"])
+        self.assertEqual(self.graph.dependents_of("f"), ["e"])
+
+    def test_random_graphs_match_a_plain_walk(self):
+        rng = random.Random(7)
+        for _ in range(20):
+            purls = [f"pkg:npm/p{index}@1.0.0" for index in range(rng.randint(1, 40))]
+            dependencies = [{"ref": rng.choice(purls), "dependsOn": rng.sample(purls, rng.randint(0, min(4, len(purls))))}
+                            for _ in range(rng.randint(0, 60))]
+            graph = DependencyGraph.DependencyGraph.from_dependencies(dependencies)
+            for purl in purls:
+                self.assertEqual(graph.transitive_dependencies(purl), reachable(dependencies, purl) if purl in graph else [])
+                self.assertEqual(graph.transitive_dependents(purl), reachable(dependencies, purl, reverse=True) if purl in graph else [])
+                target = rng.choice(purls)
+                path = graph.shortest_path(purl, target)
+                if purl == target:
+                    self.assertEqual(path, [purl] if purl in graph else None)
+                elif target in reachable(dependencies, purl):
+                    self.assertEqual((path[0], path[-1]), (purl, target))
+                    self.assertTrue(all(step in graph.dependencies_of(previous) for previous, step in zip(path, path[1:])))
+                    # No shorter path exists: every node of a shortest path is first reached at that depth
+                    self.assertEqual(len(path) - 1, self.depth(graph, purl, target))
+                else:
+                    self.assertIsNone(path)
+
+    def depth(self, graph, source, target):
+        depths = {source: 0}
+        queue = deque([source])
+        while queue:
+            current = queue.popleft()
+            for neighbour in graph.dependencies_of(current):
+                if neighbour not in depths:
+                    depths[neighbour] = depths[current] + 1
+                    queue.append(neighbour)
+        return depths[target]
+
+
+if __name__ == "__main__":
+    unittest.main()
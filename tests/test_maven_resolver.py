@@ -0,0 +1,40 @@
+import os
+import unittest
+
+from SBOM_Generators import MavenResolver
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "maven")
+REPOSITORY = os.path.join(FIXTURES, "repository")
+
+
+def resolved_versions(project):
+    """
+    Resolves tests/fixtures/maven/<project>/pom.xml against the fixture repository and
+    returns {artifactId: version} of its components.
+    """
+    bom = MavenResolver.resolve_bom(os.path.join(FIXTURES, project, "pom.xml"), REPOSITORY)
+    return {component["name"]: component["version"] for component in bom["components"]}
+
+
+class InheritanceTest(unittest.TestCase):
+    """
+    example-parent manages lib at ${lib.version}, imports example-bom at ${bom.version} and
+    depends on util at ${util.version}, all 1.0 unless the child project overrides them.
+    """
+
+    def test_parent_properties(self):
+        self.assertEqual(resolved_versions("inherit"), {"lib": "1.0", "util": "1.0", "codec": "1.0"})
+
+    def test_child_properties_override_inherited_entries(self):
+        # Maven interpolates the inherited entries with the child's properties
+        self.assertEqual(resolved_versions("override"), {"lib": "2.0", "util": "2.0", "codec": "2.0"})
+
+    def test_inherited_entries_stay_uninterpolated(self):
+        model = MavenResolver.MavenResolver(REPOSITORY).model(os.path.join(FIXTURES, "override", "pom.xml"))
+        raw = model["raw_managed"][("com.example", "lib", "jar", "")]
+        self.assertEqual(raw["version"], "${lib.version}")
+        self.assertEqual(model["managed"][("com.example", "lib", "jar", "")]["version"], "2.0")
+
+
+if __name__ == "__main__":
+    unittest.main()
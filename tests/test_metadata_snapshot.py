@@ -0,0 +1,93 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from SBOM_Generators import MetadataSnapshot
+
+
+def record(ecosystem, name, version, value):
+    return MetadataSnapshot.make_key(ecosystem, name, version), MetadataSnapshot.encode(value)
+
+
+class MetadataSnapshotTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "metadata.snapshot")
+
+    def open(self):
+        snapshot = MetadataSnapshot.MetadataSnapshot(self.path)
+        self.addCleanup(snapshot.close)
+        return snapshot
+
+    def test_lookups(self):
+        records = [record("npm", f"package-{index}", "1.0.0", {"index": index}) for index in range(1000)]
+        self.assertEqual(MetadataSnapshot.write_snapshot(self.path, records), 1000)
+        snapshot = self.open()
+        self.assertEqual(len(snapshot), 1000)
+        for index in range(1000):
+            self.assertEqual(snapshot.get("npm", f"package-{index}", "1.0.0"), {"index": index})
+        self.assertIsNone(snapshot.get("npm", "package-0", "2.0.0"))
+        self.assertIsNone(snapshot.get("pypi", "package-0", "1.0.0"))
+        self.assertEqual(sorted(snapshot.records()), sorted(records))
+
+    def test_pypi_names_are_canonicalized(self):
+        MetadataSnapshot.write_snapshot(self.path, [record("pypi", "Zope.Interface", "6.0", {"name": "zope"})])
+        snapshot = self.open()
+        self.assertEqual(snapshot.get("pypi", "zope_interface", "6.0"), {"name": "zope"})
+        self.assertIsNone(snapshot.get("npm", "zope-interface", "6.0"))
+
+    def test_later_records_replace_earlier_ones(self):
+        MetadataSnapshot.write_snapshot(self.path, [record("npm", "a", "1", {"v": 1}), record("npm", "b", "1", {}),
+                                                    record("npm", "a", "1", {"v": 2})])
+        snapshot = self.open()
+        self.assertEqual(len(snapshot), 2)
+        self.assertEqual(snapshot.get("npm", "a", "1"), {"v": 2})
+
+    def test_colliding_hashes_are_probed(self):
+        # Every key lands in the same slot, so lookups walk the probe chain and wrap around the index
+        with mock.patch.object(MetadataSnapshot, "_hash", lambda key: (1 << 40) - 1):
+            MetadataSnapshot.write_snapshot(self.path, [record("npm", str(index), "1", index) for index in range(50)])
+            snapshot = self.open()
+            self.assertEqual([snapshot.get("npm", str(index), "1") for index in range(50)], list(range(50)))
+            self.assertNotIn(MetadataSnapshot.make_key("npm", "50", "1"), snapshot)
+
+    def test_empty_snapshot(self):
+        self.assertEqual(MetadataSnapshot.write_snapshot(self.path, []), 0)
+        snapshot = self.open()
+        self.assertEqual(len(snapshot), 0)
+        self.assertIsNone(snapshot.get("npm", "a", "1"))
+        self.assertEqual(list(snapshot.records()), [])
+
+    def test_other_files_are_rejected(self):
+        for content in (b"", b"{}", MetadataSnapshot.MAGIC + b"\0" * 100):
+            with self.subTest(content=content):
+                with open(self.path, "wb") as f:
+                    f.write(content)
+                with self.assertRaises(ValueError):
+                    MetadataSnapshot.MetadataSnapshot(self.path)
+
+    def test_refresh_fetches_only_missing_keys(self):
+        MetadataSnapshot.write_snapshot(self.path, [record("npm", "a", "1", "old a"), record("npm", "b", "1", "old b")])
+        requested = []
+
+        def fetch(keys):
+            requested.extend(keys)
+            return [None if name == "d" else f"new {name}" for _, name, _ in keys]
+
+        result = MetadataSnapshot.refresh_snapshot(self.path, [("npm", "a", "1"), ("npm", "c", "1"), ("npm", "d", "1")], fetch)
+        self.assertEqual(requested, [("npm", "c", "1"), ("npm", "d", "1")])
+        self.assertEqual(result, {"entries": 3, "fetched": 1, "unavailable": [("npm", "d", "1")]})
+        with MetadataSnapshot.open_snapshot(self.path) as snapshot:
+            self.assertEqual([snapshot.get("npm", name, "1") for name in "abcd"], ["old a", "old b", "new c", None])
+
+        del requested[:]
+        MetadataSnapshot.refresh_snapshot(self.path, [("npm", "a", "1")], fetch, refresh=True)
+        self.assertEqual(requested, [("npm", "a", "1")])
+        with MetadataSnapshot.open_snapshot(self.path) as snapshot:
+            self.assertEqual(snapshot.get("npm", "a", "1"), "new a")
+
+
+if __name__ == "__main__":
+    unittest.main()
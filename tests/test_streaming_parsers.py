@@ -0,0 +1,119 @@
+import gzip
+import importlib.util
+import io
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from SBOM_Generators import StreamingParsers
+
+# Strings holding quotes, backslashes, braces and escapes, and numbers long enough to be cut
+# by a chunk boundary
+DOCUMENT = json.dumps({
+    "bomFormat": "CycloneDX",
+    "metadata": {"component": {"name": "root {\"quoted\"} [1]", "version": "1.0"}},
+    "components": [
+        {"name": "a\\b", "version": "1.2.3", "tags": ["x}", "y]", "é漢"]},
+        {"name": "\"c\"", "size": 1234567890, "ratio": -12.5e-3, "optional": None},
+        [], {}, 987654321, "plain",
+    ],
+    "dependencies": [{"ref": "a", "dependsOn": ["b", "c"]}, {"ref": "b", "dependsOn": []}],
+    "serialNumber": "urn:uuid:0",
+}, indent=2)
+
+
+class TrickleReader(io.StringIO):
+    """
+    Returns at most step characters per read, so every value straddles chunk boundaries.
+    """
+
+    def __init__(self, text, step):
+        super().__init__(text)
+        self.step = step
+
+    def read(self, size=-1):
+        return super().read(self.step if size is None or size < 0 else min(size, self.step))
+
+
+class JsonPullParserTest(unittest.TestCase):
+    def setUp(self):
+        self.expected = json.loads(DOCUMENT)
+
+    def trickled(self, step):
+        return mock.patch.object(StreamingParsers, "open_text", lambda file_path: TrickleReader(DOCUMENT, step))
+
+    def test_array_items_across_chunk_boundaries(self):
+        for step in (1, 2, 3, 5, 7, 64, len(DOCUMENT)):
+            with self.subTest(step=step), self.trickled(step):
+                self.assertEqual(list(StreamingParsers.iter_array_items("sbom.json", ("components",))),
+                                 self.expected["components"])
+
+    def test_object_items_across_chunk_boundaries(self):
+        for step in (1, 4, 9):
+            with self.subTest(step=step), self.trickled(step):
+                self.assertEqual(dict(StreamingParsers.iter_object_items("sbom.json", ("metadata", "component"))),
+                                 self.expected["metadata"]["component"])
+
+    def test_skipped_values_across_chunk_boundaries(self):
+        header = {key: value for key, value in self.expected.items() if key not in ("components", "dependencies")}
+        for step in (1, 2, 3, 5, 8):
+            with self.subTest(step=step), self.trickled(step):
+                self.assertEqual(StreamingParsers.load_object_except("sbom.json", {"components", "dependencies"}), header)
+
+    def test_missing_key_path(self):
+        with self.trickled(3):
+            self.assertEqual(list(StreamingParsers.iter_array_items("sbom.json", ("nothing",))), [])
+            # "bomFormat" is not an array
+            self.assertEqual(list(StreamingParsers.iter_array_items("sbom.json", ("bomFormat",))), [])
+
+    def test_streamed_document(self):
+        with self.trickled(5):
+            document = StreamingParsers.StreamedJsonDocument("sbom.json", {"components": list, "dependencies": list})
+            self.assertEqual(document["bomFormat"], "CycloneDX")
+            self.assertEqual(list(document["dependencies"]), self.expected["dependencies"])
+            self.assertNotIn("components", document.header())
+
+
+class CompressionDetectionTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def write(self, name, data):
+        path = os.path.join(self.directory.name, name)
+        with open(path, "wb") as f:
+            f.write(data)
+        return path
+
+    def components(self, path):
+        return list(StreamingParsers.iter_array_items(path, ("components",)))
+
+    def test_plain(self):
+        path = self.write("sbom.json", DOCUMENT.encode("utf-8"))
+        self.assertEqual(self.components(path), json.loads(DOCUMENT)["components"])
+
+    def test_gzip_recognized_by_magic_bytes(self):
+        # The name says nothing about the compression
+        path = self.write("sbom.json", gzip.compress(DOCUMENT.encode("utf-8")))
+        self.assertEqual(self.components(path), json.loads(DOCUMENT)["components"])
+
+    @unittest.skipUnless(importlib.util.find_spec("zstandard"), "zstandard is not installed")
+    def test_zstd_recognized_by_magic_bytes(self):
+        import zstandard
+        path = self.write("sbom.json", zstandard.ZstdCompressor().compress(DOCUMENT.encode("utf-8")))
+        self.assertEqual(self.components(path), json.loads(DOCUMENT)["components"])
+
+    def test_ndjson_detection(self):
+        streamed = {"components": list, "dependencies": list}
+        ndjson = self.write("sbom.ndjson.gz", gzip.compress(b'{"bomFormat": "CycloneDX"}\n{"component": {}}\n'))
+        pretty = self.write("pretty.json", DOCUMENT.encode("utf-8"))
+        compact = self.write("compact.json", json.dumps(json.loads(DOCUMENT)).encode("utf-8") + b"\n")
+        self.assertTrue(StreamingParsers.is_ndjson(ndjson, streamed))
+        self.assertFalse(StreamingParsers.is_ndjson(pretty, streamed))
+        self.assertFalse(StreamingParsers.is_ndjson(compact, streamed))
+
+
+if __name__ == "__main__":
+    unittest.main()
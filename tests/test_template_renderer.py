@@ -0,0 +1,116 @@
+import glob
+import json
+import os
+import unittest
+from string import Formatter
+
+from SBOM_Generators import Paths, TemplateRenderer
+
+
+def replace_placeholders(data, replacements):
+    # The recursive str.format walk the generators used before templates were compiled
+    if isinstance(data, dict):
+        return {key: replace_placeholders(value, replacements) for key, value in data.items()}
+    elif isinstance(data, list):
+        return [replace_placeholders(item, replacements) for item in data]
+    elif isinstance(data, str):
+        return data.format(**replacements)
+    else:
+        return data
+
+
+def field_names(node):
+    if isinstance(node, dict):
+        return {name for value in node.values() for name in field_names(value)}
+    if isinstance(node, list):
+        return {name for item in node for name in field_names(item)}
+    if isinstance(node, str):
+        return {field_name for _, field_name, _, _ in Formatter().parse(node) if field_name}
+    return set()
+
+
+class Versioned:
+    def __init__(self, version):
+        self.version = version
+
+
+TEMPLATE = {
+    "plain": "no placeholders",
+    "escaped": "{{literal}} and {{{name}}}",
+    "quotes": "it's \"{name}\" \\ {name}",
+    "spec": "[{count:>5}] [{ratio:.2f}] [{count:x}]",
+    "conversion": "{name!r} {name!s} {name!a}",
+    "lookups": "{info.version} {mapping[key]} {items[0]}",
+    "nested_spec": "{name:>{width}}",
+    "whole": "{name}",
+    "numbers": [1, 2.5, None, True, False],
+    "empty": {"dict": {}, "list": [], "string": ""},
+    "constant_subtree": {"a": [{"b": "c"}]},
+    "mixed": [{"ref": "{name}@{version}", "kind": "library"}, "{version}", 3],
+    "unicode": "é漢 {name} ✓",
+}
+
+VALUES = {
+    "name": "pkg {not a field} é",
+    "version": "1.0.0",
+    "count": 42,
+    "ratio": 0.125,
+    "width": 12,
+    "info": Versioned("2.0"),
+    "mapping": {"key": "value"},
+    "items": ["first"],
+}
+
+
+class TemplateRendererTest(unittest.TestCase):
+    def assertRendersLikeFormat(self, template, values):
+        compiled = TemplateRenderer.CompiledTemplate(template)
+        self.assertEqual(compiled.render(values), replace_placeholders(template, values), compiled.source)
+
+    def test_matches_str_format(self):
+        self.assertRendersLikeFormat(TEMPLATE, VALUES)
+
+    def test_repository_templates(self):
+        for path in sorted(glob.glob(os.path.join(Paths.TEMPLATES_DIR, "*.json"))):
+            with self.subTest(template=os.path.basename(path)):
+                with open(path) as f:
+                    template = json.load(f)
+                values = {name: f"{name} {{x}} 'q\" \\" for name in field_names(template)}
+                self.assertRendersLikeFormat(template, values)
+                self.assertEqual(TemplateRenderer.load_template(path).render(values), replace_placeholders(template, values))
+
+    def test_each_field_alone(self):
+        # Every string on its own, so one bad slot cannot hide behind another
+        for key, value in TEMPLATE.items():
+            with self.subTest(key=key):
+                self.assertRendersLikeFormat({key: value}, VALUES)
+                self.assertRendersLikeFormat([value], VALUES)
+
+    def test_missing_values_raise_like_str_format(self):
+        compiled = TemplateRenderer.CompiledTemplate(TEMPLATE)
+        values = dict(VALUES)
+        del values["version"]
+        with self.assertRaises(KeyError):
+            replace_placeholders(TEMPLATE, values)
+        with self.assertRaises(KeyError):
+            compiled.render(values)
+
+    def test_containers_with_placeholders_are_rebuilt(self):
+        compiled = TemplateRenderer.CompiledTemplate(TEMPLATE)
+        first = compiled.render(VALUES)
+        second = compiled.render(dict(VALUES, version="2.0.0"))
+        first["mixed"].append("changed")
+        first["mixed"][0]["kind"] = "changed"
+        self.assertEqual(second["mixed"], [{"ref": "pkg {not a field} é@2.0.0", "kind": "library"}, "2.0.0", 3])
+        self.assertEqual(TEMPLATE["mixed"][0]["kind"], "library")
+        # Constant subtrees are shared between renders, as documented
+        self.assertIs(first["constant_subtree"], second["constant_subtree"])
+
+    def test_slots(self):
+        compiled = TemplateRenderer.CompiledTemplate({"a": "{x}", "b": ["c", {"d": "{y}"}], "e": "f"})
+        self.assertEqual(compiled.slots, [("a",), ("b", 1, "d")])
+        self.assertEqual(TemplateRenderer.compile_template(compiled), compiled)
+
+
+if __name__ == "__main__":
+    unittest.main()